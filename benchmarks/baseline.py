@@ -0,0 +1,78 @@
+# benchmarks/baseline.py
+
+"""
+Save benchmark results as a baseline and compare later runs against it.
+
+Results are a flat mapping of metric name to value. Metrics whose name ends in ``_per_s`` are
+throughputs (higher is better); all others are costs such as latencies or memory (lower is better).
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+def environment() -> Dict[str, str]:
+    """Describe where results were measured, since they only compare on similar machines."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': str(os.cpu_count()),
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def save(path: str, results: Dict[str, float]) -> None:
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f'Saved baseline to {path}', file=sys.stderr)
+
+def load(path: str) -> Dict[str, float]:
+    with open(path) as f:
+        return json.load(f)['results']
+
+def compare(results: Dict[str, float], baseline: Dict[str, float],
+            tolerance: float) -> List[Tuple[str, float, float, float]]:
+    """
+    Print every metric next to its baseline value.
+
+    Returns:
+        List[Tuple[str, float, float, float]]: ``(name, baseline, current, change)`` for every
+        metric that got worse by more than ``tolerance`` (0.2 is 20%).
+    """
+    regressions = []
+    for name in sorted(results):
+        current = results[name]
+        previous = baseline.get(name)
+        if not previous:
+            print(f'{name:48s} {current:14.6g}   (no baseline)')
+            continue
+        change = (current - previous) / previous
+        worse = -change if name.endswith('_per_s') else change
+        flag = '  REGRESSION' if worse > tolerance else ''
+        print(f'{name:48s} {current:14.6g}   baseline {previous:14.6g}   {change * 100:+7.1f}%{flag}')
+        if worse > tolerance:
+            regressions.append((name, previous, current, change))
+    return regressions
+
+def finish(results: Dict[str, float], save_path: str = None, compare_path: str = None,
+           tolerance: float = 0.2) -> int:
+    """Save and/or compare results as requested on the command line; returns the exit status."""
+    status = 0
+    if compare_path:
+        regressions = compare(results, load(compare_path), tolerance)
+        if regressions:
+            print(f'{len(regressions)} metrics regressed by more than {tolerance:.0%}', file=sys.stderr)
+            status = 1
+    if save_path:
+        save(save_path, results)
+    return status
@@ -0,0 +1,72 @@
+# benchmarks/bench_image_ocr.py
+
+"""
+Compare OCR latency and labels for the sample images in files/ with and without the image
+normalization stage (see src/image_preprocessing.py). Requires the tesseract binary.
+
+Usage:
+    python -m benchmarks.bench_image_ocr [--repeat 3] [--upscale 3]
+
+``--upscale`` enlarges each sample before the run, to approximate 12+ megapixel phone photos.
+"""
+
+import argparse
+import glob
+import time
+from io import BytesIO
+
+import pytesseract
+from PIL import Image
+from src.classifier import classify_text
+from src.image_preprocessing import OCR_LANG, normalize_image, ocr_config
+
+def ocr_raw(data: bytes) -> str:
+    """What extract_text_from_image did before normalization."""
+    return pytesseract.image_to_string(Image.open(BytesIO(data)))
+
+def ocr_normalized(data: bytes) -> str:
+    return pytesseract.image_to_string(normalize_image(Image.open(BytesIO(data))),
+                                       lang=OCR_LANG, config=ocr_config())
+
+def load_sample(path: str, upscale: float) -> bytes:
+    with open(path, 'rb') as f:
+        data = f.read()
+    if upscale == 1:
+        return data
+    image = Image.open(BytesIO(data))
+    exif = image.getexif()
+    image = image.resize((int(image.width * upscale), int(image.height * upscale)), Image.Resampling.BICUBIC)
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90, exif=exif)
+    return buffer.getvalue()
+
+def best_time(func, data: bytes, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR latency before and after image normalization.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--upscale', type=float, default=1)
+    parser.add_argument('--files', default='files/*.jpg')
+    args = parser.parse_args()
+
+    print(f"{'file':<28} {'pixels':>10} {'raw ms':>9} {'norm ms':>9} {'speedup':>8}  labels")
+    changed = 0
+    for path in sorted(glob.glob(args.files)):
+        data = load_sample(path, args.upscale)
+        width, height = Image.open(BytesIO(data)).size
+        before, raw_text = best_time(ocr_raw, data, args.repeat)
+        after, normalized_text = best_time(ocr_normalized, data, args.repeat)
+        raw_label, normalized_label = classify_text(raw_text), classify_text(normalized_text)
+        changed += raw_label != normalized_label
+        print(f'{path:<28} {width * height:>10} {before * 1000:>9.1f} {after * 1000:>9.1f} '
+              f'{before / after:>7.1f}x  {raw_label} -> {normalized_label}')
+    print(f'{changed} label(s) changed')
+
+if __name__ == '__main__':
+    main()
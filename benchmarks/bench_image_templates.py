@@ -0,0 +1,114 @@
+# benchmarks/bench_image_templates.py
+
+"""
+Accuracy and latency of the image template fast path (src/image_templates.py) on synthetic ID cards.
+
+Templates are made from one clean render (no rotation or noise) of every card design in
+``src.synthetic.CARD_DESIGNS`` but the last of each type. Queries are fresh cards with their own
+names and numbers, rotated, blurred, speckled and saved as JPEG or PNG like uploads. The held-out
+designs and page images of the other document types are negatives, which must not match.
+
+    python -m benchmarks.bench_image_templates [--per-design 50] [--rotation 3] [--noise 0.02]
+        [--ocr] [--save-baseline benchmarks/image_template_baseline.json] [--compare ...]
+
+Reported:
+
+- ``template_recall``: cards of an indexed design that matched it;
+- ``template_wrong_design_rate``: cards of an indexed design that matched another one;
+- ``false_match_rate``: negatives that matched any template;
+- ``fingerprint_ms_p50`` and ``_p95``: decoding, fingerprinting and matching one upload;
+- with ``--ocr`` (requires the tesseract binary), ``ocr_ms_p50``: the full-image OCR a match
+  spares, and ``ocr_label_accuracy``: how often that OCR gets the label right, for comparison.
+"""
+
+import argparse
+import random
+import time
+from io import BytesIO
+from statistics import median, quantiles
+
+from werkzeug.datastructures import FileStorage
+from benchmarks import baseline
+from src.classifier import DOCUMENT_PATTERNS, classify_text
+from src.extractors import extract_text_from_image
+from src.image_templates import ImageTemplate, TemplateIndex, file_fingerprint, fingerprint
+from src.synthetic import CARD_DESIGNS, card_image, document_text, image_bytes
+
+def upload(data: bytes) -> FileStorage:
+    return FileStorage(stream=BytesIO(data), filename='upload')
+
+def build_index() -> TemplateIndex:
+    index = TemplateIndex()
+    for doc_type, designs in CARD_DESIGNS.items():
+        for design in designs[:-1]:
+            card = card_image(doc_type, design, random.Random(f'template:{design["name"]}'), 0, 0)
+            index.add(ImageTemplate(design['name'], doc_type, fingerprint(card)))
+    return index
+
+def corpus(per_design: int, rotation: float, noise: float):
+    """Yield ``(data, label, design name or None, indexed)`` for every query."""
+    for doc_type, designs in CARD_DESIGNS.items():
+        for number, design in enumerate(designs):
+            for index in range(per_design):
+                rng = random.Random(f'query:{design["name"]}:{index}')
+                card = card_image(doc_type, design, rng, rotation, noise)
+                data, _ = image_bytes([], rng, rotation, noise, card)
+                yield data, doc_type, design['name'], number < len(designs) - 1
+    others = [doc_type for doc_type in DOCUMENT_PATTERNS if doc_type not in CARD_DESIGNS]
+    for index in range(per_design):
+        doc_type = others[index % len(others)]
+        rng = random.Random(f'page:{index}')
+        data, _ = image_bytes(document_text(doc_type, DOCUMENT_PATTERNS[doc_type], rng, 1, noise), rng, rotation, noise)
+        yield data, doc_type, None, False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Accuracy and latency of the image template fast path.')
+    parser.add_argument('--per-design', type=int, default=50, help='queries per card design, and page negatives')
+    parser.add_argument('--rotation', type=float, default=3, help='maximum rotation of queries, in degrees')
+    parser.add_argument('--noise', type=float, default=0.02, help='blur and speckle of queries')
+    parser.add_argument('--ocr', action='store_true', help='also time full-image OCR (requires tesseract)')
+    parser.add_argument('--save-baseline', help='write the results to this file')
+    parser.add_argument('--compare', help='compare the results with this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression before failing')
+    args = parser.parse_args(argv)
+
+    index = build_index()
+    counts = {'indexed': 0, 'matched': 0, 'wrong_design': 0, 'negatives': 0, 'false_matches': 0,
+              'ocr_correct': 0, 'ocr_runs': 0}
+    fingerprint_ms, ocr_ms = [], []
+    for data, label, design, indexed in corpus(args.per_design, args.rotation, args.noise):
+        start = time.perf_counter()
+        match = index.match(file_fingerprint(upload(data)))
+        fingerprint_ms.append((time.perf_counter() - start) * 1000)
+        if indexed:
+            counts['indexed'] += 1
+            counts['matched'] += match is not None and match.template.name == design
+            counts['wrong_design'] += match is not None and match.template.name != design
+        else:
+            counts['negatives'] += 1
+            counts['false_matches'] += match is not None
+        if args.ocr and design is not None:
+            start = time.perf_counter()
+            text = extract_text_from_image(upload(data))
+            ocr_ms.append((time.perf_counter() - start) * 1000)
+            counts['ocr_runs'] += 1
+            counts['ocr_correct'] += classify_text(text) == label
+
+    results = {
+        'template_recall': counts['matched'] / counts['indexed'],
+        'template_wrong_design_rate': counts['wrong_design'] / counts['indexed'],
+        'false_match_rate': counts['false_matches'] / counts['negatives'],
+        'fingerprint_ms_p50': median(fingerprint_ms),
+        'fingerprint_ms_p95': quantiles(fingerprint_ms, n=20)[-1],
+    }
+    if ocr_ms:
+        results['ocr_ms_p50'] = median(ocr_ms)
+        results['ocr_label_accuracy'] = counts['ocr_correct'] / counts['ocr_runs']
+    print(f"{len(index)} templates, {counts['indexed']} cards of indexed designs, {counts['negatives']} negatives")
+    for name, value in results.items():
+        print(f'{name:28s} {value:10.4f}')
+    print()
+    raise SystemExit(baseline.finish(results, args.save_baseline, args.compare, args.tolerance))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_metrics.py
+
+"""
+Measure the overhead of the stage instrumentation in src/metrics.py: the cost of one timed stage,
+with and without an active trace, and its share of classify_file on a small DOCX.
+
+Usage:
+    python -m benchmarks.bench_metrics [--iterations 200000]
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+import docx
+from werkzeug.datastructures import FileStorage
+from src import classifier, metrics
+from src.cache import get_result_cache
+from src.metrics import end_trace, stage, start_trace
+
+class _NoStage:
+    """A stand-in for metrics.stage that records nothing."""
+
+    __slots__ = ('kind',)
+
+    def __init__(self, name, kind=''):
+        self.kind = kind
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+def per_call(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+def empty_block():
+    with _NoStage('score', 'pdf'):
+        pass
+
+def timed_block():
+    with stage('score', 'pdf'):
+        pass
+
+def make_docx() -> bytes:
+    document = docx.Document()
+    document.add_paragraph('Invoice Number: 1. Bill To: ACME. Amount Due: $10.')
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description='Overhead of the per-stage metrics.')
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    baseline = per_call(empty_block, args.iterations)
+    timed = per_call(timed_block, args.iterations)
+    start_trace()
+    traced = per_call(timed_block, args.iterations)
+    end_trace()
+    print(f'stage block:       none {baseline * 1e9:7.0f} ns   timed {timed * 1e9:7.0f} ns   '
+          f'traced {traced * 1e9:7.0f} ns')
+
+    content = make_docx()
+    get_result_cache().max_entries = 0  # every call extracts and scores
+
+    def classify():
+        classifier.classify_file(FileStorage(stream=BytesIO(content), filename='invoice.docx'))
+
+    # Timing classify_file with and without stages differs by less than its run-to-run noise, so
+    # the overhead is estimated from the number of stages it records times the cost of one
+    iterations = max(1, args.iterations // 200)
+    per_call(classify, iterations)  # warm up
+    stages_before = sum(sum(counts) for counts, _ in metrics.STAGE_SECONDS._series.values())
+    elapsed = per_call(classify, iterations)
+    stages = (sum(sum(counts) for counts, _ in metrics.STAGE_SECONDS._series.values()) - stages_before) / iterations
+    overhead = stages * (timed - baseline)
+    print(f'classify_file:     {elapsed * 1e6:7.1f} us, {stages:.0f} stages   '
+          f'overhead {overhead * 1e6:5.2f} us ({overhead / elapsed * 100:.3f}%)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_ml_inference.py
+
+"""
+Measure per-document inference cost of the ML classifier (src/classifierMLExample.py), comparing
+the original preprocessing with the memoized one and one-document calls with batched calls.
+
+A small TF-IDF + logistic regression model is trained on synthetic texts into a temporary
+directory first. Requires scikit-learn and the NLTK stopwords corpus.
+
+Usage:
+    python -m benchmarks.bench_ml_inference [--docs 2000] [--words 400]
+"""
+
+import argparse
+import os
+import pickle
+import random
+import re
+import string
+import tempfile
+import time
+
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from src import classifierMLExample
+from src.classifier import DOCUMENT_PATTERNS
+from src.preprocessing import preprocess_text
+
+def preprocess_text_original(text):
+    """preprocess_text before the stopword set and stemmer were cached."""
+    text = text.lower()
+    text = re.sub(f'[{re.escape(string.punctuation)}]', '', text)
+    text = re.sub(r'\d+', '', text)
+    text = text.strip()
+    words = text.split()
+    stop_words = set(stopwords.words('english'))
+    words = [word for word in words if word not in stop_words]
+    stemmer = PorterStemmer()
+    words = [stemmer.stem(word) for word in words]
+    return ' '.join(words)
+
+FILLER = ('the customer account period total amount payment reference date number page '
+          'document section details address phone email signature record annual').split()
+
+def synthetic_corpus(docs: int, words: int, seed: int = 0):
+    """Texts built from each document type's keywords mixed into filler words."""
+    rng = random.Random(seed)
+    keywords = {doc_type: [re.sub(r'\\.|[^a-z ]', ' ', pattern) for pattern in patterns]
+                for doc_type, patterns in DOCUMENT_PATTERNS.items()}
+    texts, labels = [], []
+    for _ in range(docs):
+        label = rng.choice(list(keywords))
+        tokens = [rng.choice(keywords[label]) if rng.random() < 0.05 else rng.choice(FILLER)
+                  for _ in range(words)]
+        texts.append(' '.join(tokens) + f' {rng.randint(1, 10 ** 6)}')
+        labels.append(label)
+    return texts, labels
+
+def main():
+    parser = argparse.ArgumentParser(description='ML inference cost, single vs batch.')
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--words', type=int, default=400)
+    args = parser.parse_args()
+
+    texts, labels = synthetic_corpus(args.docs, args.words)
+    with tempfile.TemporaryDirectory() as model_dir:
+        vectorizer = TfidfVectorizer(max_features=5000)
+        model = LogisticRegression(max_iter=1000).fit(
+            vectorizer.fit_transform([preprocess_text(text) for text in texts]), labels)
+        for name, obj in (('vectorizer.pkl', vectorizer), ('model.pkl', model)):
+            with open(os.path.join(model_dir, name), 'wb') as f:
+                pickle.dump(obj, f)
+        classifierMLExample.unload_model()
+        classifierMLExample.load_model(model_dir)
+
+        start = time.perf_counter()
+        for text in texts:
+            preprocess_text_original(text)
+        original = (time.perf_counter() - start) / len(texts)
+        start = time.perf_counter()
+        for text in texts:
+            preprocess_text(text)
+        cached = (time.perf_counter() - start) / len(texts)
+        print(f'preprocess per doc:     original {original * 1e6:8.1f} us   cached {cached * 1e6:8.1f} us '
+              f'({original / cached:.1f}x)')
+
+        start = time.perf_counter()
+        single_labels = [classifierMLExample.classify_text(text) for text in texts]
+        single = (time.perf_counter() - start) / len(texts)
+        start = time.perf_counter()
+        batch_labels = classifierMLExample.classify_texts(texts)
+        batch = (time.perf_counter() - start) / len(texts)
+        assert single_labels == batch_labels
+        print(f'inference per doc:      single   {single * 1e6:8.1f} us   batch  {batch * 1e6:8.1f} us '
+              f'({single / batch:.1f}x)')
+
+if __name__ == '__main__':
+    main()
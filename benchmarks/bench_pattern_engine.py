@@ -0,0 +1,107 @@
+# benchmarks/bench_pattern_engine.py
+
+"""
+Compare the single-pass PatternEngine behind classify_text with the original implementation,
+which ran one re.findall per pattern over the whole text.
+
+Usage:
+    python -m benchmarks.bench_pattern_engine [--repeat 5]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from src.classifier import DOCUMENT_PATTERNS, classify_text
+from src.pattern_engine import PatternEngine
+
+
+def classify_text_findall(text: str) -> str:
+    """The original classify_text: one re.findall scan per pattern."""
+    text = text.lower()
+    scores = {key: 0 for key in DOCUMENT_PATTERNS.keys()}
+    for doc_type, doc_patterns in DOCUMENT_PATTERNS.items():
+        for pattern in doc_patterns:
+            scores[doc_type] += len(re.findall(pattern, text))
+    max_score = max(scores.values())
+    if max_score == 0:
+        return 'unknown'
+    top_classes = [doc_type for doc_type, score in scores.items() if score == max_score]
+    return top_classes[0] if len(top_classes) == 1 else 'ambiguous'
+
+
+FILLER_WORDS = (
+    'the of and to in for on with at by from date page total reference customer number '
+    'payment period opening closing deposit withdrawal fee interest card branch'
+).split()
+
+STATEMENT_LINES = [
+    'Bank Statement', 'Account Summary', 'Transaction History', 'Available Balance',
+]
+
+
+def synthetic_statement(size: int, seed: int = 0) -> str:
+    """Build a bank-statement-like text of roughly ``size`` characters."""
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.02:
+            line = rng.choice(STATEMENT_LINES)
+        else:
+            line = ' '.join(rng.choice(FILLER_WORDS) for _ in range(12)) + f' {rng.randint(1, 99999)}.{rng.randint(0, 99):02d}'
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)
+
+
+def random_rules(n_types: int, seed: int = 0) -> dict:
+    """Build ``n_types`` document types with four two-word patterns each."""
+    rng = random.Random(seed)
+
+    def word(low: int, high: int) -> str:
+        return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(low, high)))
+
+    return {f'type_{i}': [word(5, 9) + r'\s+' + word(4, 6) for _ in range(4)] for i in range(n_types)}
+
+
+def timeit(func, text: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'chars':>10} {'findall ms':>12} {'engine ms':>12} {'speedup':>8}  label")
+    for size in (10_000, 100_000, 1_000_000, 5_000_000):
+        text = synthetic_statement(size)
+        expected = classify_text_findall(text)
+        label = classify_text(text)
+        assert label == expected, (label, expected)
+        before = timeit(classify_text_findall, text, args.repeat)
+        after = timeit(classify_text, text, args.repeat)
+        print(f'{len(text):>10} {before * 1000:>12.2f} {after * 1000:>12.2f} {before / after:>7.1f}x  {label}')
+
+    # Scaling with the number of document types, over a 1M character text
+    text = synthetic_statement(1_000_000).lower()
+    print()
+    print(f"{'types':>10} {'findall ms':>12} {'engine ms':>12} {'speedup':>8}")
+    for n_types in (8, 64, 256):
+        rules = random_rules(n_types)
+        compiled = [re.compile(pattern) for patterns in rules.values() for pattern in patterns]
+        engine = PatternEngine(rules)
+        before = timeit(lambda t: [len(p.findall(t)) for p in compiled], text, args.repeat)
+        after = timeit(engine.scores, text, args.repeat)
+        print(f'{n_types:>10} {before * 1000:>12.2f} {after * 1000:>12.2f} {before / after:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/bench_suite.py
+
+"""
+Micro-benchmarks for the classification hot path over synthetic inputs of growing size:
+classify_text, classify_text2 and preprocess_text on texts, and each extractor on PDFs, DOCX files
+and images.
+
+Every case is timed in repeated batches and reported as the median and best time per call. Inputs
+are generated from a fixed seed, so runs are comparable; compare them with a saved baseline:
+
+    python -m benchmarks.bench_suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --compare benchmarks/baseline.json [--tolerance 0.2]
+
+Comparing exits with status 1 when a case got slower than the tolerance. Cases whose dependencies
+are missing (the NLTK stopwords for preprocess_text, the tesseract binary for images) are skipped.
+"""
+
+import argparse
+import random
+import re
+import statistics
+import time
+from io import BytesIO
+from typing import Callable, Dict, Iterator, Tuple
+
+import docx
+from PIL import Image, ImageDraw
+from werkzeug.datastructures import FileStorage
+from benchmarks import baseline
+from src.classifier import DOCUMENT_PATTERNS, classify_text, classify_text2
+from src.extractors import extract_text_from_docx, extract_text_from_image, extract_text_from_pdf
+from src.synthetic import text_pdf
+
+FILLER = ('the customer account period total amount payment reference date number page '
+          'document section details address phone email signature record annual').split()
+
+def synthetic_text(chars: int, seed: int = 0) -> str:
+    """Filler words with the keywords of one document type sprinkled in."""
+    rng = random.Random(seed)
+    keywords = [re.sub(r'\\.|[^a-z ]', ' ', pattern) for pattern in DOCUMENT_PATTERNS['bank_statement']]
+    words, length = [], 0
+    while length < chars:
+        word = rng.choice(keywords) if rng.random() < 0.02 else rng.choice(FILLER)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:chars]
+
+def synthetic_pdf(pages: int, seed: int = 0) -> bytes:
+    """A PDF with a text layer of about 40 lines per page."""
+    page_lines = []
+    for page in range(pages):
+        text = synthetic_text(40 * 80, seed + page)
+        page_lines.append([text[i:i + 80] for i in range(0, len(text), 80)])
+    return text_pdf(page_lines, font_size=9, leading=11)
+
+def synthetic_docx(paragraphs: int, seed: int = 0) -> bytes:
+    document = docx.Document()
+    for paragraph in range(paragraphs):
+        document.add_paragraph(synthetic_text(400, seed + paragraph))
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> bytes:
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    text = synthetic_text(width * height // 2000, seed)
+    line_chars = max(1, width // 8)
+    for row, start in enumerate(range(0, len(text), line_chars)):
+        draw.text((10, 10 + row * 14), text[start:start + line_chars], fill='black')
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+def _tesseract_available() -> bool:
+    import pytesseract
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def _preprocess() -> Callable[[str], str]:
+    from src.preprocessing import preprocess_text, stop_words
+    stop_words()  # raises LookupError when the corpus is not downloaded
+    return preprocess_text
+
+def cases(quick: bool) -> Iterator[Tuple[str, Callable[[], object]]]:
+    """Yield ``(name, call)`` for every benchmark case; inputs are built before timing."""
+    text_sizes = (1_000, 100_000) if quick else (1_000, 10_000, 100_000, 1_000_000)
+    for chars in text_sizes:
+        text = synthetic_text(chars)
+        yield f'classify_text/{chars}', lambda text=text: classify_text(text)
+        yield f'classify_text2/{chars}', lambda text=text: classify_text2(text)
+    try:
+        preprocess_text = _preprocess()
+    except LookupError:
+        print('skipping preprocess_text: NLTK stopwords corpus not available')
+    else:
+        for chars in text_sizes:
+            text = synthetic_text(chars)
+            yield f'preprocess_text/{chars}', lambda text=text: preprocess_text(text)
+
+    def extractor(extract, data, filename):
+        return lambda: extract(FileStorage(stream=BytesIO(data), filename=filename))
+
+    for pages in ((1, 10) if quick else (1, 10, 50)):
+        yield f'extract_pdf/{pages}p', extractor(extract_text_from_pdf, synthetic_pdf(pages), 'bench.pdf')
+    for paragraphs in ((10, 100) if quick else (10, 100, 1000)):
+        yield f'extract_docx/{paragraphs}par', extractor(extract_text_from_docx, synthetic_docx(paragraphs), 'bench.docx')
+    if not _tesseract_available():
+        print('skipping extract_image: tesseract is not installed')
+        return
+    for width, height in (((800, 600),) if quick else ((800, 600), (1600, 1200), (3200, 2400))):
+        yield (f'extract_image/{width}x{height}',
+               extractor(extract_text_from_image, synthetic_image(width, height), 'bench.jpg'))
+
+def measure(call: Callable[[], object], repeat: int, min_batch_time: float) -> Tuple[float, float]:
+    """Return the median and best seconds per call over ``repeat`` batches."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_batch_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_batch_time / elapsed) + 1))
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings), min(timings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the classification hot path.')
+    parser.add_argument('--quick', action='store_true', help='fewer and smaller inputs')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds per timed batch')
+    parser.add_argument('--save-baseline', help='write the results to this file')
+    parser.add_argument('--compare', help='compare the results with this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before failing')
+    args = parser.parse_args(argv)
+
+    results: Dict[str, float] = {}
+    for name, call in cases(args.quick):
+        if args.filter not in name:
+            continue
+        median, best = measure(call, args.repeat, args.min_time)
+        results[f'{name}/median_s'] = median
+        print(f'{name:32s} median {median * 1e3:10.3f} ms   best {best * 1e3:10.3f} ms')
+    print()
+    raise SystemExit(baseline.finish(results, args.save_baseline, args.compare, args.tolerance))
+
+if __name__ == '__main__':
+    main()
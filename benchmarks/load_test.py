@@ -0,0 +1,198 @@
+# benchmarks/load_test.py
+
+"""
+Replay a trace of uploads against the classifier at a target rate and report latency percentiles,
+throughput and peak memory.
+
+The trace is a JSON-lines file with one request per line:
+
+    {"file": "files/invoice_1.pdf", "route": "/classify_file", "params": {"detail": "true"}}
+
+Only ``file`` is required; ``route`` defaults to /classify_file. Without ``--trace``, every file
+under ``--files`` is replayed in turn.
+
+Requests are sent open-loop: request ``i`` is due at ``i / qps`` seconds whether or not earlier
+ones have finished, and its latency is measured from when it was due. A server that falls behind
+therefore shows up as growing latency, instead of silently lowering the offered load.
+
+By default the Flask app is driven in-process through its test client, and peak RSS is this
+process's. With ``--url`` a running server is targeted over HTTP; pass ``--server-pid`` to report
+that process's peak RSS (Linux only).
+
+Usage:
+    python -m benchmarks.load_test --files files/ --qps 20 --duration 30
+    python -m benchmarks.load_test --trace trace.jsonl --url http://127.0.0.1:5000 --qps 50 \\
+        --compare benchmarks/load_baseline.json
+"""
+
+import argparse
+import json
+import mimetypes
+import os
+import resource
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional
+from benchmarks import baseline
+
+def load_trace(trace_path: Optional[str], files_dir: Optional[str]) -> List[Dict]:
+    if trace_path:
+        with open(trace_path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    entries = []
+    for root, _, filenames in os.walk(files_dir):
+        for filename in sorted(filenames):
+            entries.append({'file': os.path.join(root, filename)})
+    return entries
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+def peak_rss_mb(pid: Optional[int] = None) -> float:
+    """Peak resident set size of ``pid``, or of this process and its reaped children."""
+    if pid is not None:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+    # ru_maxrss is in kilobytes on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+class InProcessClient:
+    """Sends requests through the Flask test client, one client per thread."""
+
+    def __init__(self):
+        from src.app import app
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, route: str, params: Dict, filename: str, content: bytes) -> int:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(route, query_string=params, content_type='multipart/form-data',
+                               data={'file': (BytesIO(content), filename)})
+        return response.status_code
+
+class HttpClient:
+    """Sends multipart requests to a running server."""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, route: str, params: Dict, filename: str, content: bytes) -> int:
+        boundary = uuid.uuid4().hex
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+        query = '?' + '&'.join(f'{key}={value}' for key, value in params.items()) if params else ''
+        request = urllib.request.Request(self.url + route + query, data=body, method='POST',
+                                         headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+def run(client, trace: List[Dict], qps: float, duration: float, concurrency: int) -> Dict[str, float]:
+    """
+    Send requests from ``trace`` (cycled) at ``qps`` for ``duration`` seconds.
+
+    Returns:
+        Dict[str, float]: Latency percentiles, throughput, error count and peak RSS.
+    """
+    contents: Dict[str, bytes] = {}
+    for entry in trace:
+        if entry['file'] not in contents:
+            with open(entry['file'], 'rb') as f:
+                contents[entry['file']] = f.read()
+
+    total = max(1, int(qps * duration))
+    latencies: List[float] = []
+    service_times: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def send(entry: Dict, due: float) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            status = client.post(entry.get('route', '/classify_file'), entry.get('params', {}),
+                                 os.path.basename(entry['file']), contents[entry['file']])
+        except Exception:
+            status = 0
+        finished = time.perf_counter()
+        with lock:
+            latencies.append(finished - due)
+            service_times.append(finished - started)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index in range(total):
+            due = start + index / qps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, trace[index % len(trace)], due)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': float(total),
+        'errors': float(errors),
+        'throughput_per_s': total / elapsed,
+        'latency_p50_s': percentile(latencies, 0.50),
+        'latency_p95_s': percentile(latencies, 0.95),
+        'latency_p99_s': percentile(latencies, 0.99),
+        'latency_max_s': latencies[-1],
+        'service_mean_s': statistics.fmean(service_times),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay uploads against the classifier at a target rate.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--trace', help='JSON-lines trace of requests')
+    source.add_argument('--files', help='replay every file under this directory')
+    parser.add_argument('--qps', type=float, default=10, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load')
+    parser.add_argument('--concurrency', type=int, default=64, help='maximum requests in flight')
+    parser.add_argument('--url', help='base URL of a running server (default: in-process app)')
+    parser.add_argument('--server-pid', type=int, help='report the peak RSS of this server process')
+    parser.add_argument('--timeout', type=float, default=120, help='HTTP timeout per request')
+    parser.add_argument('--save-baseline', help='write the results to this file')
+    parser.add_argument('--compare', help='compare the results with this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression before failing')
+    args = parser.parse_args(argv)
+
+    trace = load_trace(args.trace, args.files)
+    if not trace:
+        raise SystemExit('The trace is empty')
+    client = HttpClient(args.url, args.timeout) if args.url else InProcessClient()
+
+    results = run(client, trace, args.qps, args.duration, args.concurrency)
+    results['peak_rss_mb'] = peak_rss_mb(args.server_pid)
+    for name, value in results.items():
+        print(f'{name:20s} {value * 1e3:10.1f} ms' if name.endswith('_s') and not name.endswith('_per_s')
+              else f'{name:20s} {value:10.1f}')
+    print()
+    raise SystemExit(baseline.finish(results, args.save_baseline, args.compare, args.tolerance))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/server_startup.py
+
+"""
+Measure how long the production server takes to become ready and how much memory each worker adds.
+
+Starts ``python -m src.server`` on a free port, polls /readyz until it answers 200, optionally sends
+a few warm-up requests, then reads the memory of the master and of every worker from
+``/proc/<pid>/smaps_rollup`` (Linux only):
+
+- ``pss``: proportional set size, where pages shared copy-on-write are split between processes;
+- ``private``: pages only this process uses, i.e. what one more worker costs.
+
+    python -m benchmarks.server_startup --workers 4 [--files files/] [--save-baseline ...]
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List
+from benchmarks import baseline
+from benchmarks.load_test import HttpClient, load_trace
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """PSS and private memory of ``pid`` in megabytes."""
+    values = {'pss': 0, 'private': 0}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name == 'Pss':
+                values['pss'] += int(rest.split()[0])
+            elif name in ('Private_Clean', 'Private_Dirty'):
+                values['private'] += int(rest.split()[0])
+    return {name: kb / 1024 for name, kb in values.items()}
+
+def children(pid: int) -> List[int]:
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+def wait_ready(url: str, timeout: float) -> float:
+    """Poll ``url`` until it answers 200; returns the time that took."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:  # not listening yet, or still starting up
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f'{url} was not ready after {timeout}s')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time-to-ready and memory per worker of src.server.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--files', help='classify every file under this directory once per worker first')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--save-baseline', help='write the results to this file')
+    parser.add_argument('--compare', help='compare the results with this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression before failing')
+    args = parser.parse_args(argv)
+
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'src.server', '--bind', f'127.0.0.1:{port}',
+                               '--workers', str(args.workers), '--threads', str(args.threads)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(url + '/readyz', args.timeout)
+        results = {'time_to_ready_s': time.perf_counter() - start}
+        if args.files:
+            client = HttpClient(url, args.timeout)
+            for entry in load_trace(None, args.files) * args.workers:
+                with open(entry['file'], 'rb') as f:
+                    client.post('/classify_file', {}, os.path.basename(entry['file']), f.read())
+
+        workers = [memory_mb(pid) for pid in children(server.pid)]
+        master = memory_mb(server.pid)
+        results['master_pss_mb'] = master['pss']
+        results['worker_pss_mb'] = sum(worker['pss'] for worker in workers) / len(workers)
+        results['worker_private_mb'] = sum(worker['private'] for worker in workers) / len(workers)
+        results['total_pss_mb'] = master['pss'] + sum(worker['pss'] for worker in workers)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=args.timeout)
+
+    for name, value in results.items():
+        print(f'{name:20s} {value:10.3f}')
+    print()
+    raise SystemExit(baseline.finish(results, args.save_baseline, args.compare, args.tolerance))
+
+if __name__ == '__main__':
+    main()
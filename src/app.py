@@ -1,19 +1,172 @@
 # src/app.py
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from src.classifier import classify_file
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import hmac
+import time
+import uuid
+import contextvars
+import shutil
 import logging  
+from typing import Tuple
+
+from .classifier import classification_details, classify_file, pinned_engine
+from .cascade import classify_file_cascade
+from .jobs import InvalidCallback, JobQueue, QueueFull, check_callback_url
+from .rule_registry import RuleError, get_rule_registry
+from .file_types import detect_kind, supported_extensions
+from .cache import get_result_cache
+from .near_duplicates import get_near_duplicate_index
+from .scheduler import BATCH, INTERACTIVE, SchedulerBusy, get_scheduler, scheduling_priority
+from .extractors import PDF_TIER_COUNTS
+from .metrics import REGISTRY, REQUEST_SECONDS, UPLOAD_REJECTIONS, end_trace, server_timing, start_trace
+from .lifecycle import WARMUP_REPORT, is_draining, is_ready, warm_up
+from .uploads import MAX_INFLIGHT_BYTES, MAX_UPLOAD_BYTES, ByteBudget, SpooledUpload, UploadRequest
 
-from .classifier import classify_file
 app = Flask(__name__)
 
-ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'docx'}
+# Extensions of the formats registered in file_types.py; uploads are sniffed, these are only a hint
+ALLOWED_EXTENSIONS = supported_extensions()
+
+# Limits for the /classify_files batch endpoint
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', 500))
+MAX_BATCH_BYTES = int(os.environ.get('MAX_BATCH_BYTES', 256 * 1024 * 1024))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', min(32, (os.cpu_count() or 1) * 2)))
+
+class ClassifierRequest(UploadRequest):
+    @property
+    def max_content_length(self):
+        # Batches carry many files, so they get a limit of their own
+        if self.endpoint == 'classify_files_route':
+            return MAX_BATCH_BYTES
+        return super().max_content_length
+
+# Single-file uploads are limited to MAX_UPLOAD_BYTES and batches to MAX_BATCH_BYTES
+app.request_class = ClassifierRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# Shared by all batch requests so concurrent batches cannot oversubscribe the host
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='classify-batch')
+
+# Uploads of queued jobs are copied out of the request; larger ones are spooled to disk. Copies kept
+# in memory are charged to the upload budget until their job finishes, and spooled too when it is spent
+JOB_SPOOL_MAX_MEMORY = int(os.environ.get('JOB_SPOOL_MAX_MEMORY', 1024 * 1024))
+# Seconds clients are asked to wait when the job queue is full
+JOB_RETRY_AFTER = int(os.environ.get('JOB_RETRY_AFTER', 5))
+
+def _run_job(upload: Tuple[FileStorage, int]) -> str:
+    """Classify the copy of a job's upload, then release it and the upload budget it holds."""
+    file, reserved = upload
+    try:
+        return classify_file(file)
+    finally:
+        file.close()
+        if reserved:
+            upload_budget.release(reserved)
+
+job_queue = JobQueue(_run_job)
+
+# Request bodies being handled at once; uploads that do not fit are refused with 503
+upload_budget = ByteBudget(MAX_INFLIGHT_BYTES)
+UPLOAD_RETRY_AFTER = int(os.environ.get('UPLOAD_RETRY_AFTER', 2))
+# Seconds clients are asked to wait when classifications are refused for lack of extractor slots
+SCHEDULER_RETRY_AFTER = int(os.environ.get('SCHEDULER_RETRY_AFTER', 5))
+
+# Add Server-Timing and X-Request-ID headers to every response; otherwise only when the request
+# sends "X-Trace: 1"
+TRACE_HEADERS = os.environ.get('TRACE_HEADERS', '').lower() in ('1', 'true', 'yes')
+
+# Shared secret for the /admin endpoints, sent in the X-Admin-Token header; unset disables them
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+@app.before_request
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    if TRACE_HEADERS or request.headers.get('X-Trace', '').lower() in ('1', 'true', 'yes'):
+        g.trace = start_trace()
 
-def allowed_file(filename: str) -> bool:
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+@app.before_request
+def reserve_upload_budget():
+    """Refuse bodies over the request's limit, then reserve their size in the shared upload budget."""
+    limit = request.max_content_length
+    size = request.content_length
+    if size is None and request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        # The size is unknown until the body is read, which the limit cuts short
+        size = limit
+    if not size:
+        return None
+    if limit is not None and size > limit:
+        UPLOAD_REJECTIONS.inc('too_large')
+        return jsonify({"error": f"Upload exceeds {limit} bytes"}), 413
+    if not upload_budget.acquire(size):
+        UPLOAD_REJECTIONS.inc('busy')
+        return (jsonify({"error": "Too many uploads in progress, retry later"}), 503,
+                {"Retry-After": str(UPLOAD_RETRY_AFTER)})
+    g.upload_reserved = size
+    return None
+
+@app.teardown_request
+def release_upload_budget(exc):
+    reserved = g.pop('upload_reserved', 0)
+    if reserved:
+        upload_budget.release(reserved)
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    # A chunked body that turned out larger than the limit
+    UPLOAD_REJECTIONS.inc('too_large')
+    return jsonify({"error": f"Upload exceeds {request.max_content_length} bytes"}), 413
+
+@app.after_request
+def record_request_timing(response):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, route, str(response.status_code))
+    trace = g.pop('trace', None)
+    if trace is not None:
+        end_trace()
+        response.headers['Server-Timing'] = server_timing(trace)
+        response.headers['X-Request-ID'] = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    return response
+
+def _collect_stats():
+    """Report the statistics of the caches, the PDF extractor, the job queue and the scheduler at each scrape."""
+    for name, value in get_result_cache().stats().items():
+        if name == 'size':
+            yield 'classifier_result_cache_size', 'gauge', 'Result cache entries in memory.', {}, value
+        else:
+            yield f'classifier_result_cache_{name}_total', 'counter', f'Result cache {name}.', {}, value
+    index = get_near_duplicate_index()
+    if index is not None:
+        for name, value in index.stats().items():
+            if name == 'size':
+                yield 'classifier_near_duplicate_index_size', 'gauge', 'Documents in the near-duplicate index.', {}, value
+            else:
+                yield f'classifier_near_duplicate_{name}_total', 'counter', f'Near-duplicate index {name}.', {}, value
+    for tier, count in sorted(PDF_TIER_COUNTS.items()):
+        yield 'classifier_pdf_tier_total', 'counter', 'PDFs extracted per tier.', {'tier': tier}, count
+    for name, value in job_queue.stats().items():
+        yield f'classifier_jobs_{name}', 'gauge', f'Job queue {name}.', {}, value
+    scheduler = get_scheduler()
+    for pool, stats in sorted(scheduler.stats().items()):
+        for name, value in stats.items():
+            yield f'classifier_scheduler_{name}', 'gauge', f'Scheduler slots {name} per extractor class.', {'pool': pool}, value
+    yield 'classifier_scheduler_inflight', 'gauge', 'Distinct classifications scheduled.', {}, scheduler.inflight
+    yield 'classifier_upload_inflight_bytes', 'gauge', 'Request body bytes being handled.', {}, upload_budget.in_use
+
+REGISTRY.register_collector(_collect_stats)
+
+def allowed_file(file: FileStorage) -> bool:
+    # The content decides: a PDF named scan.bin, or with no extension at all, is accepted. The
+    # extension is only a hint, letting damaged files of a supported type through to be reported
+    if detect_kind(file) is not None:
+        return True
+    return '.' in file.filename and \
+           file.filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @app.route('/classify_file', methods=['POST'])
 def classify_file_route():
@@ -31,15 +184,149 @@ def classify_file_route():
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
-    if file and allowed_file(file.filename):
+    if file and allowed_file(file):
         try:
-            file_class = classify_file(file)
-            return jsonify({"file_class": file_class}), 200
+            # ?detail=true adds the confidence, deciding tier and per-tier latency
+            if request.args.get('detail', '').lower() in ('1', 'true', 'yes'):
+                with scheduling_priority(INTERACTIVE):
+                    return jsonify(classify_file_cascade(file)), 200
+            # Labels reused from a near-duplicate say which document they come from
+            with classification_details() as details, scheduling_priority(INTERACTIVE):
+                file_class = classify_file(file)
+            return jsonify({"file_class": file_class, **details}), 200
+        except SchedulerBusy as e:
+            return (jsonify({"error": f"Too many classifications in progress, retry later ({e})"}), 503,
+                    {"Retry-After": str(SCHEDULER_RETRY_AFTER)})
         except Exception as e:
             logging.error(f"Error processing file {file.filename}: {e}")
             return jsonify({"file_class": "error processing file"}), 200
     else:
         return jsonify({"error": "File type not allowed"}), 400
 
+def _classify_batch_item(file) -> dict:
+    """Classify one file of a batch, reporting errors per file instead of failing the batch."""
+    result = {"filename": file.filename, "file_class": None, "error": None}
+    start = time.perf_counter()
+    if file.filename == '':
+        result["error"] = "No selected file"
+    elif not allowed_file(file):
+        result["error"] = "File type not allowed"
+    else:
+        try:
+            with classification_details() as details, scheduling_priority(BATCH):
+                result["file_class"] = classify_file(file)
+            result.update(details)
+        except SchedulerBusy as e:
+            result["error"] = f"Too many classifications in progress, retry later ({e})"
+        except Exception as e:
+            logging.error(f"Error processing file {file.filename}: {e}")
+            result["file_class"] = "error processing file"
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+@app.route('/classify_files', methods=['POST'])
+def classify_files_route():
+    files = request.files.getlist('file')
+    if not files:
+        return jsonify({"error": "No file part in the request"}), 400
+    if len(files) > MAX_BATCH_FILES:
+        return jsonify({"error": f"Batch exceeds {MAX_BATCH_FILES} files"}), 413
+
+    start = time.perf_counter()
+    # Worker threads start from an empty context, so each file runs in a copy of the request's: its
+    # trace, and the rules pinned for the whole batch
+    with pinned_engine():
+        futures = [_batch_executor.submit(contextvars.copy_context().run, _classify_batch_item, file)
+                   for file in files]
+    results = [future.result() for future in futures]
+    return jsonify({
+        "results": results,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }), 200
+
+@app.route('/jobs', methods=['POST'])
+def submit_job_route():
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part in the request"}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+    if not allowed_file(file):
+        return jsonify({"error": "File type not allowed"}), 400
+
+    callback_url = request.form.get('callback_url')
+    if callback_url:
+        try:
+            check_callback_url(callback_url)
+        except InvalidCallback as e:
+            return jsonify({"error": str(e)}), 400
+
+    # The request's upload is closed once we respond, so the job gets its own copy, in memory if it is
+    # small and fits in the upload budget
+    size = file.stream.seek(0, os.SEEK_END)
+    reserved = size if size <= JOB_SPOOL_MAX_MEMORY and upload_budget.acquire(size) else 0
+    spool = SpooledUpload(JOB_SPOOL_MAX_MEMORY if reserved else 0)
+    file.stream.seek(0)
+    shutil.copyfileobj(file.stream, spool)
+    spool.seek(0)
+    try:
+        job = job_queue.submit((FileStorage(stream=spool, filename=file.filename), reserved), callback_url)
+    except QueueFull as e:
+        spool.close()
+        if reserved:
+            upload_budget.release(reserved)
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(JOB_RETRY_AFTER)}
+    return jsonify(job.to_dict()), 202, {"Location": f"/jobs/{job.id}"}
+
+@app.route('/jobs/stats', methods=['GET'])
+def job_stats_route():
+    return jsonify(job_queue.stats()), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_route(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/healthz', methods=['GET'])
+def health_route():
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/readyz', methods=['GET'])
+def ready_route():
+    if is_ready():
+        return jsonify({"status": "ready", "warm_up": WARMUP_REPORT}), 200
+    status = "draining" if is_draining() else "warming up"
+    return jsonify({"status": status, "warm_up": WARMUP_REPORT}), 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def _admin_forbidden() -> bool:
+    return not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+@app.route('/admin/rules', methods=['GET'])
+def rules_route():
+    if _admin_forbidden():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(get_rule_registry().info()), 200
+
+@app.route('/admin/rules/reload', methods=['POST'])
+def reload_rules_route():
+    if _admin_forbidden():
+        return jsonify({"error": "Forbidden"}), 403
+    registry = get_rule_registry()
+    try:
+        reloaded = registry.reload()
+    except RuleError as e:
+        # The rules in effect are kept
+        return jsonify({"error": str(e), "version": registry.engine.version}), 422
+    return jsonify(dict(registry.info(), reloaded=reloaded)), 200
+
 if __name__ == '__main__':
+    # Development server; use src/server.py in production
+    warm_up()
     app.run(debug=True)
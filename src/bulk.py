@@ -0,0 +1,275 @@
+# src/bulk.py
+
+"""
+Classify a backfill of documents offline, without going through the HTTP API:
+
+    python -m src.bulk dump/ scans.zip 2026-10.tar.gz --output labels.jsonl [--workers 8]
+
+Sources are directories, single files, zip archives and tar archives (plain or compressed). Archive
+members are read straight from the archive, never unpacking it: zip members are read by the worker
+that classifies them, tar members by the main process as the archive streams past. Stored zip
+members are read in place; compressed ones are decompressed once, into memory, or above
+``BULK_MEMBER_MAX_MEMORY`` into a temporary file deleted once the member is classified. Every file
+goes through ``classify_file``, so labels, content-based routing and caching are the same as the API's.
+
+Files are classified on a pool of ``--workers`` processes, all CPUs by default. Rules and parsing
+libraries are loaded once before the pool is forked (see lifecycle.py), and a bounded number of
+files is in flight at a time, so memory stays flat however large the backfill is.
+
+Results are appended to ``--output`` as they complete, as JSON lines or as CSV when the name ends
+in .csv. Running the same command again after a crash skips the files already in the output and
+carries on. Progress and throughput are reported on stderr.
+"""
+
+import io
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import logging
+import tarfile
+import zipfile
+import argparse
+import posixpath
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Set
+from werkzeug.datastructures import FileStorage
+from .classifier import classifier_version, classify_file
+from .lifecycle import warm_up
+from .uploads import SpooledUpload
+
+ZIP_EXTENSIONS = ('.zip',)
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+CSV_FIELDS = ('file', 'file_class', 'bytes', 'elapsed_ms')
+
+# Files submitted to the pool per worker before waiting for results
+BULK_INFLIGHT_PER_WORKER = int(os.environ.get('BULK_INFLIGHT_PER_WORKER', 4))
+# Compressed zip members up to this size are decompressed into memory; larger ones into a temporary file
+BULK_MEMBER_MAX_MEMORY = int(os.environ.get('BULK_MEMBER_MAX_MEMORY', 64 * 1024 * 1024))
+
+class Entry(NamedTuple):
+    """A file to classify: its name in the output and where to read it from."""
+    name: str
+    path: str
+    # The member of the archive at ``path``, if any
+    member: Optional[str] = None
+    # The content, for tar members, which can only be read in archive order
+    data: Optional[bytes] = None
+
+def _skipped(name: str) -> bool:
+    """Hidden files and the resource forks macOS adds to zips are not documents."""
+    return posixpath.basename(name).startswith('.') or name.startswith('__MACOSX/')
+
+def iter_entries(source: str, done: Set[str] = frozenset()) -> Iterator[Entry]:
+    """
+    Yield every file of ``source`` whose name is not in ``done``.
+
+    Args:
+        source (str): A directory, a zip or tar archive, or a single file.
+        done (Set[str]): Names of files already classified.
+
+    Yields:
+        Entry: The files in a stable order: sorted for directories, archive order for archives.
+    """
+    lowered = source.lower()
+    if os.path.isdir(source):
+        for root, directories, filenames in os.walk(source):
+            directories.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(root, filename)
+                if not _skipped(filename) and path not in done:
+                    yield Entry(path, path)
+    elif lowered.endswith(ZIP_EXTENSIONS):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                name = f'{source}!{info.filename}'
+                if not info.is_dir() and not _skipped(info.filename) and name not in done:
+                    yield Entry(name, source, info.filename)
+    elif lowered.endswith(TAR_EXTENSIONS):
+        # Stream mode reads compressed tars in a single pass without seeking
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                name = f'{source}!{member.name}'
+                if member.isfile() and not _skipped(member.name) and name not in done:
+                    yield Entry(name, source, member.name, archive.extractfile(member).read())
+    elif source not in done:
+        yield Entry(source, source)
+
+# Zip archives opened by this process, by path
+_archives: Dict[str, zipfile.ZipFile] = {}
+
+def _open(entry: Entry):
+    if entry.data is not None:
+        return io.BytesIO(entry.data)
+    if entry.member is None:
+        return open(entry.path, 'rb')
+    archive = _archives.get(entry.path)
+    if archive is None:
+        archive = _archives[entry.path] = zipfile.ZipFile(entry.path)
+    info = archive.getinfo(entry.member)
+    member = archive.open(info)
+    if info.compress_type == zipfile.ZIP_STORED:
+        # Stored members are read, and seeked, in place
+        return member
+    # Seeking back in a compressed member decompresses it again from the start, and the parsers jump
+    # around, so compressed members are decompressed once: into memory, or a temporary file if large
+    with member:
+        if info.file_size <= BULK_MEMBER_MAX_MEMORY:
+            return io.BytesIO(member.read())
+        spool = SpooledUpload(0)
+        shutil.copyfileobj(member, spool)
+    spool.seek(0)
+    return spool
+
+def classify_entry(entry: Entry) -> dict:
+    """Classify one file; returns its output record."""
+    start = time.perf_counter()
+    size = 0
+    try:
+        with _open(entry) as stream:
+            size = stream.seek(0, os.SEEK_END)
+            stream.seek(0)
+            filename = posixpath.basename(entry.member or entry.path.replace(os.sep, '/'))
+            file_class = classify_file(FileStorage(stream=stream, filename=filename))
+    except Exception as e:
+        logging.error(f"Error reading {entry.name}: {e}")
+        file_class = 'error processing file'
+    return {
+        'file': entry.name,
+        'file_class': file_class,
+        'bytes': size,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+    }
+
+def completed_files(path: str, csv_format: bool) -> Set[str]:
+    """
+    Return the names of the files already in the output at ``path``.
+
+    A last line left incomplete by a crash is cut off, so appending continues on a clean line.
+    """
+    done = set()
+    with open(path, 'rb+') as f:
+        end = 0
+        lines = []
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            end += len(line)
+            lines.append(line.decode('utf-8'))
+        f.truncate(end)
+    if csv_format:
+        done.update(row['file'] for row in csv.DictReader(lines))
+    else:
+        done.update(json.loads(line)['file'] for line in lines if line.strip())
+    return done
+
+class Progress:
+    """Prints the number of files done and the throughput to stderr every ``interval`` seconds."""
+
+    def __init__(self, interval: float, skipped: int = 0, stream=sys.stderr):
+        self.interval = interval
+        self.skipped = skipped
+        self.stream = stream
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def update(self, record: dict) -> None:
+        self.files += 1
+        self.bytes += record['bytes']
+        self.errors += record['file_class'] == 'error processing file'
+        now = time.perf_counter()
+        if self.interval > 0 and now - self._last >= self.interval:
+            self._last = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        skipped = f" ({self.skipped} already done)" if self.skipped else ""
+        print(f"{self.files} files{skipped} in {elapsed:.1f}s: {self.files / elapsed:.1f} files/s, "
+              f"{self.bytes / elapsed / 1e6:.1f} MB/s, {self.errors} errors", file=self.stream)
+
+def _classified(entries: Iterable[Entry], workers: int) -> Iterator[dict]:
+    """Classify ``entries`` on ``workers`` processes, yielding records in completion order."""
+    if workers <= 1:
+        for entry in entries:
+            yield classify_entry(entry)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for entry in entries:
+            if len(pending) >= workers * BULK_INFLIGHT_PER_WORKER:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+            pending.add(executor.submit(classify_entry, entry))
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield future.result()
+
+def bulk_classify(sources: Iterable[str], output: Optional[str] = None, workers: int = None,
+                  progress_interval: float = 5.0) -> Counter:
+    """
+    Classify every file of ``sources``, appending one record per file to ``output``.
+
+    Args:
+        sources (Iterable[str]): Directories, archives and files.
+        output (str, optional): JSON-lines or .csv file to append to; files already in it are
+            skipped. Defaults to writing JSON lines to stdout.
+        workers (int, optional): Classifier processes. Defaults to the number of CPUs.
+        progress_interval (float): Seconds between progress lines; 0 disables them.
+
+    Returns:
+        Counter: The number of files per label classified by this run.
+    """
+    workers = workers or os.cpu_count() or 1
+    csv_format = bool(output) and output.lower().endswith('.csv')
+    done = completed_files(output, csv_format) if output and os.path.exists(output) else set()
+    out = open(output, 'a', newline='', encoding='utf-8') if output else sys.stdout
+    writer = csv.DictWriter(out, CSV_FIELDS) if csv_format else None
+    if writer is not None and out.tell() == 0:
+        writer.writeheader()
+
+    # Load rules and libraries once, before the pool forks
+    warm_up()
+    labels = Counter()
+    progress = Progress(progress_interval, skipped=len(done))
+    entries = (entry for source in sources for entry in iter_entries(source, done))
+    try:
+        for record in _classified(entries, workers):
+            labels[record['file_class']] += 1
+            if writer is not None:
+                writer.writerow(record)
+            else:
+                out.write(json.dumps(record) + '\n')
+            # Every record is on disk before the next, so a crash loses at most the ones in flight
+            out.flush()
+            progress.update(record)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if progress_interval > 0:
+        progress.report()
+    return labels
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Classify directories and archives of documents.')
+    parser.add_argument('sources', nargs='+', help='directories, zip or tar archives, or files')
+    parser.add_argument('--output', help='JSON-lines or .csv file to append to (resumes); default stdout')
+    parser.add_argument('--workers', type=int, default=None, help='classifier processes (default: all CPUs)')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='seconds between progress lines')
+    args = parser.parse_args(argv)
+
+    labels = bulk_classify(args.sources, args.output, args.workers, args.progress_interval)
+    print(f"Classified {sum(labels.values())} files with {classifier_version()}", file=sys.stderr)
+    for file_class, count in labels.most_common():
+        print(f"  {file_class}: {count}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
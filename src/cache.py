@@ -0,0 +1,179 @@
+# src/cache.py
+
+"""
+Result Cache Module
+===================
+
+Byte-identical re-uploads are common (client retries, the same statement forwarded by several
+clients), so classification results are cached by a hash of the uploaded bytes. The key also
+includes the classifier version, so changing the rules invalidates old entries automatically.
+
+The cache has two tiers:
+
+- an in-memory LRU tier, bounded by entry count and TTL;
+- an optional SQLite tier that survives restarts, enabled by setting ``RESULT_CACHE_PATH``. Every
+  ``RESULT_CACHE_PURGE_EVERY`` writes, and when it is opened, expired rows are deleted and the
+  oldest ones beyond ``RESULT_CACHE_DISK_ENTRIES``, so the file does not grow without bound.
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from werkzeug.datastructures import FileStorage
+
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 10000))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 24 * 60 * 60))
+RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH')
+# Rows kept in the SQLite tier; the oldest are deleted beyond it
+RESULT_CACHE_DISK_ENTRIES = int(os.environ.get('RESULT_CACHE_DISK_ENTRIES', 1000000))
+# Writes to the SQLite tier between purges of expired and excess rows
+RESULT_CACHE_PURGE_EVERY = int(os.environ.get('RESULT_CACHE_PURGE_EVERY', 1000))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+def content_hash(file: FileStorage) -> str:
+    """
+    Compute the SHA-256 of an uploaded file without loading it into memory at once.
+
+    The stream is rewound before and after hashing, so the file can still be read by the extractors.
+
+    Args:
+        file (FileStorage): The uploaded file.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    A two-tier cache of classification results.
+
+    Parameters:
+        max_entries (int): Maximum number of entries in the memory tier.
+        ttl (float): Seconds an entry stays valid, in both tiers.
+        path (str, optional): SQLite database file for the persistent tier.
+        max_disk_entries (int): Maximum number of rows in the persistent tier.
+        purge_every (int): Writes to the persistent tier between purges.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL,
+                 path: Optional[str] = RESULT_CACHE_PATH, max_disk_entries: int = RESULT_CACHE_DISK_ENTRIES,
+                 purge_every: int = RESULT_CACHE_PURGE_EVERY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, created REAL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_created ON results (created)')
+            self._db.commit()
+            with self._lock:
+                self._purge()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for ``key``, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if now - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return value
+                del self._entries[key]
+                self._counters['expirations'] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, created FROM results WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self._store(key, row[0], row[1])
+                    self._counters['hits'] += 1
+                    self._counters['disk_hits'] += 1
+                    return row[0]
+
+            self._counters['misses'] += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store ``value`` under ``key`` in every tier."""
+        created = time.time()
+        with self._lock:
+            self._store(key, value, created)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)',
+                    (key, value, created),
+                )
+                self._db.commit()
+                self._writes += 1
+                if self._writes >= self.purge_every:
+                    self._purge()
+
+    def _purge(self) -> None:
+        """Delete expired rows, then the oldest beyond ``max_disk_entries``. Caller holds the lock."""
+        self._writes = 0
+        self._db.execute('DELETE FROM results WHERE created < ?', (time.time() - self.ttl,))
+        excess = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created LIMIT ?)', (excess,)
+            )
+        self._db.commit()
+
+    def _store(self, key: str, value: str, created: float) -> None:
+        """Insert into the memory tier, evicting the least recently used entries. Caller holds the lock."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def clear(self) -> None:
+        """Drop the entries of every tier and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+            if self._db is not None:
+                self._db.execute('DELETE FROM results')
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the current memory tier size."""
+        with self._lock:
+            return dict(self._counters, size=len(self._entries))
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    """Return the shared result cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
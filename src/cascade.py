@@ -0,0 +1,180 @@
+# src/cascade.py
+
+"""
+Cascade Classifier Module
+=========================
+
+Most documents can be labelled from the keywords on their first page, so classifying them does not
+need every page parsed, nor the ML model. The cascade runs cheap tiers first and only escalates when
+the result is uncertain:
+
+1. ``first_page``: the keyword check of ``classify_text2`` and the pattern scorer of
+   ``classify_text`` on the first page of text (the text layer of the first PDF page, never OCR'd;
+   the whole text for other kinds).
+2. ``full_text``: the pattern scorer on the full extraction, with every PDF page and OCR for pages
+   without a text layer. Skipped for kinds where the first tier already saw the full text. Scanned
+   PDFs, whose first page has no text layer, start here.
+3. ``ml``: the trained model from classifierMLExample.py, when one is available.
+
+A tier decides when its label is a real document type and either the pattern score margin is at
+least ``CASCADE_MARGIN``, or the keyword check agrees with the pattern scorer. If no tier decides,
+the most confident result is returned.
+
+Confidence for the pattern tiers is the score margin relative to the top score (1 when only one type
+matched); for the ML tier it is the model's probability for the predicted class.
+
+Cascade classifications go through the same machinery as ``classify_file``: results are cached by
+content hash and classifier version (rules, extractors, model and templates), uploads that missed
+the cache run in the scheduler's pool for their extractor class and are coalesced with identical
+ones in progress, full texts are read from and saved to the text store, and labels are counted in
+``classifier_results_total``.
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, Optional, Tuple
+from werkzeug.datastructures import FileStorage
+from .cache import content_hash, get_result_cache
+from .classifier import (classifier_version, classify_text2, file_kind, pinned_engine, run_extractor,
+                         score_text)
+from .metrics import RESULTS
+from .pattern_engine import PatternEngine
+from .scheduler import get_scheduler
+from .text_store import get_text_store
+
+# Pattern score lead over the runner-up at which a tier decides on its own
+CASCADE_MARGIN = float(os.environ.get('CASCADE_MARGIN', 3))
+# Probability at which the ML tier decides
+CASCADE_ML_MIN_CONFIDENCE = float(os.environ.get('CASCADE_ML_MIN_CONFIDENCE', 0.6))
+
+_UNDECIDED = ('unknown', 'ambiguous')
+
+def _pattern_result(text: str) -> Tuple[str, float, float]:
+    """Return the pattern label, its confidence and its score margin for ``text``."""
+    scores = score_text(text)
+    label = PatternEngine.decide(scores)
+    top = max(scores.values(), default=0)
+    margin = PatternEngine.lead(scores)
+    return label, (margin / top if top else 0.0), margin
+
+def _ml_result(text: str) -> Optional[Tuple[str, float]]:
+    """Return the ML label and probability, or None if no model is available."""
+    try:
+        from . import classifierMLExample
+        return classifierMLExample.classify_texts_with_confidence([text])[0]
+    except (ImportError, OSError, LookupError) as e:
+        logging.info(f"ML tier unavailable: {e}")
+        return None
+
+def _full_text(kind: str, file: FileStorage, file_hash: str) -> str:
+    """Return the full text of a file from the text store, extracting and storing it if it is not there."""
+    store = get_text_store()
+    text = store.get(file_hash) if store is not None else None
+    if text is None:
+        text = run_extractor(kind, file, stop_when=None)
+        if store is not None:
+            store.put(file_hash, kind, file.filename, text)
+    return text
+
+def _cascade(kind: str, file: FileStorage, file_hash: str) -> Dict:
+    """Run the tiers on a file that missed the result cache."""
+    latency = {}
+
+    def timed(tier: str, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            latency[tier] = round((time.perf_counter() - start) * 1000, 3)
+
+    def result(label: str, confidence: float, tier: str) -> Dict:
+        return {"file_class": label, "confidence": round(confidence, 4), "tier": tier, "latency_ms": latency}
+
+    try:
+        # Tier 1: keywords and patterns on the first page, which is the full text for kinds other than PDF
+        def first_page():
+            if kind == 'pdf':
+                # Only the text layer: OCR is the full_text tier's job
+                text = run_extractor(kind, file, max_pages=1, stop_when=None, ocr=False)
+            else:
+                text = _full_text(kind, file, file_hash)
+            if not text.strip():
+                return text, None
+            return text, (classify_text2(text), _pattern_result(text))
+
+        text, first = timed('first_page', first_page)
+        best = ('unknown', 0.0, 'first_page')
+        if first is not None:
+            keyword_label, (label, confidence, margin) = first
+            best = (label, confidence, 'first_page')
+            if label not in _UNDECIDED and (margin >= CASCADE_MARGIN or keyword_label == label):
+                return result(label, confidence, 'first_page')
+
+        # Tier 2: every page, OCR included
+        if kind == 'pdf':
+            def full_text():
+                full = _full_text(kind, file, file_hash)
+                return full, _pattern_result(full)
+
+            text, (label, confidence, margin) = timed('full_text', full_text)
+            if label not in _UNDECIDED and confidence >= best[1]:
+                best = (label, confidence, 'full_text')
+            if label not in _UNDECIDED and margin >= CASCADE_MARGIN:
+                return result(label, confidence, 'full_text')
+
+        # Tier 3: the ML model
+        ml = timed('ml', _ml_result, text)
+        if ml is not None:
+            ml_label, probability = ml
+            if probability >= CASCADE_ML_MIN_CONFIDENCE or best[0] in _UNDECIDED:
+                return result(ml_label, probability, 'ml')
+
+        return result(*best)
+
+    except Exception as e:
+        logging.error(f"Error processing file {file.filename}: {e}")
+        return result('error processing file', 0.0, None)
+
+def classify_file_cascade(file: FileStorage) -> Dict:
+    """
+    Classify an uploaded file with the cheapest tier that is confident.
+
+    Parameters:
+        file (FileStorage): The file uploaded by the user.
+
+    Returns:
+        Dict: ``file_class``, ``confidence`` (0 to 1), ``tier`` (the tier that decided) and
+        ``latency_ms`` (time spent in each tier that ran, extraction included; empty for cached results).
+
+    Raises:
+        SchedulerBusy: If the file missed the cache and no slot could be had for it.
+    """
+    kind = file_kind(file)
+    if kind is None:
+        RESULTS.inc('unsupported file type')
+        return {"file_class": 'unsupported file type', "confidence": 0.0, "tier": None, "latency_ms": {}}
+
+    with pinned_engine():
+        cache = get_result_cache()
+        file_hash = content_hash(file)
+        cache_key = f'cascade:{classifier_version()}:{kind}:{file_hash}'
+        cached = cache.get(cache_key)
+        if cached is not None:
+            result = dict(json.loads(cached), latency_ms={})
+        else:
+            def run() -> Dict:
+                # An identical upload may have been classified while this one waited for a slot
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return dict(json.loads(cached), latency_ms={})
+                result = _cascade(kind, file, file_hash)
+                if result['tier'] is not None:
+                    cache.set(cache_key, json.dumps({key: result[key] for key in ('file_class', 'confidence', 'tier')}))
+                return result
+
+            # Coalesced classifications share the result, so each gets its own copy
+            result = dict(get_scheduler().run(cache_key, kind, run))
+    RESULTS.inc(result['file_class'])
+    return result
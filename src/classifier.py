@@ -9,21 +9,92 @@ It extracts text from various file types and uses pattern matching to determine
 The classifier does not rely on filenames, making it effective even for poorly named files.
 """
 
-import re
+import os
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
 from werkzeug.datastructures import FileStorage
+from .pattern_engine import PatternEngine, StreamingScorer
+from .rule_registry import BUILTIN_RULES_PATH, get_rule_registry, load_rules
+from .extraction_pool import get_extraction_pool
+from .cache import content_hash, get_result_cache
+from .text_store import get_text_store
+from .near_duplicates import NEAR_DUPLICATE_MIN_SHINGLES, MinHashSketch, get_near_duplicate_index
+from .image_templates import file_fingerprint, get_template_index
+from .file_types import detect_kind
+from .scheduler import SchedulerBusy, get_scheduler
+from .metrics import RESULTS, UPLOAD_BYTES, stage
+from .classifierMLExample import model_version
 from .extractors import (
+    EXTRACTOR_VERSION,
+    EXTRACTORS,
+    PdfExtraction,
+    count_pdf_tier,
     extract_text_from_pdf,
     extract_text_from_image,
     extract_text_from_docx,
-    # extract_text_from_excel,  # Uncomment if handling Excel files
 )
 
+# The built-in document types as shipped in rules/document_types.json, matched against lowercased text.
+# Classification uses the rule registry, which may load other rule files (RULES_PATH) and reloads them
+DOCUMENT_PATTERNS = load_rules(BUILTIN_RULES_PATH)[0]
+
+# Lead over the runner-up at which PDF reading stops early; 0 always reads every page
+PDF_EARLY_EXIT_MARGIN = float(os.environ.get('PDF_EARLY_EXIT_MARGIN', 5))
+# Lead over the runner-up at which Word document reading stops early; 0 always reads every paragraph
+DOCX_EARLY_EXIT_MARGIN = float(os.environ.get('DOCX_EARLY_EXIT_MARGIN', 5))
+
+# Kinds whose extractors produce text chunk by chunk, scored as it arrives by a StreamingScorer
+STREAMING_KINDS = ('pdf', 'docx')
+
+# Labels that are not worth reusing for near-duplicates
+_UNDECIDED = ('unknown', 'ambiguous')
+
+# Details of the classify_file calls made while a report is collected (see classification_details)
+_details: ContextVar[Optional[dict]] = ContextVar('classification_details', default=None)
+
+# The rules a classification started with (see pinned_engine)
+_engine: ContextVar[Optional[PatternEngine]] = ContextVar('engine', default=None)
+
+def current_engine() -> PatternEngine:
+    """Return the compiled rules in effect: those pinned for the classification in progress, or the latest."""
+    engine = _engine.get()
+    return engine if engine is not None else get_rule_registry().current()
+
+@contextmanager
+def pinned_engine() -> Iterator[PatternEngine]:
+    """
+    Use the rules in effect now for everything in the block, even if they are reloaded meanwhile.
+
+    A classification computes its cache key, scores its text and versions the near-duplicate index
+    with the rules at different times; without pinning, a reload in between would cache a label
+    under the version of rules that did not produce it.
+    """
+    token = _engine.set(current_engine())
+    try:
+        yield _engine.get()
+    finally:
+        _engine.reset(token)
+
+def _early_exit_margin(kind: str) -> float:
+    return PDF_EARLY_EXIT_MARGIN if kind == 'pdf' else DOCX_EARLY_EXIT_MARGIN
+
+def classifier_version() -> str:
+    """
+    Part of every result cache key, so cached labels are dropped when anything that produced them
+    changes: the rules, the extractors, the ML model or the image templates.
+    """
+    templates = get_template_index()
+    return (f'rules-{current_engine().version}+extractors-{EXTRACTOR_VERSION}+model-{model_version()}'
+            f'+templates-{templates.version if templates is not None else "none"}')
+
 def classify_text(text: str) -> str:
     """
     Classify the text content of a document by matching it against predefined regular expression patterns
     for various document types. It calculates scores based on the number of pattern matches for each type
-    and selects the one with the highest score.
+    and selects the one with the highest score. The patterns are loaded from the rule registry and compiled
+    into a PatternEngine, so the text is scanned in a single pass however many document types there are.
 
     Parameters:
         text (str): The extracted text from the document.
@@ -38,85 +109,11 @@ def classify_text(text: str) -> str:
             - 'resume'
             - 'contract'
             - 'medical_report'
+            - any other document type defined in the rule files
             - 'unknown' (if no patterns match)
             - 'ambiguous' (if there's a tie between multiple types)
     """
-    # Normalize text to lowercase
-    text = text.lower()
-
-    # Define regular expression patterns for each document type
-    patterns = {
-        'drivers_license': [
-            r'driver\'?s?\s+license',
-            r'dl\s+number',
-            r'driver\s+id',
-        ],
-        'passport': [
-            r'passport',
-            r'passport\s+number',
-            r'nationality',
-            r'issued\s+by.*department\s+of\s+state',
-        ],
-        'bank_statement': [
-            r'bank\s+statement',
-            r'account\s+summary',
-            r'transaction\s+history',
-            r'available\s+balance',
-        ],
-        'invoice': [
-            r'invoice',
-            r'invoice\s+number',
-            r'bill\s+to',
-            r'amount\s+due',
-        ],
-        'tax_report': [
-            r'tax\s+report',
-            r'tax\s+return',
-            r'form\s+1040',
-            r'internal\s+revenue\s+service',
-        ],
-        'resume': [
-            r'resume',
-            r'curriculum\s+vitae',
-            r'\bcv\b',
-            r'education',
-            r'skills',
-            r'experience',
-        ],
-        'contract': [
-            r'contract',
-            r'agreement',
-            r'terms\s+and\s+conditions',
-            r'party.*hereby',
-        ],
-        'medical_report': [
-            r'medical\s+report',
-            r'diagnosis',
-            r'patient',
-            r'treatment',
-        ],
-    }
-
-    # Initialize scores for each document type
-    scores = {key: 0 for key in patterns.keys()}
-
-    # Compute scores based on pattern matches
-    for doc_type, doc_patterns in patterns.items():
-        for pattern in doc_patterns:
-            matches = re.findall(pattern, text)
-            scores[doc_type] += len(matches)
-
-    # Determine the document type with the highest score
-    max_score = max(scores.values())
-    if max_score == 0:
-        return 'unknown'
-
-    # Check for ties among document types with the highest score
-    top_classes = [doc_type for doc_type, score in scores.items() if score == max_score]
-    if len(top_classes) == 1:
-        return top_classes[0]
-    else:
-        return 'ambiguous'
+    return current_engine().classify(text)
 
 def classify_text2(text: str) -> str:
     """
@@ -149,10 +146,241 @@ def classify_text2(text: str) -> str:
     else:
         return 'unknown'
 
+def score_text(text: str) -> Dict[str, float]:
+    """Return the pattern score of every document type for ``text``; see :func:`classify_text`."""
+    return current_engine().scores(text)
+
+def file_kind(file: FileStorage) -> Optional[str]:
+    """
+    Detect the kind of extractor that handles an uploaded file, from its content (see file_types.py).
+
+    Returns:
+        Optional[str]: 'pdf', 'image', 'docx' or another registered kind, or None if the file type
+        is not supported.
+    """
+    return detect_kind(file)
+
+def _extract_text(kind: str, file: FileStorage, file_hash: str,
+                  scorer: Optional[StreamingScorer] = None) -> str:
+    """
+    Return the text of an uploaded file, from the text store when it was already extracted.
+
+    Parameters:
+        kind (str): The extractor to use.
+        file (FileStorage): The uploaded file.
+        file_hash (str): The content hash of the file.
+        scorer (StreamingScorer, optional): Scores the text as it is extracted, and stops reading
+            once the label is settled. Not used when the text store is enabled.
+
+    Returns:
+        str: The extracted text, or an empty string if only ``scorer`` saw it.
+    """
+    store = get_text_store()
+    if store is None:
+        return run_extractor(kind, file, scorer, keep_text=False)
+
+    text = store.get(file_hash)
+    if text is not None:
+        return text
+    # Stored texts are reclassified after rule changes, so they are read in full: pages skipped
+    # because the current rules had settled the label may be the ones that decide under new rules
+    full = {'stop_when': None} if kind in STREAMING_KINDS else {}
+    text = run_extractor(kind, file, **full)
+    store.put(file_hash, kind, file.filename, text)
+    return text
+
+def _record_pdf_extraction(extraction: PdfExtraction) -> None:
+    """Count the tier of a PDF extraction, and report it with the classification details."""
+    count_pdf_tier(extraction.tier)
+    details = _details.get()
+    if details is not None:
+        details['pdf'] = {'tier': extraction.tier, 'pages': extraction.pages, 'ocr_pages': extraction.ocr_pages}
+
+def run_extractor(kind: str, file: FileStorage, scorer: Optional[StreamingScorer] = None,
+                  keep_text: bool = True, **overrides) -> str:
+    """
+    Extract text with the extractor for ``kind``, in the extraction pool when it is enabled.
+
+    Parameters:
+        kind (str): The extractor to use.
+        file (FileStorage): The uploaded file.
+        scorer (StreamingScorer, optional): For PDF and Word documents, fed every page or paragraph
+            as it is extracted, and stops extraction once its label is settled.
+        keep_text (bool): Whether to return the text of PDF and Word documents; only meaningful
+            with a ``scorer``. The extraction pool always returns it, as the scorer it fills is a copy.
+        **overrides: Options for the PDF and Word extractors, replacing the defaults (early exit),
+            or for the image extractor (``region``).
+
+    Returns:
+        str: The extracted text.
+    """
+    options = {}
+    if kind in STREAMING_KINDS:
+        if scorer is None and _early_exit_margin(kind) > 0:
+            scorer = StreamingScorer(current_engine(), _early_exit_margin(kind))
+        if scorer is not None:
+            # Classifying keywords are almost always near the start, so stop once the label is settled
+            options['stop_when'] = scorer
+        options.update(overrides)
+        if kind == 'docx':
+            options.pop('max_pages', None)
+    elif kind == 'image':
+        options.update(overrides)
+
+    pool = get_extraction_pool()
+    if pool is not None and kind == 'pdf':
+        extraction = pool.extract_pdf(file, **options)
+        _record_pdf_extraction(extraction)
+        return extraction.text
+    if pool is not None:
+        return pool.extract(kind, file, **options)
+    if kind == 'pdf':
+        return extract_text_from_pdf(file, keep_text=keep_text, report=_record_pdf_extraction, **options)
+    elif kind == 'image':
+        return extract_text_from_image(file, **options)
+    elif kind == 'docx':
+        return extract_text_from_docx(file, keep_text=keep_text, **options)
+    elif kind in EXTRACTORS:
+        # Formats registered in file_types.py, such as Excel and email
+        return EXTRACTORS[kind](file)
+    raise ValueError(f"No extractor for {kind}")
+
+@contextmanager
+def classification_details() -> Iterator[dict]:
+    """
+    Collect details of the classification made in the block into the yielded dict, which is
+    otherwise left empty:
+
+    - ``near_duplicate``: the content hash of the already classified document whose label was
+      reused, and the estimated similarity of the two;
+    - ``image_template``: the name of the known document design an image was labelled by, and how
+      closely it matched;
+    - ``pdf``: the tier that extracted a PDF ('text', 'ocr', 'mixed', 'none' or 'empty'), the
+      number of pages read and how many of them were OCR'd.
+    """
+    details = {}
+    token = _details.set(details)
+    try:
+        yield details
+    finally:
+        _details.reset(token)
+
+def _template_label(kind: str, file: FileStorage) -> Optional[str]:
+    """
+    Label an image of a known document design (see image_templates.py) without a full-page OCR run.
+
+    Parameters:
+        kind (str): The extractor for the file.
+        file (FileStorage): The uploaded file.
+
+    Returns:
+        Optional[str]: The label of the matching template, or of the text in its OCR region; None
+        if the file is not an image, matches no template, or its region does not settle the label.
+    """
+    index = get_template_index()
+    if kind != 'image' or index is None:
+        return None
+    with stage('image_template', kind):
+        match = index.match(file_fingerprint(file))
+    if match is None:
+        return None
+    template = match.template
+    if template.region is None:
+        file_class = template.label
+    else:
+        file_class = classify_text(run_extractor(kind, file, region=template.region))
+        if file_class in _UNDECIDED:
+            return None
+    details = _details.get()
+    if details is not None:
+        details['image_template'] = {
+            'name': template.name,
+            'distance': match.distance,
+            'correlation': round(match.correlation, 3),
+        }
+    return file_class
+
+def _upload_size(file: FileStorage) -> int:
+    position = file.stream.tell()
+    size = file.stream.seek(0, os.SEEK_END)
+    file.stream.seek(position)
+    return size
+
+def _classify_uncached(kind: str, file: FileStorage, file_hash: str, cache_key: str) -> str:
+    """
+    Classify a file whose label is not in the result cache, and cache it.
+
+    Parameters:
+        kind (str): The extractor for the file.
+        file (FileStorage): The uploaded file.
+        file_hash (str): The content hash of the file.
+        cache_key (str): The result cache key of the file.
+
+    Returns:
+        str: The classification of the document.
+    """
+    # Waiting for a slot may have taken long enough for an identical upload to be classified
+    cache = get_result_cache()
+    cached_class = cache.get(cache_key)
+    if cached_class is not None:
+        return cached_class
+
+    # Images of a known design are labelled from their template, sparing the full-page OCR run
+    template_class = _template_label(kind, file)
+    if template_class is not None:
+        file_class = template_class
+        cache.set(cache_key, file_class)
+        return file_class
+
+    # Rule changes invalidate the cached label but not the extracted text. PDF and Word documents
+    # are scored page by page as they are extracted, so their full text is never assembled
+    index = get_near_duplicate_index()
+    sketch = MinHashSketch() if index is not None else None
+    scorer = None
+    if kind in STREAMING_KINDS:
+        scorer = StreamingScorer(current_engine(), _early_exit_margin(kind), sketch=sketch)
+    with stage('extract', kind):
+        text = _extract_text(kind, file, file_hash, scorer)
+
+    # A document nearly identical to an already classified one gets its label
+    near_duplicate = signature = None
+    if sketch is not None:
+        with stage('near_duplicate', kind):
+            if not sketch.chars:
+                sketch.feed(text)
+            signature = sketch.signature()
+            if sketch.shingles >= NEAR_DUPLICATE_MIN_SHINGLES:
+                index.use_version(classifier_version())
+                near_duplicate = index.lookup(signature)
+            else:
+                signature = None
+
+    # Classify the extracted text, unless the scorer already saw it
+    with stage('score', kind):
+        if near_duplicate is not None:
+            file_class = near_duplicate.label
+            details = _details.get()
+            if details is not None:
+                details['near_duplicate'] = {
+                    'content_hash': near_duplicate.content_hash,
+                    'similarity': round(near_duplicate.similarity, 3),
+                }
+        elif scorer is not None and scorer.chars:
+            file_class = scorer.label()
+        else:
+            file_class = classify_text(text)
+    # Near-duplicates are indexed too, so documents of a template in use stay in the index
+    if signature is not None and file_class not in _UNDECIDED:
+        index.add(signature, file_class, file_hash)
+    cache.set(cache_key, file_class)
+    return file_class
+
 def classify_file(file: FileStorage) -> str:
     """
     Classify a file based on its content by extracting text and analyzing it.
 
+    Every stage is timed (see metrics.py), and the returned label is counted.
+
     Parameters:
         file (FileStorage): The file uploaded by the user.
 
@@ -160,27 +388,54 @@ def classify_file(file: FileStorage) -> str:
         str: The classification of the document.
     """
     filename = file.filename.lower()
-    file_extension = filename.rsplit('.', 1)[1]
+    file_class = 'error processing file'
 
-    try:
-        # Extract text based on file extension
-        if file_extension == 'pdf':
-            text = extract_text_from_pdf(file)
-        elif file_extension in ['png', 'jpg', 'jpeg']:
-            text = extract_text_from_image(file)
-        elif file_extension == 'docx':
-            text = extract_text_from_docx(file)
-        # Uncomment the following if handling Excel files
-        # elif file_extension == 'xlsx':
-        #     text = extract_text_from_excel(file)
-        else:
-            return 'unsupported file type'
+    # All stages use the same rules, so the label is cached under the version that produced it
+    with pinned_engine():
+        try:
+            # Pick the extractor from the file's content; misnamed files are rerouted, unsupported ones rejected
+            with stage('sniff') as timed:
+                kind = file_kind(file)
+                timed.kind = kind or 'unsupported'
+            if kind is None:
+                file_class = 'unsupported file type'
+                return file_class
+            UPLOAD_BYTES.observe(_upload_size(file), kind)
 
-        # Classify the extracted text
-        file_class = classify_text(text)
-        return file_class
+            # Byte-identical uploads skip extraction and classification entirely
+            with stage('hash', kind):
+                cache = get_result_cache()
+                file_hash = content_hash(file)
+                cache_key = f'{classifier_version()}:{kind}:{file_hash}'
+                cached_class = cache.get(cache_key)
+            if cached_class is not None:
+                file_class = cached_class
+                return file_class
+
+            # Classifications that missed the cache run in the pool of their extractor class, and
+            # identical uploads being classified at the same time share one run (see scheduler.py)
+            def run() -> Tuple[str, dict]:
+                # The details are handed to the coalesced classifications along with the label
+                with classification_details() as details:
+                    return _classify_uncached(kind, file, file_hash, cache_key), details
+
+            file_class, details = get_scheduler().run(cache_key, kind, run)
+            outer = _details.get()
+            if outer is not None:
+                outer.update(details)
+            return file_class
+
+        except SchedulerBusy:
+            # Not a result; the caller answers that the service is busy
+            file_class = None
+            raise
+
+        except Exception as e:
+            # Log the error for debugging purposes
+            logging.error(f"Error processing file {filename}: {e}")
+            file_class = 'error processing file'
+            return file_class
 
-    except Exception as e:
-        # Log the error for debugging purposes
-        logging.error(f"Error processing file {filename}: {e}")
-        return 'error processing file'
+        finally:
+            if file_class is not None:
+                RESULTS.inc(file_class)
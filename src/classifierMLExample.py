@@ -1,14 +1,118 @@
 # src/classifierMLExample.py
 
+import os
 import pickle
+import logging
+import threading
+from typing import List, Optional, Tuple
+from werkzeug.datastructures import FileStorage
 from .extractors import extract_text_from_pdf, extract_text_from_image, extract_text_from_docx
 from .preprocessing import preprocess_text
 
-# Load the model and vectorizer
-with open('models/vectorizer.pkl', 'rb') as f:
-    vectorizer = pickle.load(f)
-with open('models/model.pkl', 'rb') as f:
-    model = pickle.load(f)
+# Directory holding vectorizer.pkl and model.pkl, or versions of them and a LATEST pointer as written
+# by src/train.py; defaults to models/ at the project root rather than the working directory
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models'))
+
+_model_lock = threading.Lock()
+_loaded: Optional[Tuple[object, object]] = None
+# Identifies the model loaded, or the one that would be; see model_version
+_version: Optional[str] = None
+
+def _resolve(model_dir: str) -> Tuple[str, str]:
+    """Return the directory of the model to load, following LATEST, and its version."""
+    # Follow the pointer to the newest version written by src/train.py
+    latest = os.path.join(model_dir, 'LATEST')
+    if os.path.exists(latest):
+        with open(latest) as f:
+            version = f.read().strip()
+        return os.path.join(model_dir, version), version
+    try:
+        return model_dir, f"mtime-{int(os.stat(os.path.join(model_dir, 'model.pkl')).st_mtime)}"
+    except OSError:
+        return model_dir, 'none'
+
+def model_version() -> str:
+    """
+    Identify the model predictions are made with: the version LATEST points to, or when model.pkl
+    was written, or 'none' without a model. Part of the result cache keys (see classifier_version).
+    """
+    global _version
+    if _version is None:
+        with _model_lock:
+            if _version is None:
+                _version = _resolve(MODEL_DIR)[1]
+    return _version
+
+def load_model(model_dir: str = None) -> Tuple[object, object]:
+    """
+    Load the vectorizer and model, once. Loading is deferred to the first prediction so importing
+    this module stays cheap and does not depend on the working directory.
+
+    Parameters:
+        model_dir (str, optional): Directory with vectorizer.pkl and model.pkl. Defaults to MODEL_DIR.
+
+    Returns:
+        Tuple[object, object]: The fitted vectorizer and model.
+    """
+    global _loaded, _version
+    if _loaded is None:
+        with _model_lock:
+            if _loaded is None:
+                model_dir, version = _resolve(model_dir or MODEL_DIR)
+                with open(os.path.join(model_dir, 'vectorizer.pkl'), 'rb') as f:
+                    vectorizer = pickle.load(f)
+                with open(os.path.join(model_dir, 'model.pkl'), 'rb') as f:
+                    model = pickle.load(f)
+                _loaded = (vectorizer, model)
+                _version = version
+    return _loaded
+
+def unload_model() -> None:
+    """Forget the loaded model, so the next prediction reloads it (e.g. after retraining)."""
+    global _loaded, _version
+    with _model_lock:
+        _loaded = None
+        _version = None
+
+def classify_texts(texts: List[str]) -> List[str]:
+    """
+    Classify many extracted texts at once.
+
+    All documents are vectorized into one sparse matrix and predicted in a single call, which
+    amortizes the per-call overhead of scikit-learn across the batch.
+
+    Parameters:
+        texts (List[str]): The extracted texts.
+
+    Returns:
+        List[str]: The predicted class of each text, in the same order.
+    """
+    if not texts:
+        return []
+    vectorizer, model = load_model()
+    features = vectorizer.transform([preprocess_text(text) for text in texts])
+    return list(model.predict(features))
+
+def classify_texts_with_confidence(texts: List[str]) -> List[Tuple[str, float]]:
+    """
+    Classify many extracted texts at once, with the model's probability for each predicted class.
+
+    Returns:
+        List[Tuple[str, float]]: The predicted class and its probability for each text. Models
+        without ``predict_proba`` report a probability of 1.
+    """
+    if not texts:
+        return []
+    vectorizer, model = load_model()
+    features = vectorizer.transform([preprocess_text(text) for text in texts])
+    if not hasattr(model, 'predict_proba'):
+        return [(label, 1.0) for label in model.predict(features)]
+    probabilities = model.predict_proba(features)
+    return [(model.classes_[row.argmax()], float(row.max())) for row in probabilities]
+
+def classify_text(text: str) -> str:
+    """Classify a single extracted text; see :func:`classify_texts`."""
+    return classify_texts([text])[0]
 
 def classify_file(file: FileStorage) -> str:
     filename = file.filename.lower()
@@ -25,16 +129,8 @@ def classify_file(file: FileStorage) -> str:
         else:
             return 'unsupported file type'
 
-        # Preprocess text
-        preprocessed_text = preprocess_text(text)
-
-        # Vectorize text
-        features = vectorizer.transform([preprocessed_text])
-
-        # Predict document type
-        prediction = model.predict(features)
-        predicted_class = prediction[0]
-        return predicted_class
+        # Preprocess, vectorize and predict
+        return classify_text(text)
 
     except Exception as e:
         logging.error(f"Error processing file {filename}: {e}")
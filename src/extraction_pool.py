@@ -0,0 +1,285 @@
+# src/extraction_pool.py
+
+"""
+Extraction Pool Module
+======================
+
+Text extraction (pdfminer, Tesseract) is CPU-bound and holds the GIL, so running it in the request
+thread limits a worker to one extraction at a time. This module runs the extractors from
+``extractors.py`` in a persistent pool of worker processes instead.
+
+Workers are recycled after a fixed number of tasks to contain memory growth in pdfminer and Pillow,
+and every task has a timeout. Each worker runs one task at a time over its own pipe. A task is only
+sent to an idle worker that has finished starting, so the timeout counts the task alone, not the
+wait for a free worker or a worker's start-up. A task that times out has its worker killed, since a
+stuck process cannot be reclaimed otherwise; the other workers and their tasks are not affected,
+and a fresh worker replaces it when next needed. Workers are forked from a forkserver process that
+has imported the extractors (``EXTRACTION_START_METHOD``), as forking the threaded server process
+itself is unsafe.
+
+The pool is disabled unless ``EXTRACTION_WORKERS`` is set, in which case ``classify_file`` uses it
+transparently.
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from io import BytesIO
+from typing import Callable, List, Optional, Set, Union
+from werkzeug.datastructures import FileStorage
+from . import extractors
+from .uploads import spool_path
+
+# Number of extraction processes; 0 keeps extraction inline in the calling thread
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', 0))
+# Seconds a single extraction may take before it is abandoned
+EXTRACTION_TIMEOUT = float(os.environ.get('EXTRACTION_TIMEOUT', 60))
+# Tasks a worker process runs before it is replaced by a fresh one
+EXTRACTION_MAX_TASKS_PER_WORKER = int(os.environ.get('EXTRACTION_MAX_TASKS_PER_WORKER', 200))
+# Seconds a new worker process may take to start
+EXTRACTION_START_TIMEOUT = float(os.environ.get('EXTRACTION_START_TIMEOUT', 30))
+# How worker processes are started. Server processes run threads, and forking a threaded process can
+# leave locks held in the child, so workers are forked from a single-threaded server process instead
+EXTRACTION_START_METHOD = os.environ.get('EXTRACTION_START_METHOD', 'forkserver')
+
+class ExtractionTimeout(Exception):
+    """Raised when an extraction task exceeds its timeout."""
+
+class ExtractionWorkerDied(Exception):
+    """Raised when a worker process exits while running a task, e.g. killed by the OOM killer."""
+
+def _run_in_worker(extractor: Callable, data: Union[bytes, str], filename: str, options: dict):
+    """
+    Rebuild the upload inside the worker process and run ``extractor`` on it.
+
+    ``data`` is the content of the upload, or the path of the file holding it when it was spooled
+    to disk, which spares copying large uploads through the pool's pipe.
+    """
+    if isinstance(data, str):
+        with open(data, 'rb') as stream:
+            return extractor(FileStorage(stream=stream, filename=filename), **options)
+    return extractor(FileStorage(stream=BytesIO(data), filename=filename), **options)
+
+def _extract_in_worker(kind: str, data: Union[bytes, str], filename: str, options: dict) -> str:
+    """Run the extractor for ``kind`` inside the worker process; see :func:`_run_in_worker`."""
+    return _run_in_worker(extractors.EXTRACTORS[kind], data, filename, options)
+
+def _serve(conn) -> None:
+    """Run the tasks received on ``conn`` until told to stop, sending back every outcome."""
+    conn.send('ready')
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        func, args = task
+        try:
+            outcome = (True, func(*args))
+        except Exception as e:
+            outcome = (False, e)
+        try:
+            conn.send(outcome)
+        except Exception as e:
+            # The result or the exception could not be pickled
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+class _Worker:
+    """A worker process and the parent's end of its pipe."""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.tasks = 0
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            return self.conn.poll(timeout) and self.conn.recv() == 'ready'
+        except (EOFError, OSError):
+            return False
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self) -> None:
+        # Killing is the only way to stop a task that is stuck inside C code
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class ExtractionPool:
+    """
+    A persistent pool of worker processes for text extraction.
+
+    Parameters:
+        workers (int): Number of worker processes.
+        timeout (float): Seconds a single task may run.
+        max_tasks_per_worker (int): Tasks after which a worker process is replaced.
+    """
+
+    def __init__(self, workers: int = EXTRACTION_WORKERS or (os.cpu_count() or 1),
+                 timeout: float = EXTRACTION_TIMEOUT,
+                 max_tasks_per_worker: int = EXTRACTION_MAX_TASKS_PER_WORKER):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = multiprocessing.get_context(EXTRACTION_START_METHOD)
+        if EXTRACTION_START_METHOD == 'forkserver':
+            # The server process imports the extractors once, and every worker forked from it has them
+            self._context.set_forkserver_preload([__name__])
+        # Workers waiting for a task, and the number started, busy ones included
+        self._idle: List[_Worker] = []
+        self._started = 0
+        self._live: Set[_Worker] = set()
+        self._changed = threading.Condition()
+        self._closed = False
+
+    def _checkout(self) -> _Worker:
+        """Return an idle worker, starting one if there is room, or waiting for one to be free."""
+        with self._changed:
+            while not self._idle and self._started >= self.workers and not self._closed:
+                self._changed.wait()
+            if self._closed:
+                raise RuntimeError("extraction pool is shut down")
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            worker = _Worker(self._context)
+        except BaseException:
+            with self._changed:
+                self._started -= 1
+                self._changed.notify()
+            raise
+        with self._changed:
+            self._live.add(worker)
+        if not worker.wait_ready(EXTRACTION_START_TIMEOUT):
+            self._discard(worker, kill=True)
+            raise ExtractionWorkerDied(f"extraction worker did not start within {EXTRACTION_START_TIMEOUT}s")
+        return worker
+
+    def _discard(self, worker: _Worker, kill: bool) -> None:
+        """Stop a worker, making room for a new one."""
+        with self._changed:
+            self._live.discard(worker)
+            self._started -= 1
+            self._changed.notify_all()
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def _checkin(self, worker: _Worker) -> None:
+        worker.tasks += 1
+        if self._closed or worker.tasks >= self.max_tasks_per_worker:
+            self._discard(worker, kill=False)
+            return
+        with self._changed:
+            self._idle.append(worker)
+            self._changed.notify()
+
+    def run(self, func: Callable, *args, timeout: Optional[float] = None):
+        """
+        Run ``func(*args)`` in a worker process and wait for its result.
+
+        The timeout starts when a worker takes the task, so waiting for a free worker does not count.
+
+        Raises:
+            ExtractionTimeout: If the task takes longer than the timeout.
+            ExtractionWorkerDied: If the worker process exits while running the task.
+        """
+        limit = self.timeout if timeout is None else timeout
+        worker = self._checkout()
+        try:
+            worker.conn.send((func, args))
+            finished = worker.conn.poll(limit)
+            if finished:
+                succeeded, result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            logging.error(f"Extraction worker {worker.process.pid} died: {e}")
+            self._discard(worker, kill=True)
+            raise ExtractionWorkerDied(f"extraction worker exited with code {worker.process.exitcode}")
+        except BaseException:
+            # A task or result that cannot be pickled, or an interrupt: the worker's state is unknown,
+            # and keeping it out of both the idle list and the discarded ones would leak its place
+            self._discard(worker, kill=True)
+            raise
+        if not finished:
+            logging.error(f"Extraction task timed out after {limit}s, killing worker {worker.process.pid}")
+            self._discard(worker, kill=True)
+            raise ExtractionTimeout(f"extraction exceeded {limit}s")
+        self._checkin(worker)
+        if not succeeded:
+            raise result
+        return result
+
+    def _submit(self, func: Callable, first, file: FileStorage, options: dict):
+        path = spool_path(file)
+        if path is not None:
+            return self.run(func, first, path, file.filename, options)
+        file.seek(0)
+        return self.run(func, first, file.read(), file.filename, options)
+
+    def extract(self, kind: str, file: FileStorage, **options) -> str:
+        """
+        Extract text from an uploaded file in a worker process.
+
+        Args:
+            kind (str): The extractor to use, a key of ``extractors.EXTRACTORS``.
+            file (FileStorage): The uploaded file.
+            **options: Keyword arguments for the extractor. They must be picklable.
+
+        Returns:
+            str: The extracted text.
+        """
+        return self._submit(_extract_in_worker, kind, file, options)
+
+    def extract_pdf(self, file: FileStorage, **options) -> extractors.PdfExtraction:
+        """Extract a PDF in a worker process, returning its tier and page counts along with the text."""
+        return self._submit(_run_in_worker, extractors.extract_pdf, file, options)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers; ``wait`` lets running tasks finish, otherwise they are killed."""
+        with self._changed:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._changed.notify_all()
+        for worker in idle:
+            self._discard(worker, kill=False)
+        with self._changed:
+            if wait:
+                # Busy workers are stopped as their tasks finish
+                while self._started > 0:
+                    self._changed.wait()
+                return
+            busy = list(self._live)
+        for worker in busy:
+            worker.process.kill()
+
+_pool: Optional[ExtractionPool] = None
+_pool_lock = threading.Lock()
+
+def get_extraction_pool() -> Optional[ExtractionPool]:
+    """Return the shared extraction pool, creating it on first use, or None if it is disabled."""
+    global _pool
+    if _pool is None and EXTRACTION_WORKERS > 0:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ExtractionPool(workers=EXTRACTION_WORKERS)
+    return _pool
+
+def shutdown_extraction_pool(wait: bool = True) -> None:
+    """Shut the shared extraction pool down, if it was started; ``wait`` lets running tasks finish."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
@@ -1,39 +1,323 @@
 # src/extractors.py
 
-from pdfminer.high_level import extract_text
-from PIL import Image
-import pytesseract
-import docx
+import os
+import re
+import sys
+import html
+import email
+import logging
+import threading
+import importlib.util
+from email import policy
+from collections import Counter
+from io import StringIO
+from typing import Callable, Iterator, NamedTuple, Optional, Tuple
+from PIL import Image, ImageOps, ImageSequence
 from werkzeug.datastructures import FileStorage
-from pdfminer.high_level import extract_text
-from io import BytesIO
+from .image_preprocessing import OCR_LANG, normalize_image, ocr_config
+from .image_templates import Region, crop_region
+from .metrics import stage
+from .uploads import open_mapped
 
-def extract_text_from_pdf(file):
+def _lazy_import(name: str):
+    """
+    Return module ``name``, loaded on first attribute access, or None if it is not installed.
+
+    Parsing and OCR libraries account for most of the import time of the app, and a process that
+    never reads a given format should not pay for it. Serving processes load them during warm-up
+    instead (see lifecycle.py).
+    """
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    if name in sys.modules:
+        return sys.modules[name]
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+pytesseract = _lazy_import('pytesseract')
+docx = _lazy_import('docx')
+# Optional: only needed to OCR PDF pages without a text layer
+pypdfium2 = _lazy_import('pypdfium2')
+# Optional: only needed for Excel workbooks
+openpyxl = _lazy_import('openpyxl')
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIF_SUPPORTED = True
+except ImportError:  # Optional: lets Pillow open HEIC/HEIF photos
+    HEIF_SUPPORTED = False
+
+# Bump when a change to the extractors alters their output, to invalidate stored texts
+EXTRACTOR_VERSION = '4'
+
+# Maximum number of PDF pages to read; 0 reads every page
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', 0))
+# Alphanumeric characters a PDF page needs for its text layer to be used instead of OCR
+PDF_TEXT_LAYER_MIN_CHARS = int(os.environ.get('PDF_TEXT_LAYER_MIN_CHARS', 16))
+# Resolution at which pages without a text layer are rasterized for OCR
+PDF_OCR_DPI = int(os.environ.get('PDF_OCR_DPI', 200))
+
+# Number of PDFs extracted by each tier: 'text', 'ocr', 'mixed', 'none' (no text layer and OCR
+# unavailable) or 'empty' (no pages). Counted by the caller with count_pdf_tier, as extraction may
+# run in an extraction pool worker, whose counts the serving process would never see
+PDF_TIER_COUNTS = Counter()
+_pdf_tier_lock = threading.Lock()
+
+class PdfExtraction(NamedTuple):
+    """The result of a tiered PDF extraction."""
+    text: str
+    tier: str
+    pages: int
+    ocr_pages: int
+
+def _has_text_layer(text: str) -> bool:
+    """Return whether a page's text is substantial enough to skip OCR."""
+    return sum(char.isalnum() for char in text) >= PDF_TEXT_LAYER_MIN_CHARS
+
+def _ocr_image(image: Image.Image, kind: str = 'image') -> str:
+    """Normalize an image and run Tesseract on it. Shared by image uploads and scanned PDF pages."""
+    with stage('ocr_preprocess', kind):
+        image = normalize_image(image)
+    with stage('ocr', kind):
+        return pytesseract.image_to_string(image, lang=OCR_LANG, config=ocr_config())
+
+def _render_pdf_page(file: FileStorage, document, page_index: int):
+    """Rasterize one PDF page, opening the document with pypdfium2 on first use."""
+    if document is None:
+        # pdfminer is still reading the stream, so pdfium gets a view of its own instead of a copy
+        document = pypdfium2.PdfDocument(open_mapped(file), autoclose=True)
+    image = document[page_index].render(scale=PDF_OCR_DPI / 72).to_pil()
+    return document, image
+
+def iter_pdf_page_tiers(file: FileStorage, max_pages: int = PDF_MAX_PAGES,
+                        ocr: bool = True) -> Iterator[Tuple[str, str]]:
+    """
+    Extract text from a PDF file page by page, falling back to OCR for pages without a text layer.
+
+    Each page first gets a cheap pass that reads its text layer without layout analysis. Only pages
+    where that yields too little text (scans, photos) are rasterized and passed to Tesseract, which
+    requires the optional pypdfium2 package.
+
+    The upload stream is parsed in place, without copying it into memory first. Pages are only
+    parsed as the iterator is consumed, so closing it early skips the remaining pages.
+
+    Args:
+        file (FileStorage): The PDF file uploaded by the user.
+        max_pages (int): Maximum number of pages to read; 0 reads every page.
+        ocr (bool): Whether to OCR pages without a text layer; if False they yield their (short)
+            text layer with the 'none' tier.
+
+    Yields:
+        Tuple[str, str]: The text of each page, ending with a form feed like pdfminer's
+        ``extract_text``, and the tier that produced it: 'text', 'ocr' or 'none'.
+    """
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from .pdf_text import RawTextConverter
+
+    file.seek(0)
+    resource_manager = PDFResourceManager()
+    output = StringIO()
+    device = RawTextConverter(resource_manager, output, laparams=None)
+    interpreter = PDFPageInterpreter(resource_manager, device)
+    document = None
+    try:
+        for page_index, page in enumerate(PDFPage.get_pages(file.stream, maxpages=max_pages)):
+            with stage('pdf_text_layer', 'pdf'):
+                interpreter.process_page(page)
+            text = output.getvalue()
+            output.seek(0)
+            output.truncate()
+            if _has_text_layer(text):
+                yield text, 'text'
+            elif not ocr:
+                yield text, 'none'
+            elif pypdfium2 is None:
+                logging.warning(f"PDF page {page_index + 1} of {file.filename} has no text layer "
+                                f"and pypdfium2 is not installed to OCR it")
+                yield text, 'none'
+            else:
+                with stage('pdf_render', 'pdf'):
+                    document, image = _render_pdf_page(file, document, page_index)
+                yield _ocr_image(image, 'pdf') + '\f', 'ocr'
+    finally:
+        device.close()
+        if document is not None:
+            document.close()
+
+def iter_pdf_pages(file: FileStorage, max_pages: int = PDF_MAX_PAGES) -> Iterator[str]:
+    """Extract text from a PDF file page by page; see :func:`iter_pdf_page_tiers`."""
+    for text, _ in iter_pdf_page_tiers(file, max_pages):
+        yield text
+
+def extract_pdf(file: FileStorage, max_pages: int = PDF_MAX_PAGES,
+                stop_when: Optional[Callable[[str], bool]] = None, keep_text: bool = True,
+                ocr: bool = True) -> PdfExtraction:
+    """
+    Extract text from a PDF file, reporting which tier produced it.
+
+    Args:
+        file (FileStorage): The PDF file uploaded by the user.
+        max_pages (int): Maximum number of pages to read; 0 reads every page.
+        stop_when (Callable[[str], bool], optional): Called with the text of each page; reading
+            stops after the first page for which it returns True.
+        keep_text (bool): Whether to return the text; pass False when ``stop_when`` is a
+            ``StreamingScorer`` that already scored every page, so the pages are not kept.
+        ocr (bool): Whether to OCR pages without a text layer (see :func:`iter_pdf_page_tiers`).
+
+    Returns:
+        PdfExtraction: The text, the document tier ('text', 'ocr', 'mixed', 'none' or 'empty'), the
+        number of pages read and how many of them were OCR'd.
+    """
+    pages = []
+    page_tiers = []
+    page_iterator = iter_pdf_page_tiers(file, max_pages, ocr)
+    try:
+        for page_text, page_tier in page_iterator:
+            if keep_text:
+                pages.append(page_text)
+            page_tiers.append(page_tier)
+            if stop_when is not None and stop_when(page_text):
+                break
+    finally:
+        page_iterator.close()
+
+    tiers = set(page_tiers)
+    tier = tiers.pop() if len(tiers) == 1 else ('mixed' if tiers else 'empty')
+    return PdfExtraction(''.join(pages), tier, len(page_tiers), page_tiers.count('ocr'))
+
+def count_pdf_tier(tier: str) -> None:
+    """Count a PDF extracted by ``tier`` in ``PDF_TIER_COUNTS``."""
+    with _pdf_tier_lock:
+        PDF_TIER_COUNTS[tier] += 1
+
+def extract_text_from_pdf(file: FileStorage, max_pages: int = PDF_MAX_PAGES,
+                          stop_when: Optional[Callable[[str], bool]] = None, keep_text: bool = True,
+                          report: Optional[Callable[[PdfExtraction], None]] = None, ocr: bool = True) -> str:
     """
     Extract text from a PDF file.
 
     Args:
         file (FileStorage): The PDF file uploaded by the user.
+        max_pages (int): Maximum number of pages to read; 0 reads every page.
+        stop_when (Callable[[str], bool], optional): Called with the text of each page; reading
+            stops after the first page for which it returns True.
+        keep_text (bool): Whether to return the text (see :func:`extract_pdf`).
+        report (Callable[[PdfExtraction], None], optional): Called with the extraction, to learn
+            its tier and page counts.
+        ocr (bool): Whether to OCR pages without a text layer (see :func:`iter_pdf_page_tiers`).
 
     Returns:
-        str: The extracted text from the PDF.
+        str: The extracted text from the PDF, or an empty string if ``keep_text`` is False.
     """
-    file.seek(0)
-    file_bytes = file.read()
-    file_stream = BytesIO(file_bytes)
-    text = extract_text(file_stream)
-    return text
+    extraction = extract_pdf(file, max_pages, stop_when, keep_text, ocr)
+    if report is not None:
+        report(extraction)
+    logging.info(f"Extracted {file.filename} via the '{extraction.tier}' tier: "
+                 f"{extraction.pages} pages, {extraction.ocr_pages} OCR'd")
+    return extraction.text
 
-def extract_text_from_image(file: FileStorage) -> str:
-    """Extract text from an image file."""
+def extract_text_from_image(file: FileStorage, region: Optional[Region] = None) -> str:
+    """
+    Extract text from an image file. Every frame of a multi-page image (e.g. a TIFF scan) is read.
+
+    Args:
+        file (FileStorage): The image uploaded by the user.
+        region (Region, optional): Only read this part of the first frame, given in fractions of
+            its width and height, such as the OCR region of a matching template (see image_templates.py).
+
+    Returns:
+        str: The extracted text.
+    """
     file.seek(0)
     image = Image.open(file.stream)
-    text = pytesseract.image_to_string(image)
-    return text
+    if region is not None:
+        # Templates are matched upright, so the EXIF orientation is applied before cropping
+        return _ocr_image(crop_region(ImageOps.exif_transpose(image), region))
+    if getattr(image, 'n_frames', 1) == 1:
+        return _ocr_image(image)
+    return '\f'.join(_ocr_image(frame.copy()) for frame in ImageSequence.Iterator(image))
+
+def iter_docx_text(file: FileStorage) -> Iterator[str]:
+    """
+    Extract text from a Word document paragraph by paragraph.
 
-def extract_text_from_docx(file: FileStorage) -> str:
-    """Extract text from a Word document."""
+    Yields:
+        str: The first paragraph, then every following one preceded by a newline, so the chunks
+        join into the text :func:`extract_text_from_docx` returns.
+    """
+    file.seek(0)
+    with stage('docx_parse', 'docx'):
+        doc = docx.Document(file)
+    for index, para in enumerate(doc.paragraphs):
+        yield para.text if index == 0 else '\n' + para.text
+
+def extract_text_from_docx(file: FileStorage, stop_when: Optional[Callable[[str], bool]] = None,
+                           keep_text: bool = True) -> str:
+    """
+    Extract text from a Word document.
+
+    Args:
+        file (FileStorage): The Word document uploaded by the user.
+        stop_when (Callable[[str], bool], optional): Called with the text of each paragraph;
+            reading stops after the first paragraph for which it returns True.
+        keep_text (bool): Whether to return the text (see :func:`extract_pdf`).
+
+    Returns:
+        str: The extracted text, or an empty string if ``keep_text`` is False.
+    """
+    paragraphs = []
+    for chunk in iter_docx_text(file):
+        if keep_text:
+            paragraphs.append(chunk)
+        if stop_when is not None and stop_when(chunk):
+            break
+    return ''.join(paragraphs)
+
+def extract_text_from_excel(file: FileStorage) -> str:
+    """Extract the cell values of an Excel workbook, one line per row and one page per sheet."""
     file.seek(0)
-    doc = docx.Document(file)
-    text = '\n'.join([para.text for para in doc.paragraphs])
-    return text
+    workbook = openpyxl.load_workbook(file.stream, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            rows = ('\t'.join(str(value) for value in row if value is not None)
+                    for row in sheet.iter_rows(values_only=True))
+            sheets.append('\n'.join(row for row in rows if row))
+        return '\f'.join(sheets)
+    finally:
+        workbook.close()
+
+_HTML_TAG = re.compile(r'<(script|style)\b.*?</\1\s*>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+
+def extract_text_from_email(file: FileStorage) -> str:
+    """Extract the subject and body of an email message (.eml); HTML bodies are stripped of markup."""
+    file.seek(0)
+    message = email.message_from_binary_file(file.stream, policy=policy.default)
+    parts = [message.get('subject', '')]
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_disposition() == 'attachment':
+            continue
+        content_type = part.get_content_type()
+        if content_type == 'text/plain':
+            parts.append(part.get_content())
+        elif content_type == 'text/html':
+            parts.append(html.unescape(_HTML_TAG.sub(' ', part.get_content())))
+    return '\n'.join(parts)
+
+# Extractors by kind, used to dispatch work to the extraction pool by name and to find the
+# extractor for formats registered in file_types.py
+EXTRACTORS = {
+    'pdf': extract_text_from_pdf,
+    'image': extract_text_from_image,
+    'docx': extract_text_from_docx,
+    'email': extract_text_from_email,
+}
+if openpyxl is not None:
+    EXTRACTORS['excel'] = extract_text_from_excel
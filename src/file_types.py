@@ -0,0 +1,170 @@
+# src/file_types.py
+
+"""
+File Types Module
+=================
+
+This module identifies uploaded files from their first bytes rather than from their names, and maps
+the detected MIME type to the kind of extractor that reads it (see ``EXTRACTORS`` in extractors.py).
+
+A JPEG named ``.pdf`` is routed to the image extractor instead of failing in pdfminer, and a file
+whose content matches no supported format is rejected before any extraction is attempted. The
+extension is only used where content cannot tell formats apart: zip containers that cannot be
+inspected, and formats without a signature such as email.
+
+New formats are added with :func:`register_format`, and an extractor in ``EXTRACTORS`` for their
+kind; ``classify_file`` does not change.
+"""
+
+import zipfile
+import logging
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Set
+from werkzeug.datastructures import FileStorage
+from .extractors import EXTRACTORS, HEIF_SUPPORTED
+
+# Bytes read from the start of a file to detect its format
+SNIFF_BYTES = 2048
+
+ZIP_MIME = 'application/zip'
+
+class FileFormat(NamedTuple):
+    """A supported file format."""
+    mime: str
+    kind: str
+    extensions: tuple
+    # Tests the first SNIFF_BYTES of a file; None for formats identified by extension only
+    sniff: Optional[Callable[[bytes], bool]]
+    # Entry marking a zip container as this format, e.g. 'word/document.xml'
+    zip_marker: Optional[str]
+
+_FORMATS: Dict[str, FileFormat] = {}
+_EXTENSIONS: Dict[str, str] = {}
+
+def register_format(mime: str, kind: str, extensions: Iterable[str] = (),
+                    sniff: Callable[[bytes], bool] = None, zip_marker: str = None) -> None:
+    """
+    Register a file format.
+
+    Parameters:
+        mime (str): The MIME type of the format.
+        kind (str): The extractor kind that reads it; the format is only supported while
+            ``EXTRACTORS`` has an extractor for this kind.
+        extensions (Iterable[str]): File extensions of the format, without the dot.
+        sniff (Callable[[bytes], bool], optional): Recognizes the format from the first bytes of a
+            file. Formats without one are identified by their extension.
+        zip_marker (str, optional): For formats stored in a zip container, an entry only that format
+            contains.
+    """
+    extensions = tuple(extension.lower() for extension in extensions)
+    _FORMATS[mime] = FileFormat(mime, kind, extensions, sniff, zip_marker)
+    for extension in extensions:
+        _EXTENSIONS[extension] = mime
+
+def _supported(mime: Optional[str]) -> Optional[FileFormat]:
+    file_format = _FORMATS.get(mime)
+    if file_format is not None and file_format.kind in EXTRACTORS:
+        return file_format
+    return None
+
+def supported_extensions() -> Set[str]:
+    """Return the extensions of every format that currently has an extractor."""
+    return {extension for extension, mime in _EXTENSIONS.items() if _supported(mime)}
+
+def _extension(filename: Optional[str]) -> str:
+    if not filename or '.' not in filename:
+        return ''
+    return filename.rsplit('.', 1)[1].lower()
+
+def _zip_format(file: FileStorage) -> Optional[str]:
+    """Tell zip-based formats apart from their entries, falling back to the extension."""
+    try:
+        with zipfile.ZipFile(file.stream) as archive:
+            names = set(archive.namelist())
+    except (zipfile.BadZipFile, OSError, ValueError):
+        names = None
+    finally:
+        file.stream.seek(0)
+
+    if names is not None:
+        for file_format in _FORMATS.values():
+            if file_format.zip_marker and file_format.zip_marker in names:
+                return file_format.mime
+        return ZIP_MIME
+
+    # A damaged or truncated container: trust the extension if it names a zip-based format
+    mime = _EXTENSIONS.get(_extension(file.filename))
+    if mime is not None and _FORMATS[mime].zip_marker:
+        return mime
+    return ZIP_MIME
+
+def sniff_mime(file: FileStorage) -> Optional[str]:
+    """
+    Detect the MIME type of an uploaded file from its content.
+
+    Parameters:
+        file (FileStorage): The uploaded file. Its stream is rewound afterwards.
+
+    Returns:
+        Optional[str]: The detected MIME type, or None if no registered signature matches.
+    """
+    file.stream.seek(0)
+    head = file.stream.read(SNIFF_BYTES)
+    file.stream.seek(0)
+    for file_format in _FORMATS.values():
+        if file_format.sniff is not None and file_format.sniff(head):
+            if file_format.mime == ZIP_MIME:
+                return _zip_format(file)
+            return file_format.mime
+    return None
+
+def detect_kind(file: FileStorage) -> Optional[str]:
+    """
+    Return the extractor kind for an uploaded file, detected from its content.
+
+    Files whose content matches no signature are accepted only if their extension names a format
+    without one (such as email).
+
+    Parameters:
+        file (FileStorage): The uploaded file.
+
+    Returns:
+        Optional[str]: The extractor kind, or None if the file type is not supported.
+    """
+    mime = sniff_mime(file)
+    extension_mime = _EXTENSIONS.get(_extension(file.filename))
+    if mime is None:
+        extension_format = _FORMATS.get(extension_mime)
+        if extension_format is not None and extension_format.sniff is None and not extension_format.zip_marker:
+            mime = extension_mime
+    elif extension_mime is not None and mime != extension_mime:
+        logging.info(f"{file.filename} is {mime}, not {extension_mime} as named")
+
+    file_format = _supported(mime)
+    return file_format.kind if file_format is not None else None
+
+def _starts_with(*signatures: bytes) -> Callable[[bytes], bool]:
+    return lambda head: head.startswith(signatures)
+
+def _is_pdf(head: bytes) -> bool:
+    # Readers accept a PDF header anywhere in the first kilobyte
+    return b'%PDF-' in head[:1024]
+
+def _is_webp(head: bytes) -> bool:
+    return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+
+def _is_heif(head: bytes) -> bool:
+    return head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'heim', b'heis', b'hevc', b'mif1', b'msf1')
+
+register_format('application/pdf', 'pdf', ['pdf'], sniff=_is_pdf)
+register_format('image/png', 'image', ['png'], sniff=_starts_with(b'\x89PNG\r\n\x1a\n'))
+register_format('image/jpeg', 'image', ['jpg', 'jpeg'], sniff=_starts_with(b'\xff\xd8\xff'))
+register_format('image/tiff', 'image', ['tif', 'tiff'], sniff=_starts_with(b'II*\x00', b'MM\x00*'))
+register_format('image/gif', 'image', ['gif'], sniff=_starts_with(b'GIF87a', b'GIF89a'))
+register_format('image/webp', 'image', ['webp'], sniff=_is_webp)
+register_format('image/heic', 'image' if HEIF_SUPPORTED else 'heic', ['heic', 'heif'], sniff=_is_heif)
+register_format(ZIP_MIME, 'zip', ['zip'], sniff=_starts_with(b'PK\x03\x04'))
+register_format('application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'docx', ['docx'],
+                zip_marker='word/document.xml')
+register_format('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'excel', ['xlsx'],
+                zip_marker='xl/workbook.xml')
+register_format('message/rfc822', 'email', ['eml'])
@@ -0,0 +1,86 @@
+# src/image_preprocessing.py
+
+"""
+Image Preprocessing Module
+==========================
+
+Tesseract's run time grows with pixel count, and phone photos of documents arrive at 12+ megapixels
+while the text on an ID card is legible at a fraction of that. This module normalizes images before
+OCR:
+
+- JPEGs are decoded at reduced size directly (DCT scaling), so full-size pixels are never built;
+- EXIF orientation is applied, so rotated phone photos are read upright;
+- images are converted to grayscale;
+- images are downscaled to ``OCR_TARGET_DPI`` when their DPI metadata is trustworthy, and in any
+  case to at most ``OCR_MAX_PIXELS``;
+- optionally, images are binarized.
+"""
+
+import os
+import math
+from PIL import Image, ImageOps
+
+# Upper bound on the pixels passed to Tesseract
+OCR_MAX_PIXELS = int(os.environ.get('OCR_MAX_PIXELS', 2_500_000))
+# Resolution Tesseract works best at; scans above it are downscaled to it
+OCR_TARGET_DPI = int(os.environ.get('OCR_TARGET_DPI', 300))
+# DPI metadata below this is treated as a placeholder (72 is common in phone photos) and ignored
+OCR_MIN_TRUSTED_DPI = 150
+# Threshold (0-255) for black and white conversion; 0 disables binarization
+OCR_BINARIZE_THRESHOLD = int(os.environ.get('OCR_BINARIZE_THRESHOLD', 0))
+# Tesseract language(s) and page segmentation mode
+OCR_LANG = os.environ.get('OCR_LANG', 'eng')
+OCR_PSM = int(os.environ.get('OCR_PSM', 3))
+
+def ocr_config() -> str:
+    """Return the Tesseract command line options for ``pytesseract``."""
+    return f'--psm {OCR_PSM}'
+
+def target_scale(image: Image.Image) -> float:
+    """
+    Compute the factor an image should be scaled by before OCR.
+
+    Parameters:
+        image (Image.Image): The image as opened by Pillow.
+
+    Returns:
+        float: The scale factor, at most 1.
+    """
+    width, height = image.size
+    scale = 1.0
+    dpi = image.info.get('dpi')
+    if dpi and OCR_MIN_TRUSTED_DPI <= float(dpi[0]) and float(dpi[0]) > OCR_TARGET_DPI:
+        scale = OCR_TARGET_DPI / float(dpi[0])
+    if width * height * scale * scale > OCR_MAX_PIXELS:
+        scale = math.sqrt(OCR_MAX_PIXELS / (width * height))
+    return scale
+
+def normalize_image(image: Image.Image) -> Image.Image:
+    """
+    Prepare an image for OCR: decode at reduced size, fix orientation, convert to grayscale,
+    downscale and optionally binarize.
+
+    Parameters:
+        image (Image.Image): The image as opened by Pillow, not yet loaded.
+
+    Returns:
+        Image.Image: The normalized image.
+    """
+    scale = target_scale(image)
+    target_pixels = image.width * image.height * scale * scale
+    if scale < 1:
+        # For JPEGs this makes the decoder skip detail and colour we would discard anyway
+        image.draft('L', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'L':
+        image = image.convert('L')
+
+    # Scale by area, which is the same whether or not the orientation fix swapped the axes
+    factor = math.sqrt(target_pixels / (image.width * image.height))
+    if factor < 1:
+        size = (max(1, int(image.width * factor)), max(1, int(image.height * factor)))
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    if OCR_BINARIZE_THRESHOLD:
+        image = image.point(lambda value: 255 if value > OCR_BINARIZE_THRESHOLD else 0, mode='1')
+    return image
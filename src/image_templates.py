@@ -0,0 +1,293 @@
+# src/image_templates.py
+
+"""
+Image Template Module
+=====================
+
+OCR is by far the most expensive step for image uploads, and many of them are instances of a few
+document designs: the same state's driver's license, the same passport card. This module recognises
+known designs from the pixels alone, so a full-page Tesseract run can be skipped or narrowed down.
+
+Every image gets a fingerprint, computed from a JPEG decoded at reduced size (DCT scaling), so it
+costs a few milliseconds:
+
+- a 64-bit perceptual hash (pHash): the signs of the lowest 8x8 frequencies of the discrete cosine
+  transform of a 32x32 grayscale thumbnail, relative to their median. It survives rescaling, JPEG
+  compression, blur and small rotations, and changes when the overall design does;
+- a layout fingerprint: a 16x16 grayscale thumbnail, slightly blurred so that small shifts and
+  rotations matter less, normalised to zero mean and unit length, so that the dot product of two
+  fingerprints is their correlation. It is not affected by brightness or contrast;
+- the average colour, which tells apart designs that differ mostly in colour, as the two others
+  work in grayscale;
+- the aspect ratio.
+
+A template is the fingerprint of a clean instance of a design, with the label of its documents and
+optionally an OCR region. An upload matches a template when the aspect ratios are within
+``IMAGE_TEMPLATE_MAX_ASPECT_DIFFERENCE``, the hashes differ in at most
+``IMAGE_TEMPLATE_MAX_DISTANCE`` bits, the layouts correlate by at least
+``IMAGE_TEMPLATE_MIN_CORRELATION`` and the average colours are within
+``IMAGE_TEMPLATE_MAX_COLOR_DISTANCE``. benchmarks/bench_image_templates.py measures how well the
+defaults separate designs. Then:
+
+- templates without a region label the upload directly, and OCR is skipped;
+- templates with a region, a box in fractions of the width and height, have only that part of the
+  image OCR'd, such as the heading of the card, and the text is classified as usual (see
+  ``classifier.py``, which falls back to the full image when the region does not settle the label).
+
+Templates are kept in the JSON file at ``IMAGE_TEMPLATES_PATH``; the fast path is off without one.
+They are added from sample images with:
+
+    python -m src.image_templates add sample.jpg --label drivers_license [--region 0,0,1,0.3]
+    python -m src.image_templates match upload.jpg
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import threading
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+from werkzeug.datastructures import FileStorage
+
+IMAGE_TEMPLATES_PATH = os.environ.get('IMAGE_TEMPLATES_PATH')
+# Differing perceptual hash bits (out of 64) up to which an image may match a template
+IMAGE_TEMPLATE_MAX_DISTANCE = int(os.environ.get('IMAGE_TEMPLATE_MAX_DISTANCE', 20))
+# Layout correlation from which an image may match a template
+IMAGE_TEMPLATE_MIN_CORRELATION = float(os.environ.get('IMAGE_TEMPLATE_MIN_CORRELATION', 0.8))
+# Distance between average RGB colours (0-255 per channel) up to which an image may match a template
+IMAGE_TEMPLATE_MAX_COLOR_DISTANCE = float(os.environ.get('IMAGE_TEMPLATE_MAX_COLOR_DISTANCE', 20))
+# Relative difference of aspect ratios up to which an image may match a template
+IMAGE_TEMPLATE_MAX_ASPECT_DIFFERENCE = float(os.environ.get('IMAGE_TEMPLATE_MAX_ASPECT_DIFFERENCE', 0.1))
+
+HASH_SIZE = 32
+LAYOUT_SIZE = 16
+LAYOUT_BLUR = 1
+
+Region = Tuple[float, float, float, float]
+
+@lru_cache(maxsize=1)
+def _dct_matrix() -> np.ndarray:
+    n = np.arange(HASH_SIZE)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * HASH_SIZE))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / HASH_SIZE)
+
+def _bit_counts(values: np.ndarray) -> np.ndarray:
+    """Count the set bits of each uint64 in ``values``; ``np.bitwise_count`` needs NumPy 2.0."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+class Fingerprint(NamedTuple):
+    """What an image is matched on; see the module documentation."""
+    phash: int
+    layout: np.ndarray
+    color: Tuple[float, float, float]
+    aspect: float
+
+def fingerprint(image: Image.Image) -> Fingerprint:
+    """
+    Compute the fingerprint of an image.
+
+    Parameters:
+        image (Image.Image): The image as opened by Pillow, preferably not yet loaded, so that
+            JPEGs are decoded at reduced size.
+
+    Returns:
+        Fingerprint: The perceptual hash, layout fingerprint, average colour and aspect ratio.
+    """
+    image.draft('RGB', (HASH_SIZE * 4, HASH_SIZE * 4))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    color = tuple(float(value) for value in image.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0)))
+    image = image.convert('L')
+
+    pixels = np.asarray(image.resize((HASH_SIZE, HASH_SIZE), Image.Resampling.BOX), dtype=np.float32)
+    dct = _dct_matrix()
+    frequencies = (dct @ pixels @ dct.T)[:8, :8].ravel()
+    # The first coefficient is the average brightness, which says nothing about the design
+    bits = frequencies > np.median(frequencies[1:])
+    phash = int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    thumbnail = image.resize((LAYOUT_SIZE, LAYOUT_SIZE), Image.Resampling.BOX)
+    layout = np.asarray(thumbnail.filter(ImageFilter.GaussianBlur(LAYOUT_BLUR)), dtype=np.float32).ravel()
+    layout -= layout.mean()
+    norm = np.linalg.norm(layout)
+    return Fingerprint(phash, layout / norm if norm else layout, color, image.width / image.height)
+
+def file_fingerprint(file: FileStorage) -> Fingerprint:
+    """Compute the fingerprint of an uploaded image (the first frame of multi-page ones)."""
+    file.seek(0)
+    fingerprint_ = fingerprint(Image.open(file.stream))
+    file.seek(0)
+    return fingerprint_
+
+def crop_region(image: Image.Image, region: Region) -> Image.Image:
+    """Crop ``image`` to ``region``, given in fractions of its width and height."""
+    left, top, right, bottom = region
+    return image.crop((round(left * image.width), round(top * image.height),
+                       round(right * image.width), round(bottom * image.height)))
+
+class ImageTemplate(NamedTuple):
+    """A known document design."""
+    name: str
+    label: str
+    fingerprint: Fingerprint
+    # Part of the image to OCR, in fractions of its width and height; None skips OCR
+    region: Optional[Region] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'label': self.label,
+            'phash': f'{self.fingerprint.phash:016x}',
+            'layout': [round(float(value), 5) for value in self.fingerprint.layout],
+            'color': [round(value, 2) for value in self.fingerprint.color],
+            'aspect': round(self.fingerprint.aspect, 5),
+            'region': list(self.region) if self.region is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ImageTemplate':
+        layout = np.array(data['layout'], dtype=np.float32)
+        if layout.shape != (LAYOUT_SIZE * LAYOUT_SIZE,):
+            raise ValueError(f"template {data['name']} has a layout of {layout.size} values")
+        region = tuple(data['region']) if data.get('region') is not None else None
+        fingerprint_ = Fingerprint(int(data['phash'], 16), layout, tuple(data['color']), data['aspect'])
+        return cls(data['name'], data['label'], fingerprint_, region)
+
+class TemplateMatch(NamedTuple):
+    """A template an image matched, and how closely."""
+    template: ImageTemplate
+    distance: int
+    correlation: float
+
+class TemplateIndex:
+    """
+    The known document designs, matched all at once.
+
+    Parameters:
+        templates (List[ImageTemplate]): The templates.
+        max_distance (int): See ``IMAGE_TEMPLATE_MAX_DISTANCE``.
+        min_correlation (float): See ``IMAGE_TEMPLATE_MIN_CORRELATION``.
+        max_color_distance (float): See ``IMAGE_TEMPLATE_MAX_COLOR_DISTANCE``.
+        max_aspect_difference (float): See ``IMAGE_TEMPLATE_MAX_ASPECT_DIFFERENCE``.
+    """
+
+    def __init__(self, templates: List[ImageTemplate] = (), max_distance: int = IMAGE_TEMPLATE_MAX_DISTANCE,
+                 min_correlation: float = IMAGE_TEMPLATE_MIN_CORRELATION,
+                 max_color_distance: float = IMAGE_TEMPLATE_MAX_COLOR_DISTANCE,
+                 max_aspect_difference: float = IMAGE_TEMPLATE_MAX_ASPECT_DIFFERENCE):
+        self.max_distance = max_distance
+        self.min_correlation = min_correlation
+        self.max_color_distance = max_color_distance
+        self.max_aspect_difference = max_aspect_difference
+        self.templates: List[ImageTemplate] = []
+        # Identifies the templates, for the result cache keys (see classifier_version)
+        self.version = 'none'
+        for template in templates:
+            self.add(template)
+
+    def add(self, template: ImageTemplate) -> None:
+        self.templates = [known for known in self.templates if known.name != template.name] + [template]
+        self._phashes = np.array([known.fingerprint.phash for known in self.templates], dtype=np.uint64)
+        self._layouts = np.stack([known.fingerprint.layout for known in self.templates])
+        self._colors = np.array([known.fingerprint.color for known in self.templates])
+        self._aspects = np.array([known.fingerprint.aspect for known in self.templates])
+        described = json.dumps([known.to_dict() for known in self.templates], sort_keys=True)
+        self.version = hashlib.sha256(described.encode('utf-8')).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def match(self, fingerprint: Fingerprint) -> Optional[TemplateMatch]:
+        """Return the best matching template, by layout correlation, or None if none matches."""
+        if not self.templates:
+            return None
+        distances = _bit_counts(self._phashes ^ np.uint64(fingerprint.phash))
+        correlations = self._layouts @ fingerprint.layout
+        colors = np.linalg.norm(self._colors - fingerprint.color, axis=1)
+        aspects = np.abs(self._aspects - fingerprint.aspect) / self._aspects
+        matching = ((distances <= self.max_distance) & (correlations >= self.min_correlation)
+                    & (colors <= self.max_color_distance) & (aspects <= self.max_aspect_difference))
+        if not matching.any():
+            return None
+        best = int(np.where(matching, correlations, -np.inf).argmax())
+        return TemplateMatch(self.templates[best], int(distances[best]), float(correlations[best]))
+
+    @classmethod
+    def load(cls, path: str) -> 'TemplateIndex':
+        with open(path) as f:
+            data = json.load(f)
+        return cls([ImageTemplate.from_dict(template) for template in data['templates']])
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump({'templates': [template.to_dict() for template in self.templates]}, f, indent=1)
+            f.write('\n')
+
+_index: Optional[TemplateIndex] = None
+_index_lock = threading.Lock()
+
+def get_template_index() -> Optional[TemplateIndex]:
+    """Return the templates of ``IMAGE_TEMPLATES_PATH``, loaded on first use, or None if there are none."""
+    global _index
+    if not IMAGE_TEMPLATES_PATH:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    _index = TemplateIndex.load(IMAGE_TEMPLATES_PATH)
+                except (OSError, ValueError, KeyError) as e:
+                    logging.error(f"Error loading image templates from {IMAGE_TEMPLATES_PATH}: {e}")
+                    _index = TemplateIndex()
+    return _index if len(_index) else None
+
+def _parse_region(value: str) -> Region:
+    region = tuple(float(part) for part in value.split(','))
+    if len(region) != 4 or not (0 <= region[0] < region[2] <= 1 and 0 <= region[1] < region[3] <= 1):
+        raise argparse.ArgumentTypeError('expected left,top,right,bottom fractions between 0 and 1')
+    return region
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage the known image document templates.')
+    parser.add_argument('--path', default=IMAGE_TEMPLATES_PATH, required=not IMAGE_TEMPLATES_PATH,
+                        help='template file (default: IMAGE_TEMPLATES_PATH)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='add or replace a template from a sample image')
+    add.add_argument('image')
+    add.add_argument('--label', required=True, help='the document type of images of this design')
+    add.add_argument('--name', help='template name (default: the image file name)')
+    add.add_argument('--region', type=_parse_region, help='left,top,right,bottom fractions to OCR; '
+                                                         'without it matching images are not OCR\'d')
+    match = commands.add_parser('match', help='show which template an image matches')
+    match.add_argument('images', nargs='+')
+    args = parser.parse_args(argv)
+
+    index = TemplateIndex.load(args.path) if os.path.exists(args.path) else TemplateIndex()
+    if args.command == 'add':
+        with Image.open(args.image) as image:
+            template = ImageTemplate(args.name or os.path.basename(args.image), args.label,
+                                     fingerprint(image), args.region)
+        index.add(template)
+        index.save(args.path)
+        print(f"Saved template {template.name} ({template.label}); {len(index)} templates", file=sys.stderr)
+        return
+    for path in args.images:
+        with Image.open(path) as image:
+            found = index.match(fingerprint(image))
+        if found is None:
+            print(f'{path}: no template')
+        else:
+            print(f'{path}: {found.template.name} ({found.template.label}), '
+                  f'{found.distance} bits, correlation {found.correlation:.3f}')
+
+if __name__ == '__main__':
+    main()
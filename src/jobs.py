@@ -0,0 +1,350 @@
+# src/jobs.py
+
+"""
+Jobs Module
+===========
+
+Large PDFs and OCR can take longer than a gateway's request timeout, so classification can also run
+as a background job: the request returns a job id immediately, and the client polls for the result
+or registers a callback URL that receives it. Callbacks are sent from inside the deployment, so
+only URLs whose host resolves to public addresses are accepted, unless the host is listed in
+``JOB_CALLBACK_ALLOWED_HOSTS``; the URL is checked at submission and again before sending, and
+redirects are not followed. Otherwise anyone able to submit a job could make the service post to
+loopback, private networks or the cloud metadata endpoint.
+
+Jobs run on a local in-process queue served by a fixed number of worker threads, so no external
+broker is needed. The queue depth is bounded; when it is full, new jobs are rejected and the API
+answers 429 so clients back off. Finished jobs are kept for ``JOB_TTL`` seconds.
+
+A job runs in the process that accepted it, but under the preforking server (see server.py) the
+client's next request may reach any worker. Job states are therefore also written to a SQLite
+:class:`JobStore` at ``JOB_STORE_PATH``, shared by the workers, so a job can be polled from any of
+them. The server opens one in a temporary directory when it runs more than one worker and
+``JOB_STORE_PATH`` is not set.
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import socket
+import sqlite3
+import logging
+import ipaddress
+import threading
+import urllib.request
+from urllib.parse import urlparse
+from typing import Callable, Dict, Optional
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_QUEUE_MAX_DEPTH = int(os.environ.get('JOB_QUEUE_MAX_DEPTH', 1000))
+JOB_TTL = float(os.environ.get('JOB_TTL', 60 * 60))
+JOB_CALLBACK_TIMEOUT = float(os.environ.get('JOB_CALLBACK_TIMEOUT', 10))
+# SQLite database of job states, shared by the server's worker processes
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH')
+# Comma-separated callback hosts; when set, only these are accepted, and they may be internal
+JOB_CALLBACK_ALLOWED_HOSTS = tuple(
+    host.strip().lower() for host in os.environ.get('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip())
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its maximum depth."""
+
+class InvalidCallback(ValueError):
+    """Raised when a callback URL is not http(s), or its host is not allowed."""
+
+def check_callback_url(url: str) -> None:
+    """
+    Check that a job result may be posted to ``url``.
+
+    Args:
+        url (str): The callback URL.
+
+    Raises:
+        InvalidCallback: If the URL is not http(s), or its host is not in ``JOB_CALLBACK_ALLOWED_HOSTS``
+            when that is set, or resolves to a loopback, private, link-local or otherwise non-public
+            address when it is not.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise InvalidCallback("callback_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if JOB_CALLBACK_ALLOWED_HOSTS:
+        if host not in JOB_CALLBACK_ALLOWED_HOSTS:
+            raise InvalidCallback(f"callback host {host} is not allowed")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or 80, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError, ValueError) as e:
+        raise InvalidCallback(f"callback host {host} does not resolve: {e}")
+    for address in addresses:
+        # Scoped IPv6 addresses carry their interface after a '%'
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            raise InvalidCallback(f"callback host {host} resolves to the non-public address {ip}")
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A public callback URL must not lead to an internal one
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+class Job:
+    """A classification job and its timings."""
+
+    def __init__(self, payload, callback_url: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.callback_url = callback_url
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        queue_wait = (self.started_at or time.time()) - self.submitted_at
+        processing = (self.finished_at - self.started_at) if self.finished_at and self.started_at else None
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "file_class": self.result,
+            "error": self.error,
+            "queue_wait_ms": round(queue_wait * 1000, 3),
+            "processing_ms": round(processing * 1000, 3) if processing is not None else None,
+        }
+
+class JobStore:
+    """
+    Job states in SQLite, so that every process sharing the database can report every job.
+
+    Connections are opened per process, as they must not be used across a fork.
+
+    Args:
+        path (str): SQLite database file.
+    """
+
+    _FIELDS = ('id', 'status', 'result', 'error', 'submitted_at', 'started_at', 'finished_at')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        with self._lock:
+            db = self._connection()
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY, status TEXT, result TEXT, error TEXT,'
+                ' submitted_at REAL, started_at REAL, finished_at REAL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)')
+            db.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._db
+
+    def save(self, job: 'Job') -> None:
+        """Write the current state of a job."""
+        with self._lock:
+            db = self._connection()
+            db.execute('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       tuple(getattr(job, field) for field in self._FIELDS))
+            db.commit()
+
+    def load(self, job_id: str) -> Optional['Job']:
+        """Return a job as last saved by any process, or None if it is not in the store."""
+        with self._lock:
+            row = self._connection().execute(
+                f'SELECT {", ".join(self._FIELDS)} FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = Job(None)
+        for field, value in zip(self._FIELDS, row):
+            setattr(job, field, value)
+        return job
+
+    def expire(self, cutoff: float) -> None:
+        """Delete the jobs that finished before ``cutoff`` (a Unix timestamp)."""
+        with self._lock:
+            db = self._connection()
+            db.execute('DELETE FROM jobs WHERE finished_at < ?', (cutoff,))
+            db.commit()
+
+class JobQueue:
+    """
+    A bounded in-process job queue with worker threads.
+
+    Parameters:
+        handler (Callable): Called with a job's payload; its return value is the job's result.
+        workers (int): Number of worker threads.
+        max_depth (int): Maximum number of queued (not yet started) jobs.
+        ttl (float): Seconds a finished job is kept for polling.
+        store (JobStore, optional): Where job states are shared with other processes; defaults to
+            one at ``JOB_STORE_PATH``, if set.
+    """
+
+    def __init__(self, handler: Callable, workers: int = JOB_WORKERS,
+                 max_depth: int = JOB_QUEUE_MAX_DEPTH, ttl: float = JOB_TTL,
+                 store: Optional[JobStore] = None):
+        self.handler = handler
+        self.ttl = ttl
+        self.store = store if store is not None or not JOB_STORE_PATH else JobStore(JOB_STORE_PATH)
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=max_depth)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._counters = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'expired': 0}
+        self._timings = {'queue_wait': [0, 0.0, 0.0], 'processing': [0, 0.0, 0.0]}  # count, sum, max
+        self.workers = workers
+        self._closed = False
+        # Threads do not survive fork, so workers are started on first use in each process
+        self._workers_pid: Optional[int] = None
+
+    def _start_workers(self) -> None:
+        with self._lock:
+            if self._workers_pid == os.getpid():
+                return
+            self._workers_pid = os.getpid()
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True).start()
+
+    def submit(self, payload, callback_url: Optional[str] = None) -> Job:
+        """
+        Queue a job.
+
+        Raises:
+            QueueFull: If the queue is at its maximum depth, or draining.
+        """
+        if self._workers_pid != os.getpid():
+            self._start_workers()
+        self._expire()
+        job = Job(payload, callback_url)
+        with self._lock:
+            if self._closed:
+                self._counters['rejected'] += 1
+                raise QueueFull("job queue is shutting down")
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._counters['rejected'] += 1
+                raise QueueFull(f"job queue is full ({self._queue.maxsize} jobs)")
+            self._jobs[job.id] = job
+            self._counters['submitted'] += 1
+        self._save(job)
+        return job
+
+    def _save(self, job: Job) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+        except sqlite3.Error as e:
+            logging.error(f"Error saving job {job.id}: {e}")
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Stop accepting jobs and wait for the queued and running ones to finish.
+
+        Returns:
+            bool: Whether every job finished within ``timeout`` seconds.
+        """
+        with self._lock:
+            self._closed = True
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._queue.all_tasks_done.wait(remaining):
+                    break
+            return not self._queue.unfinished_tasks
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by id, or None if it does not exist or has expired."""
+        self._expire()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            # Accepted by another process
+            try:
+                job = self.store.load(job_id)
+            except sqlite3.Error as e:
+                logging.error(f"Error loading job {job_id}: {e}")
+        return job
+
+    def stats(self) -> dict:
+        """Return the queue depth, job counters and queue-wait/processing time summaries."""
+        with self._lock:
+            stats = dict(self._counters, depth=self._queue.qsize(), retained=len(self._jobs))
+            for name, (count, total, maximum) in self._timings.items():
+                stats[f'{name}_avg_ms'] = round(total / count * 1000, 3) if count else 0
+                stats[f'{name}_max_ms'] = round(maximum * 1000, 3)
+            return stats
+
+    def _record(self, name: str, seconds: float) -> None:
+        timing = self._timings[name]
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            self._counters['expired'] += len(expired)
+        if self.store is not None:
+            try:
+                self.store.expire(cutoff)
+            except sqlite3.Error as e:
+                logging.error(f"Error expiring jobs: {e}")
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            job.status = 'running'
+            self._save(job)
+            try:
+                job.result = self.handler(job.payload)
+                job.status = 'done'
+            except Exception as e:
+                logging.error(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.finished_at = time.time()
+                job.payload = None  # release the upload as soon as possible
+                with self._lock:
+                    self._counters['completed' if job.status == 'done' else 'failed'] += 1
+                    self._record('queue_wait', job.started_at - job.submitted_at)
+                    self._record('processing', job.finished_at - job.started_at)
+                self._save(job)
+            if job.callback_url:
+                self._send_callback(job)
+            self._queue.task_done()
+
+    def _send_callback(self, job: Job) -> None:
+        # The host may resolve elsewhere by now
+        try:
+            check_callback_url(job.callback_url)
+        except InvalidCallback as e:
+            logging.error(f"Callback for job {job.id} to {job.callback_url} refused: {e}")
+            return
+        request = urllib.request.Request(
+            job.callback_url, data=json.dumps(job.to_dict()).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST',
+        )
+        try:
+            with _callback_opener.open(request, timeout=JOB_CALLBACK_TIMEOUT):
+                pass
+        except Exception as e:
+            logging.error(f"Callback for job {job.id} to {job.callback_url} failed: {e}")
@@ -0,0 +1,129 @@
+# src/lifecycle.py
+
+"""
+Lifecycle Module
+================
+
+Warm-up, readiness and draining of a serving process.
+
+``warm_up`` loads everything a request may need: the parsing and OCR libraries that
+``extractors.py`` otherwise imports on first use, the compiled rules, the ML model, the NLTK
+stopwords, the saved near-duplicate index, the image templates, and the Tesseract binary check.
+``src/server.py`` runs it once in the master process before forking workers, so they start ready
+and share what was loaded copy-on-write.
+
+``/readyz`` reports ready only between the end of warm-up and the start of draining, so a load
+balancer neither sends requests to a cold process nor to one that is shutting down. ``/healthz``
+only says the process is serving.
+
+The libraries and rules are required, and warm-up fails without them. The model, stopwords,
+near-duplicate index, image templates and Tesseract are optional: the classifier works without
+them, so their absence is reported but does not keep the process from becoming ready.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, Tuple
+
+_ready = threading.Event()
+_draining = threading.Event()
+
+# Outcome of every warm-up step: {'status': 'ok' or 'unavailable', 'detail': ..., 'seconds': ...}
+WARMUP_REPORT: Dict[str, dict] = {}
+
+def _import_libraries() -> str:
+    from . import extractors
+    from .pdf_text import RawTextConverter  # noqa: F401 - imports pdfminer
+    from pdfminer.pdfinterp import PDFPageInterpreter  # noqa: F401
+    from pdfminer.pdfpage import PDFPage  # noqa: F401
+    loaded = []
+    for name in ('docx', 'pytesseract', 'pypdfium2', 'openpyxl'):
+        module = getattr(extractors, name)
+        if module is not None:
+            getattr(module, '__file__')  # resolves a lazily imported module
+            loaded.append(name)
+    return ', '.join(['pdfminer'] + loaded)
+
+def _compile_rules() -> str:
+    from .rule_registry import get_rule_registry
+    return get_rule_registry().current().version
+
+def _load_model() -> str:
+    from .classifierMLExample import MODEL_DIR, load_model
+    load_model()
+    return MODEL_DIR
+
+def _load_stopwords() -> str:
+    if WARMUP_REPORT.get('model', {}).get('status') != 'ok':
+        return 'skipped: only the ML model preprocesses text'
+    from .preprocessing import stop_words
+    try:
+        return f'{len(stop_words())} words'
+    except LookupError:
+        raise LookupError("NLTK stopwords corpus not downloaded: run nltk.download('stopwords')")
+
+def _load_near_duplicate_index() -> str:
+    from .near_duplicates import get_near_duplicate_index
+    index = get_near_duplicate_index()
+    if index is None:
+        return 'disabled'
+    return f'{len(index)} documents'
+
+def _load_image_templates() -> str:
+    from .image_templates import get_template_index
+    index = get_template_index()
+    return f'{len(index)} templates' if index is not None else 'none'
+
+def _check_tesseract() -> str:
+    from .extractors import pytesseract
+    return str(pytesseract.get_tesseract_version())
+
+# (name, step, required) in the order they run
+WARMUP_STEPS: Tuple[Tuple[str, Callable[[], str], bool], ...] = (
+    ('libraries', _import_libraries, True),
+    ('rules', _compile_rules, True),
+    ('model', _load_model, False),
+    ('stopwords', _load_stopwords, False),
+    ('near_duplicates', _load_near_duplicate_index, False),
+    ('image_templates', _load_image_templates, False),
+    ('tesseract', _check_tesseract, False),
+)
+
+def warm_up() -> Dict[str, dict]:
+    """
+    Run every warm-up step and mark the process ready.
+
+    Returns:
+        Dict[str, dict]: The outcome of each step, also kept in ``WARMUP_REPORT``.
+
+    Raises:
+        Exception: Whatever a required step raised; the process is then not ready.
+    """
+    for name, step, required in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            detail, status = step(), 'ok'
+        except Exception as e:
+            if required:
+                logging.error(f"Warm-up step {name} failed: {e}")
+                raise
+            logging.warning(f"Warm-up step {name} failed, continuing without it: {e}")
+            detail, status = str(e), 'unavailable'
+        WARMUP_REPORT[name] = {
+            'status': status,
+            'detail': detail,
+            'seconds': round(time.perf_counter() - start, 4),
+        }
+    _ready.set()
+    return WARMUP_REPORT
+
+def is_ready() -> bool:
+    return _ready.is_set() and not _draining.is_set()
+
+def is_draining() -> bool:
+    return _draining.is_set()
+
+def start_draining() -> None:
+    """Report not ready from now on, so no new requests are routed to this process."""
+    _draining.set()
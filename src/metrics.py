@@ -0,0 +1,425 @@
+# src/metrics.py
+
+"""
+Metrics Module
+==============
+
+This module records where the time of each classification goes and exposes it in the Prometheus
+text format on ``/metrics``:
+
+- ``classifier_stage_seconds``: a histogram per stage (sniff, hash, extract, score, pdf_text_layer,
+  pdf_render, ocr, docx_parse, ...), labelled by file kind and outcome ('ok' or 'error');
+- ``classifier_upload_bytes``: a histogram of upload sizes per file kind;
+- ``classifier_results_total``: a counter per returned label;
+- ``http_request_duration_seconds``: a histogram per route and status code;
+- ``classifier_queue_seconds``, ``classifier_scheduler_rejections_total`` and
+  ``classifier_coalesced_total``: the time classifications waited for a slot, the ones refused and
+  the ones that shared the result of an identical classification, per extractor class (see
+  scheduler.py).
+
+Recording a stage costs a ``perf_counter`` call on each side, a bisect over the bucket bounds and an
+uncontended lock, about a microsecond in total (see benchmarks/bench_metrics.py), which is
+negligible next to any extraction.
+
+A request can also be traced: while a trace is active in the current context (see
+:func:`start_trace`), every stage is appended to it as well, and the app returns the list in a
+``Server-Timing`` response header.
+
+Metrics are kept per process. Stages timed inside extraction pool workers are not reported; the
+``extract`` stage timed around the pool call covers them. Under the preforking server (see
+server.py) a scrape reaches one worker of several, so the workers share their metrics through a
+directory (``METRICS_DIR``, or a temporary one the server creates): every worker writes a snapshot
+of its values there every ``METRICS_SNAPSHOT_INTERVAL`` seconds, and a scrape adds the other
+workers' snapshots to its own live values. Counters and histograms are summed, including those of
+workers that have exited, which fold their values into the directory on exit, so totals never go
+backwards. Collector samples (cache sizes, job queue and scheduler state) describe one process, so
+they are reported per live worker, with a ``worker`` label.
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Directory where the server's worker processes share their metrics; see Registry.share
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Seconds between the snapshots a worker writes there
+METRICS_SNAPSHOT_INTERVAL = float(os.environ.get('METRICS_SNAPSHOT_INTERVAL', 1))
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Upper bounds of the size buckets, in bytes: 1 KB to 256 MB in powers of four
+SIZE_BUCKETS = tuple(1024 * 4 ** exponent for exponent in range(10))
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """
+    A monotonically increasing count per combination of label values.
+
+    Parameters:
+        name (str): The metric name.
+        documentation (str): The help text.
+        labelnames (Sequence[str]): The label names.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> list:
+        """Return the values as JSON-serialisable ``[labels, value]`` rows."""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    @staticmethod
+    def combine(snapshots: Iterable[list]) -> Dict[Tuple[str, ...], float]:
+        """Sum the rows of several snapshots per combination of label values."""
+        values: Dict[Tuple[str, ...], float] = {}
+        for rows in snapshots:
+            for labels, value in rows:
+                values[tuple(labels)] = values.get(tuple(labels), 0) + value
+        return values
+
+    @staticmethod
+    def rows(values: Dict[Tuple[str, ...], float]) -> list:
+        """Turn combined values back into snapshot rows."""
+        return [[list(labels), value] for labels, value in values.items()]
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in sorted(values.items())]
+
+class Histogram:
+    """
+    Observations counted into cumulative buckets per combination of label values.
+
+    Parameters:
+        name (str): The metric name.
+        documentation (str): The help text.
+        labelnames (Sequence[str]): The label names.
+        buckets (Sequence[float]): The upper bounds of the buckets, in increasing order.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Label values -> [count per bucket (the last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return sum(series[0]) if series else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> list:
+        """Return the series as JSON-serialisable ``[labels, bucket counts, sum]`` rows."""
+        with self._lock:
+            return [[list(labels), list(counts), total] for labels, (counts, total) in self._series.items()]
+
+    @staticmethod
+    def combine(snapshots: Iterable[list]) -> Dict[Tuple[str, ...], list]:
+        """Sum the rows of several snapshots per combination of label values."""
+        series: Dict[Tuple[str, ...], list] = {}
+        for rows in snapshots:
+            for labels, counts, total in rows:
+                combined = series.setdefault(tuple(labels), [[0] * len(counts), 0.0])
+                combined[0] = [a + b for a, b in zip(combined[0], counts)]
+                combined[1] += total
+        return series
+
+    @staticmethod
+    def rows(series: Dict[Tuple[str, ...], list]) -> list:
+        """Turn combined series back into snapshot rows."""
+        return [[list(labels), counts, total] for labels, (counts, total) in series.items()]
+
+    def render(self, series: Optional[Dict[Tuple[str, ...], list]] = None) -> List[str]:
+        if series is None:
+            with self._lock:
+                series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        lines = []
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+class Registry:
+    """The metrics of the process, plus collectors that report values owned by other modules."""
+
+    # The snapshot holding the values of the processes that have exited
+    RETIRED = 'retired'
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+        self.directory: Optional[str] = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]) -> None:
+        """
+        Add a callable run at every scrape, yielding ``(name, type, help, labels, value)`` samples
+        for values kept elsewhere, such as the result cache statistics.
+        """
+        self._collectors.append(collector)
+
+    def _samples(self) -> list:
+        return [[name, kind, documentation, dict(labels), value]
+                for collector in self._collectors
+                for name, kind, documentation, labels, value in collector()]
+
+    def share(self, directory: str) -> None:
+        """
+        Share metrics with the other processes using ``directory``; call before forking them.
+
+        The values recorded so far are left to the directory, as every forked process inherits a
+        copy of them, and each then starts from zero.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._write(self.RETIRED, {'metrics': self._snapshots()})
+
+    def start_sharing(self, interval: float = METRICS_SNAPSHOT_INTERVAL) -> None:
+        """In a forked process, start from zero and write a snapshot every ``interval`` seconds."""
+        if self.directory is None:
+            return
+        for metric in self._metrics:
+            metric.clear()
+        # A process killed before retiring may have had the same pid
+        with self._locked():
+            left = self._read(str(os.getpid()))
+            if left is not None:
+                retired = self._read(self.RETIRED) or {'metrics': {}}
+                self._write(self.RETIRED, {'metrics': self._combined([retired['metrics'], left['metrics']])})
+
+        def write_snapshots():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot()
+                except Exception as e:
+                    logging.error(f"Error writing the metrics snapshot: {e}")
+
+        threading.Thread(target=write_snapshots, name='metrics-snapshots', daemon=True).start()
+
+    def write_snapshot(self) -> None:
+        """Write the metrics and collector samples of this process to the shared directory."""
+        self._write(str(os.getpid()), {'metrics': self._snapshots(), 'samples': self._samples()})
+
+    def retire(self) -> None:
+        """Fold the metrics of this exiting process into the shared directory's retired values."""
+        if self.directory is None:
+            return
+        with self._locked():
+            retired = self._read(self.RETIRED) or {'metrics': {}}
+            self._write(self.RETIRED, {'metrics': self._combined([retired['metrics'], self._snapshots()])})
+            try:
+                os.remove(self._path(str(os.getpid())))
+            except FileNotFoundError:
+                pass
+
+    def _snapshots(self) -> Dict[str, list]:
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def _combined(self, snapshots: List[Dict[str, list]]) -> Dict[str, list]:
+        return {metric.name: metric.rows(metric.combine(snapshot.get(metric.name, []) for snapshot in snapshots))
+                for metric in self._metrics}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.json')
+
+    def _write(self, name: str, snapshot: dict) -> None:
+        temporary = f'{self._path(name)}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, self._path(name))
+
+    def _read(self, name: str) -> Optional[dict]:
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @contextmanager
+    def _locked(self, operation: int = fcntl.LOCK_EX) -> Iterator[None]:
+        # Retiring moves values from a process's snapshot to the retired one, which a scrape must
+        # not see halfway
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+    def _others(self) -> Tuple[List[Dict[str, list]], List[Tuple[int, list]]]:
+        """Return the metric snapshots of the other processes, and the samples of the live ones."""
+        snapshots, samples = [], []
+        with self._locked(fcntl.LOCK_SH):
+            names = [entry[:-len('.json')] for entry in os.listdir(self.directory) if entry.endswith('.json')]
+            for name in names:
+                if name == str(os.getpid()):
+                    continue
+                snapshot = self._read(name)
+                if snapshot is None:
+                    continue
+                snapshots.append(snapshot['metrics'])
+                if name != self.RETIRED and _alive(int(name)):
+                    samples.append((int(name), snapshot['samples']))
+        return snapshots, samples
+
+    def render(self) -> str:
+        if self.directory is None:
+            series = {metric.name: None for metric in self._metrics}
+            samples = self._samples()
+        else:
+            others, other_samples = self._others()
+            series = {metric.name: metric.combine(snapshot.get(metric.name, []) for snapshot in [self._snapshots()] + others)
+                      for metric in self._metrics}
+            samples = [[name, kind, documentation, dict(labels, worker=str(pid)), value]
+                       for pid, rows in [(os.getpid(), self._samples())] + sorted(other_samples)
+                       for name, kind, documentation, labels, value in rows]
+
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render(series[metric.name]))
+        described = set()
+        for name, kind, documentation, labels, value in sorted(samples, key=lambda sample: sample[0]):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'classifier_stage_seconds', 'Time spent in each classification stage.', ('stage', 'kind', 'outcome')))
+UPLOAD_BYTES = REGISTRY.register(Histogram(
+    'classifier_upload_bytes', 'Size of classified uploads.', ('kind',), SIZE_BUCKETS))
+RESULTS = REGISTRY.register(Counter(
+    'classifier_results_total', 'Classification results by label.', ('file_class',)))
+UPLOAD_REJECTIONS = REGISTRY.register(Counter(
+    'classifier_upload_rejections_total', 'Uploads refused before being read.', ('reason',)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency.', ('route', 'status')))
+QUEUE_SECONDS = REGISTRY.register(Histogram(
+    'classifier_queue_seconds', 'Time classifications waited for a slot of their extractor class.',
+    ('pool', 'priority')))
+SCHEDULER_REJECTIONS = REGISTRY.register(Counter(
+    'classifier_scheduler_rejections_total', 'Classifications refused for lack of free slots.', ('pool', 'priority')))
+COALESCED = REGISTRY.register(Counter(
+    'classifier_coalesced_total', 'Classifications that shared the result of an identical one in progress.',
+    ('pool',)))
+
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('trace', default=None)
+
+def start_trace() -> List[Tuple[str, float]]:
+    """Start collecting the stages run in the current context; returns the list they are added to."""
+    trace: List[Tuple[str, float]] = []
+    _trace.set(trace)
+    return trace
+
+def end_trace() -> None:
+    _trace.set(None)
+
+def server_timing(trace: List[Tuple[str, float]]) -> str:
+    """Format traced stages as a ``Server-Timing`` header value, durations in milliseconds."""
+    return ', '.join(f'{name};dur={seconds * 1000:.3f}' for name, seconds in trace)
+
+class stage:
+    """
+    Time a block as one stage of a classification.
+
+    Use as ``with stage('extract', kind) as timed:``; the kind can still be set on ``timed`` inside
+    the block, for stages that discover it. A block left by an exception is recorded with the
+    'error' outcome.
+    """
+
+    __slots__ = ('name', 'kind', '_start')
+
+    def __init__(self, name: str, kind: str = ''):
+        self.name = name
+        self.kind = kind
+
+    def __enter__(self) -> 'stage':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._start
+        STAGE_SECONDS.observe(elapsed, self.name, self.kind or 'unknown', 'ok' if exc_type is None else 'error')
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((self.name, elapsed))
@@ -0,0 +1,327 @@
+# src/near_duplicates.py
+
+"""
+Near-Duplicate Index Module
+===========================
+
+Besides byte-identical re-uploads (see cache.py), many uploads are near-identical: the same invoice
+template with other numbers, a bank's monthly statements. This module finds an already classified
+document whose text is nearly the same as a new one's, so that its label can be reused.
+
+This is a consistency feature, not a performance one: the lookup needs the document's text, so it
+runs after extraction, which is nearly all of a classification's cost, and only spares the scoring.
+What it buys is that documents of the same template get the same label, even when a borderline one
+would score differently on its own. It is therefore disabled unless ``NEAR_DUPLICATE_INDEX_SIZE`` is
+set.
+
+Texts are compared by the Jaccard similarity of their shingles, the runs of ``SHINGLE_WORDS``
+consecutive words, with every number replaced by the same token so that invoice numbers, dates and
+amounts do not count. The similarity is estimated with MinHash: a document's signature holds the
+minimum of each of ``PERMUTATIONS`` hash functions over its shingles, and the fraction of signature
+positions two documents agree on estimates their similarity. Signatures are built incrementally from
+the pages or paragraphs the extractors produce (see :class:`MinHashSketch`), so the full text is not
+needed. Only 16 bits of each minimum are kept (b-bit MinHash), 128 bytes per document.
+
+Candidates are found by locality-sensitive hashing: the signature is cut into ``BANDS`` bands, and
+each band's table maps a hash of the band to a bucket of the most recent documents with that band.
+Two documents with a similarity of 0.9 share at least one band 99% of the time, two with 0.5 only 3%
+of the time. Candidates are then verified on the full signature.
+
+The index is a fixed set of numpy arrays, so memory is bounded by ``capacity`` (about 230 bytes per
+document) and a lookup costs a few numpy operations whatever the number of documents:
+
+- the signatures, labels and content hashes of the documents, in a ring of ``capacity`` slots where
+  the newest document overwrites the oldest;
+- one bucket table per band holding slot numbers. A bucket entry whose slot was overwritten since
+  simply fails verification, so eviction needs no bookkeeping.
+
+Labels depend on the classification rules, so the index is emptied whenever the classifier version
+changes. It can be saved to a .npz file and is loaded from ``NEAR_DUPLICATE_INDEX_PATH`` on startup.
+Every server worker holds an index of its own, started from that file, so on exit each one merges
+the documents it added into the file, under a lock (see :meth:`NearDuplicateIndex.merge_into`),
+rather than overwriting what the others saved.
+"""
+
+import os
+import re
+import json
+import fcntl
+import logging
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+import numpy as np
+
+# Documents kept in the index, such as 100000; 0, the default, disables near-duplicate detection
+NEAR_DUPLICATE_INDEX_SIZE = int(os.environ.get('NEAR_DUPLICATE_INDEX_SIZE', 0))
+# Estimated similarity from which a document's label is reused
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.9))
+# Shingles a document needs before it is looked up or indexed; shorter texts are too easily alike
+NEAR_DUPLICATE_MIN_SHINGLES = int(os.environ.get('NEAR_DUPLICATE_MIN_SHINGLES', 20))
+NEAR_DUPLICATE_INDEX_PATH = os.environ.get('NEAR_DUPLICATE_INDEX_PATH')
+
+SHINGLE_WORDS = 4
+PERMUTATIONS = 64
+BANDS = 8
+ROWS = PERMUTATIONS // BANDS
+# Slots per bucket of a band table
+BUCKET_WAYS = 4
+# Fixed, so that signatures computed by any process, or loaded from a file, are comparable
+SEED = 1
+
+# Words and numbers; numbers are all hashed as the same token
+_TOKEN = re.compile(r'\d+|[^\W\d_]+')
+# A word at the end of a chunk may continue in the next one
+_TRAILING_WORD = re.compile(r'\w+\Z')
+_NUMBER = '0'
+# Shingles hashed at a time, bounding the (shingles x permutations) temporary
+_BLOCK = 4096
+
+_rng = np.random.default_rng(SEED)
+# Multiply-add hash functions over 64-bit shingle hashes; odd multipliers make them permutations
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_INCREMENTS = _rng.integers(0, 2 ** 63, PERMUTATIONS, dtype=np.uint64)
+_SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_BAND_MULTIPLIER = np.uint64(0xBF58476D1CE4E5B9)
+_BAND_IDS = np.arange(BANDS)
+_EMPTY = np.iinfo(np.uint64).max
+
+@lru_cache(maxsize=1 << 16)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class MinHashSketch:
+    """
+    Build the MinHash signature of a text fed in successive chunks, such as PDF pages.
+
+    Shingles that cross chunk boundaries are hashed as if the chunks were joined, and only the last
+    few words are kept between chunks.
+    """
+
+    def __init__(self):
+        self.chars = 0
+        self.shingles = 0
+        self._minimums = np.full(PERMUTATIONS, _EMPTY, dtype=np.uint64)
+        self._tail = []
+        self._pending = ''
+
+    def feed(self, chunk: str) -> None:
+        """Add the words of ``chunk``, except a trailing word that may continue in the next chunk."""
+        self.chars += len(chunk)
+        text = self._pending + chunk.lower()
+        trailing = _TRAILING_WORD.search(text)
+        self._pending = trailing.group() if trailing is not None else ''
+        self._add_words(text[:trailing.start()] if trailing is not None else text)
+
+    def _add_words(self, text: str) -> None:
+        hashes = self._tail + [_token_hash(_NUMBER if token[0].isdigit() else token)
+                               for token in _TOKEN.findall(text)]
+        self._tail = hashes[-(SHINGLE_WORDS - 1):]
+        count = len(hashes) - SHINGLE_WORDS + 1
+        if count <= 0:
+            return
+        words = np.array(hashes, dtype=np.uint64)
+        shingles = words[:count].copy()
+        for offset in range(1, SHINGLE_WORDS):
+            shingles *= _SHINGLE_MULTIPLIER
+            shingles ^= words[offset:offset + count]
+        for start in range(0, count, _BLOCK):
+            block = shingles[start:start + _BLOCK, None] * _MULTIPLIERS + _INCREMENTS
+            np.minimum(self._minimums, block.min(axis=0), out=self._minimums)
+        self.shingles += count
+
+    def signature(self) -> np.ndarray:
+        """Return the signature of the text fed so far: ``PERMUTATIONS`` 16-bit values."""
+        if self._pending:
+            self._add_words(self._pending)
+            self._pending = ''
+        # The high bits of a multiply-add hash are the well-mixed ones
+        return (self._minimums >> np.uint64(48)).astype(np.uint16)
+
+def text_signature(text: str) -> np.ndarray:
+    """Return the MinHash signature of ``text``; see :class:`MinHashSketch`."""
+    sketch = MinHashSketch()
+    sketch.feed(text)
+    return sketch.signature()
+
+class NearDuplicate(NamedTuple):
+    """An indexed document similar to the one looked up."""
+    label: str
+    content_hash: str
+    similarity: float
+
+class NearDuplicateIndex:
+    """
+    A bounded MinHash/LSH index of classified documents.
+
+    Parameters:
+        capacity (int): Documents kept; once full, the oldest are overwritten.
+        threshold (float): Estimated similarity from which a lookup returns a document.
+        path (str, optional): .npz file to load the index from, if it exists.
+    """
+
+    def __init__(self, capacity: int = max(NEAR_DUPLICATE_INDEX_SIZE, 1), threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                 path: Optional[str] = None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.buckets = max(1, 2 * capacity // BUCKET_WAYS)
+        self._lock = threading.Lock()
+        self._reset(None)
+        if path and os.path.exists(path):
+            try:
+                self._load(path)
+            except Exception as e:
+                logging.error(f"Error loading the near-duplicate index from {path}: {e}")
+                self._reset(None)
+
+    def _reset(self, version: Optional[str]) -> None:
+        # np.zeros maps zeroed pages lazily, so memory is only used as the index fills up
+        self.version = version
+        self._signatures = np.zeros((self.capacity, PERMUTATIONS), dtype=np.uint16)
+        self._hashes = np.zeros((self.capacity, 32), dtype=np.uint8)
+        # Label numbers and bucket entries are offset by one, so that 0 is empty
+        self._labels = np.zeros(self.capacity, dtype=np.uint16)
+        self._tables = np.zeros((BANDS, self.buckets, BUCKET_WAYS), dtype=np.int32)
+        self._label_names = []
+        self._added = 0
+        # Documents that were in the file the index was loaded from, rather than added since
+        self._loaded = 0
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def use_version(self, version: str) -> None:
+        """Empty the index if its labels were given by another classifier version than ``version``."""
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self._reset(version)
+
+    def _bucket_numbers(self, signature: np.ndarray) -> np.ndarray:
+        # Each band is ROWS 16-bit values, i.e. two 64-bit words
+        bands = signature.view(np.uint64).reshape(BANDS, 2)
+        return (bands[:, 0] ^ bands[:, 1] * _BAND_MULTIPLIER) % np.uint64(self.buckets)
+
+    def lookup(self, signature: np.ndarray) -> Optional[NearDuplicate]:
+        """Return the most similar indexed document, if it is at least ``threshold`` similar."""
+        buckets = self._bucket_numbers(signature)
+        with self._lock:
+            # A document sharing several bands is a candidate several times, which is harmless
+            candidates = self._tables[_BAND_IDS, buckets].ravel()
+            candidates = candidates[candidates > 0] - 1
+            if len(candidates):
+                agreements = (self._signatures[candidates] == signature).sum(axis=1)
+                best = int(agreements.argmax())
+                similarity = agreements[best] / PERMUTATIONS
+                if similarity >= self.threshold:
+                    slot = candidates[best]
+                    self._counters['hits'] += 1
+                    return NearDuplicate(self._label_names[self._labels[slot] - 1],
+                                         self._hashes[slot].tobytes().hex(), float(similarity))
+            self._counters['misses'] += 1
+            return None
+
+    def add(self, signature: np.ndarray, label: str, content_hash: str) -> None:
+        """Index a classified document, overwriting the oldest one if the index is full."""
+        if self.capacity <= 0:
+            return
+        buckets = self._bucket_numbers(signature)
+        with self._lock:
+            if label not in self._label_names:
+                self._label_names.append(label)
+            slot = self._added % self.capacity
+            self._added += 1
+            self._signatures[slot] = signature
+            self._labels[slot] = self._label_names.index(label) + 1
+            self._hashes[slot] = np.frombuffer(bytes.fromhex(content_hash), dtype=np.uint8)
+            # The newest entry goes first in each bucket and the oldest drops out
+            entries = self._tables[_BAND_IDS, buckets]
+            entries[:, 1:] = entries[:, :-1]
+            entries[:, 0] = slot + 1
+            self._tables[_BAND_IDS, buckets] = entries
+
+    def clear(self) -> None:
+        """Drop every document and reset the counters."""
+        with self._lock:
+            self._reset(self.version)
+
+    def __len__(self) -> int:
+        return min(self._added, self.capacity)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters, the number of documents indexed and the number overwritten."""
+        with self._lock:
+            return dict(self._counters, size=len(self), evictions=max(0, self._added - self.capacity))
+
+    def save(self, path: str) -> None:
+        """Write the index to ``path`` (a .npz file), replacing it atomically."""
+        with self._lock:
+            meta = {
+                'capacity': self.capacity, 'permutations': PERMUTATIONS, 'bands': BANDS,
+                'shingle_words': SHINGLE_WORDS, 'seed': SEED, 'version': self.version,
+                'labels': self._label_names, 'added': self._added,
+            }
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), signatures=self._signatures,
+                         hashes=self._hashes, labels=self._labels, tables=self._tables)
+            os.replace(temporary, path)
+
+    def _load(self, path: str) -> None:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            layout = (meta['capacity'], meta['permutations'], meta['bands'], meta['shingle_words'], meta['seed'])
+            if layout != (self.capacity, PERMUTATIONS, BANDS, SHINGLE_WORDS, SEED):
+                raise ValueError(f"saved with another layout {layout}")
+            self._signatures = data['signatures']
+            self._hashes = data['hashes']
+            self._labels = data['labels']
+            self._tables = data['tables']
+        self.version = meta['version']
+        self._label_names = meta['labels']
+        self._added = self._loaded = meta['added']
+
+    def merge_into(self, path: str) -> None:
+        """
+        Add the documents indexed since the index was loaded to the index saved at ``path``.
+
+        Processes started from the same file can all merge into it: the file is locked, read, and
+        replaced with its documents plus the new ones, those of the current classifier version
+        replacing any of another.
+        """
+        with open(f'{path}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with self._lock:
+                added = min(self._added - self._loaded, self.capacity)
+                slots = [number % self.capacity for number in range(self._added - added, self._added)]
+                entries = [(self._signatures[slot].copy(), self._label_names[self._labels[slot] - 1],
+                            self._hashes[slot].tobytes().hex()) for slot in slots]
+                version = self.version
+            if not entries:
+                return
+            merged = NearDuplicateIndex(self.capacity, self.threshold, path)
+            merged.use_version(version)
+            for signature, label, content_hash in entries:
+                merged.add(signature, label, content_hash)
+            merged.save(path)
+            with self._lock:
+                if self.version == version:
+                    self._loaded = self._added
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Return the shared index, creating it on first use, or None if it is disabled."""
+    global _index
+    if NEAR_DUPLICATE_INDEX_SIZE <= 0:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NearDuplicateIndex(path=NEAR_DUPLICATE_INDEX_PATH)
+    return _index
+
+def save_near_duplicate_index() -> None:
+    """Merge the shared index into ``NEAR_DUPLICATE_INDEX_PATH``, if both exist."""
+    if _index is not None and NEAR_DUPLICATE_INDEX_PATH:
+        _index.merge_into(NEAR_DUPLICATE_INDEX_PATH)
@@ -0,0 +1,285 @@
+# src/pattern_engine.py
+
+"""
+Pattern Engine Module
+=====================
+
+This module compiles the document-type regular expressions used by the classifier into a single
+matcher that scans a document once, instead of running one ``re.findall`` per pattern.
+
+Every pattern is split into its literal prefix (the characters any match must start with) and the
+full expression. All prefixes are merged into one trie-shaped alternation, the *trigger*, which is
+the only expression scanned over the whole text. Only the patterns whose prefix occurs at a trigger
+position are then evaluated, anchored at that position. Scores are identical to counting
+``re.findall`` matches pattern by pattern, because each pattern keeps track of where its previous
+match ended and only counts non-overlapping matches, exactly like ``findall`` does.
+
+Patterns without a literal prefix (e.g. ones starting with a character class) cannot be triggered
+and fall back to a dedicated ``finditer`` scan.
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+_LITERAL = sre_parse.LITERAL
+_AT = sre_parse.AT
+
+# Longest match StreamingScorer expects; a match can be missed if it crosses a chunk boundary and is longer
+MAX_MATCH_CHARS = 256
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Return the literal text every match of ``pattern`` has to start with.
+
+    Leading zero-width assertions such as ``\\b`` are skipped. A character followed by a quantifier
+    is not part of the prefix, since the parser represents it as a repeat rather than a literal.
+
+    Parameters:
+        pattern (str): The regular expression.
+
+    Returns:
+        str: The required literal prefix, or an empty string if there is none.
+    """
+    prefix = []
+    for op, arg in sre_parse.parse(pattern):
+        if op is _LITERAL:
+            prefix.append(chr(arg))
+        elif op is _AT and not prefix:
+            continue
+        else:
+            break
+    return ''.join(prefix)
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """Build a regular expression matching any of ``words``, with common prefixes factored out."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node: dict) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            return '(?:' + body + ')?'
+        return body
+
+    return render(trie)
+
+
+class PatternEngine:
+    """
+    A compiled set of document-type patterns that scores a text in a single pass.
+
+    Parameters:
+        patterns (Mapping[str, Sequence[str]]): Regular expressions for each document type. They are
+            matched against lowercased text.
+        weights (Mapping[str, Sequence[float]], optional): Per-pattern weights, in the same shape as
+            ``patterns``. Every match counts 1 when omitted.
+    """
+
+    def __init__(self, patterns: Mapping[str, Sequence[str]],
+                 weights: Optional[Mapping[str, Sequence[float]]] = None):
+        self.doc_types: List[str] = list(patterns.keys())
+        self._compiled: List[re.Pattern] = []
+        self._owner: List[int] = []
+        self._weight: List[float] = []
+        self._fallback: List[int] = []
+        # First character of a prefix -> [(prefix, pattern ids)], longest prefixes first.
+        self._by_first_char: Dict[str, List[Tuple[str, List[int]]]] = {}
+
+        by_prefix: Dict[str, List[int]] = {}
+        for type_index, doc_type in enumerate(self.doc_types):
+            type_weights = (weights or {}).get(doc_type)
+            for position, pattern in enumerate(patterns[doc_type]):
+                pattern_id = len(self._compiled)
+                self._compiled.append(re.compile(pattern))
+                self._owner.append(type_index)
+                self._weight.append(float(type_weights[position]) if type_weights else 1)
+                prefix = literal_prefix(pattern)
+                if prefix:
+                    by_prefix.setdefault(prefix, []).append(pattern_id)
+                else:
+                    self._fallback.append(pattern_id)
+
+        for prefix in sorted(by_prefix, key=len, reverse=True):
+            self._by_first_char.setdefault(prefix[0], []).append((prefix, by_prefix[prefix]))
+
+        self._trigger: Optional[re.Pattern] = re.compile(_trie_regex(by_prefix)) if by_prefix else None
+        self.version: str = hashlib.sha256(
+            json.dumps([patterns, weights], sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        Score a text against every document type.
+
+        Parameters:
+            text (str): The text to score. It is lowercased before matching.
+
+        Returns:
+            Dict[str, float]: The weighted number of pattern matches per document type.
+        """
+        totals = [0.0] * len(self.doc_types)
+        text = text.lower()
+        self._scan(text, 0, len(text), totals, [0] * len(self._compiled))
+        return dict(zip(self.doc_types, totals))
+
+    def _scan(self, text: str, start: int, stop: int, totals: List[float], last_end: List[int]) -> None:
+        """
+        Add the weighted matches starting in ``text[start:stop]`` to ``totals``.
+
+        ``text`` is lowercased. Matches may extend past ``stop``. ``last_end`` holds, per pattern,
+        where its previous match ended in ``text``, and is updated, so that successive calls over
+        consecutive ranges count the same non-overlapping matches as a single call would.
+        """
+        compiled, owner, weight = self._compiled, self._owner, self._weight
+
+        if self._trigger is not None:
+            by_first_char = self._by_first_char
+            search = self._trigger.search
+            match = search(text, start)
+            while match is not None:
+                position = match.start()
+                if position >= stop:
+                    break
+                for prefix, pattern_ids in by_first_char[text[position]]:
+                    if not text.startswith(prefix, position):
+                        continue
+                    for pattern_id in pattern_ids:
+                        if position < last_end[pattern_id]:
+                            continue
+                        found = compiled[pattern_id].match(text, position)
+                        if found is not None:
+                            totals[owner[pattern_id]] += weight[pattern_id]
+                            last_end[pattern_id] = found.end()
+                # Prefixes may overlap, so resume right after the start of this hit.
+                match = search(text, position + 1)
+
+        for pattern_id in self._fallback:
+            search = compiled[pattern_id].search
+            found = search(text, max(start, last_end[pattern_id]))
+            while found is not None and found.start() < stop:
+                totals[owner[pattern_id]] += weight[pattern_id]
+                end = last_end[pattern_id] = found.end()
+                # Like finditer, step over empty matches
+                found = search(text, end if end > found.start() else end + 1)
+
+    @staticmethod
+    def decide(scores: Mapping[str, float]) -> str:
+        """
+        Pick a label from per-type scores.
+
+        Returns:
+            str: The single highest-scoring type, 'unknown' if nothing matched, or 'ambiguous' if
+            several types share the highest score.
+        """
+        max_score = max(scores.values(), default=0)
+        if max_score == 0:
+            return 'unknown'
+        top_classes = [doc_type for doc_type, score in scores.items() if score == max_score]
+        if len(top_classes) == 1:
+            return top_classes[0]
+        return 'ambiguous'
+
+    @staticmethod
+    def lead(scores: Mapping[str, float]) -> float:
+        """Return how far the highest score is ahead of the second highest."""
+        top = sorted(scores.values(), reverse=True)[:2]
+        if not top:
+            return 0
+        return top[0] - (top[1] if len(top) > 1 else 0)
+
+    def classify(self, text: str) -> str:
+        """Score ``text`` and return its label (see :meth:`decide`)."""
+        return self.decide(self.scores(text))
+
+class StreamingScorer:
+    """
+    Score a document fed in successive chunks, such as PDF pages or paragraphs, without holding its
+    full text or a lowercased copy of it, and report when one document type is far enough ahead
+    that reading further would not change the label.
+
+    Matches may cross chunk boundaries: the last ``window`` characters are held back until more
+    text arrives or :meth:`finish` is called. The scores are therefore those of the concatenated
+    chunks, as long as no match is longer than ``window`` characters; the patterns are keyword
+    phrases, far shorter than that.
+
+    Instances are callables suitable as the ``stop_when`` argument of the extractors, and picklable,
+    so they can be sent to extraction worker processes.
+
+    Parameters:
+        engine (PatternEngine): The engine used to score the text.
+        margin (float): The lead over the runner-up at which the label is considered settled; 0
+            never settles early.
+        window (int): Characters held back for matches that continue in the next chunk.
+        sketch (optional): Any object with a ``feed(chunk)`` method, also fed every chunk, such as
+            a ``MinHashSketch`` of the near-duplicate index.
+    """
+
+    def __init__(self, engine: PatternEngine, margin: float = 0, window: int = MAX_MATCH_CHARS,
+                 sketch=None):
+        self.engine = engine
+        self.margin = margin
+        self.window = window
+        self.sketch = sketch
+        self.chars = 0
+        self._totals = [0.0] * len(engine.doc_types)
+        self._last_end = [0] * len(engine)
+        self._buffer = ''
+        self._start = 0
+
+    def feed(self, chunk: str) -> None:
+        """Score the text of ``chunk`` except for the last ``window`` characters seen."""
+        self.chars += len(chunk)
+        if self.sketch is not None:
+            self.sketch.feed(chunk)
+        buffer = self._buffer + chunk.lower()
+        stop = len(buffer) - self.window
+        if stop > self._start:
+            self.engine._scan(buffer, self._start, stop, self._totals, self._last_end)
+            # Keep the character before the held-back text, which \b assertions look at
+            cut = stop - 1
+            buffer = buffer[cut:]
+            self._start = 1
+            self._last_end = [max(0, end - cut) for end in self._last_end]
+        self._buffer = buffer
+
+    def __call__(self, chunk: str) -> bool:
+        """Feed ``chunk``; returns whether the label is settled."""
+        self.feed(chunk)
+        return self.margin > 0 and self.engine.lead(self.scores()) >= self.margin
+
+    def scores(self) -> Dict[str, float]:
+        """The scores of the text fed so far, counting the held-back text as if it ended there."""
+        totals = list(self._totals)
+        self.engine._scan(self._buffer, self._start, len(self._buffer), totals, list(self._last_end))
+        return dict(zip(self.engine.doc_types, totals))
+
+    def finish(self) -> Dict[str, float]:
+        """Score the held-back text and return the final scores."""
+        self.engine._scan(self._buffer, self._start, len(self._buffer), self._totals, self._last_end)
+        self._buffer, self._start = '', 0
+        self._last_end = [0] * len(self._last_end)
+        return dict(zip(self.engine.doc_types, self._totals))
+
+    def label(self) -> str:
+        """Finish scoring and return the label (see :meth:`PatternEngine.decide`)."""
+        return self.engine.decide(self.finish())
@@ -0,0 +1,44 @@
+# src/pdf_text.py
+
+"""
+PDF Text Layer
+==============
+
+The pdfminer converter used by the first tier of PDF extraction. It lives in its own module so
+that pdfminer is only imported once a PDF is actually read; see ``extractors.iter_pdf_page_tiers``.
+"""
+
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LTChar, LTContainer, LTPage
+
+class RawTextConverter(TextConverter):
+    """
+    A text converter for use without layout analysis.
+
+    pdfminer's layout analysis groups characters into lines and boxes, which is most of its cost and
+    is not needed for keyword scoring. This converter writes characters in content stream order and
+    only inserts a newline when the baseline moves and a space when there is a horizontal gap, which
+    keeps words and lines apart.
+    """
+
+    def receive_layout(self, ltpage: LTPage) -> None:
+        chunks = []
+        previous = None
+        stack = [iter(ltpage)]
+        while stack:
+            for item in stack[-1]:
+                if isinstance(item, LTChar):
+                    if previous is not None:
+                        if abs(item.y0 - previous.y0) > previous.height / 2:
+                            chunks.append('\n')
+                        elif item.x0 - previous.x1 > previous.width / 4:
+                            chunks.append(' ')
+                    chunks.append(item.get_text())
+                    previous = item
+                elif isinstance(item, LTContainer):
+                    stack.append(iter(item))
+                    break
+            else:
+                stack.pop()
+        chunks.append('\f')
+        self.write_text(''.join(chunks))
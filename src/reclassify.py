@@ -0,0 +1,87 @@
+# src/reclassify.py
+
+"""
+Reclassify stored texts with the current classifier, without re-running extraction.
+
+Run this after changing the rule files (see rule_registry.py) to relabel everything in the text store:
+
+    python -m src.reclassify --store texts.sqlite --since 2026-10-17 --output labels.jsonl
+
+With ``--cache`` the new labels are also written to the persistent result cache, so re-uploads of
+the same documents are answered without any work.
+"""
+
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Tuple
+from .cache import ResultCache
+from .classifier import classifier_version, classify_text
+from .text_store import TEXT_VERSION, TextStore
+
+def _classify_row(row: Tuple[str, str, str, str]) -> Tuple[str, str, str, str]:
+    content_hash, kind, filename, text = row
+    return content_hash, kind, filename, classify_text(text)
+
+def reclassify(store: TextStore, since: float = 0.0, workers: int = None, output=None,
+               cache: ResultCache = None) -> Counter:
+    """
+    Run ``classify_text`` over every text in ``store`` extracted since ``since``.
+
+    Args:
+        store (TextStore): The store to read texts from.
+        since (float): Only texts extracted at or after this Unix timestamp are reclassified.
+        workers (int): Number of classifier processes. Defaults to the number of CPUs.
+        output (file, optional): Where to write one JSON line per document.
+        cache (ResultCache, optional): A result cache to refresh with the new labels.
+
+    Returns:
+        Counter: The number of documents per label.
+    """
+    labels = Counter()
+    version = classifier_version()
+    with Pool(processes=workers) as pool:
+        for content_hash, kind, filename, file_class in pool.imap(
+                _classify_row, store.iter_texts(since), chunksize=64):
+            labels[file_class] += 1
+            if output is not None:
+                output.write(json.dumps({
+                    "content_hash": content_hash, "filename": filename, "file_class": file_class,
+                }) + '\n')
+            if cache is not None:
+                cache.set(f'{version}:{kind}:{content_hash}', file_class)
+    return labels
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reclassify stored texts with the current rules.')
+    parser.add_argument('--store', required=True, help='text store database (TEXT_STORE_PATH)')
+    parser.add_argument('--since', help='only texts extracted on or after this ISO date/time')
+    parser.add_argument('--workers', type=int, default=None, help='classifier processes (default: all CPUs)')
+    parser.add_argument('--output', help='write JSON lines here instead of stdout')
+    parser.add_argument('--cache', help='result cache database (RESULT_CACHE_PATH) to refresh')
+    args = parser.parse_args(argv)
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else 0.0
+    store = TextStore(args.store, TEXT_VERSION)
+    cache = ResultCache(max_entries=0, path=args.cache) if args.cache else None
+    output = open(args.output, 'w') if args.output else sys.stdout
+
+    start = time.perf_counter()
+    try:
+        labels = reclassify(store, since=since, workers=args.workers, output=output, cache=cache)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    total = sum(labels.values())
+    print(f"Reclassified {total} documents in {elapsed:.1f}s with {classifier_version()}", file=sys.stderr)
+    for file_class, count in labels.most_common():
+        print(f"  {file_class}: {count}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+# src/rule_registry.py
+
+"""
+Rule Registry Module
+====================
+
+This module loads the document types and their weighted patterns from rule files, so new industries
+can be added without a code change, and keeps the compiled PatternEngine up to date when the files
+change.
+
+``RULES_PATH`` is a rule file or a directory of them (``*.json``, and ``*.yaml``/``*.yml`` when
+PyYAML is installed), read in name order. Every file has the same shape:
+
+    {
+      "document_types": {
+        "payslip": {
+          "patterns": [
+            "payslip",
+            {"pattern": "net\\s+pay", "weight": 2}
+          ]
+        }
+      }
+    }
+
+A pattern is a regular expression matched against lowercased text, or an object with its weight
+(1 by default). A document type defined in several files takes its patterns from the last one.
+
+The registry swaps in a newly compiled engine with a single assignment, so requests already
+classifying keep the engine they started with and none of them wait for a reload. Reloads happen
+on demand (:meth:`RuleRegistry.reload`, used by the admin endpoint) or when a file's modification
+time changes, which is checked at most every ``RULES_POLL_INTERVAL`` seconds and recompiled on a
+background thread.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from .pattern_engine import PatternEngine
+
+try:
+    import yaml
+except ImportError:  # YAML rule files are optional
+    yaml = None
+
+_RULES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'rules')
+# The document types shipped with the classifier
+BUILTIN_RULES_PATH = os.path.join(_RULES_DIR, 'document_types.json')
+
+# Rule file, or directory of rule files, defining the document types
+RULES_PATH = os.environ.get('RULES_PATH', _RULES_DIR)
+# Seconds between checks for changed rule files; 0 only reloads on request
+RULES_POLL_INTERVAL = float(os.environ.get('RULES_POLL_INTERVAL', 5))
+
+RULE_FILE_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+class RuleError(ValueError):
+    """Raised when a rule file cannot be read or contains an invalid rule."""
+
+def rule_files(path: str) -> List[str]:
+    """Return the rule files at ``path``: the file itself, or the rule files in the directory."""
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.endswith(RULE_FILE_EXTENSIONS) and not name.startswith('.')]
+
+def _signature(path: str) -> Tuple:
+    """Identify the current state of the rule files, to notice when any of them changed."""
+    signature = []
+    for filename in rule_files(path):
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            continue
+        signature.append((filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def load_rule_file(filename: str) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Read one rule file.
+
+    Parameters:
+        filename (str): Path of a JSON or YAML rule file.
+
+    Returns:
+        Dict[str, List[Tuple[str, float]]]: The ``(pattern, weight)`` pairs of every document type.
+
+    Raises:
+        RuleError: If the file cannot be parsed or a rule is invalid.
+    """
+    is_yaml = filename.endswith(('.yaml', '.yml'))
+    if is_yaml and yaml is None:
+        raise RuleError(f"{filename}: PyYAML is required for YAML rule files")
+    parse_errors = (OSError, ValueError) + ((yaml.YAMLError,) if yaml is not None else ())
+    try:
+        with open(filename, encoding='utf-8') as f:
+            document = yaml.safe_load(f) if is_yaml else json.load(f)
+    except parse_errors as e:
+        raise RuleError(f"{filename}: {e}") from e
+
+    doc_types = document.get('document_types') if isinstance(document, dict) else None
+    if not isinstance(doc_types, dict):
+        raise RuleError(f"{filename}: expected a 'document_types' mapping")
+
+    rules = {}
+    for doc_type, definition in doc_types.items():
+        patterns = definition.get('patterns') if isinstance(definition, dict) else None
+        if not patterns or not isinstance(patterns, list):
+            raise RuleError(f"{filename}: document type '{doc_type}' has no patterns")
+        rules[doc_type] = []
+        for rule in patterns:
+            if isinstance(rule, str):
+                rule = {'pattern': rule}
+            if not isinstance(rule, dict) or not isinstance(rule.get('pattern'), str):
+                raise RuleError(f"{filename}: invalid pattern {rule!r} for '{doc_type}'")
+            try:
+                weight = float(rule.get('weight', 1))
+            except (TypeError, ValueError):
+                raise RuleError(f"{filename}: invalid weight {rule.get('weight')!r} for '{doc_type}'")
+            rules[doc_type].append((rule['pattern'], weight))
+    return rules
+
+def load_rules(path: str) -> Tuple[Dict[str, List[str]], Dict[str, List[float]]]:
+    """
+    Read every rule file at ``path``.
+
+    Returns:
+        Tuple[Dict[str, List[str]], Dict[str, List[float]]]: The patterns and weights of every
+        document type, in the shape taken by PatternEngine.
+
+    Raises:
+        RuleError: If a file is invalid or no document types are defined.
+    """
+    rules = {}
+    for filename in rule_files(path):
+        rules.update(load_rule_file(filename))
+    if not rules:
+        raise RuleError(f"No document types defined in {path}")
+    patterns = {doc_type: [pattern for pattern, _ in pairs] for doc_type, pairs in rules.items()}
+    weights = {doc_type: [weight for _, weight in pairs] for doc_type, pairs in rules.items()}
+    return patterns, weights
+
+def compile_rules(path: str) -> PatternEngine:
+    """Load the rules at ``path`` and compile them, raising RuleError for invalid regexes."""
+    patterns, weights = load_rules(path)
+    try:
+        return PatternEngine(patterns, weights)
+    except Exception as e:  # re.error
+        raise RuleError(f"Invalid pattern in {path}: {e}") from e
+
+class RuleRegistry:
+    """
+    The current compiled rules, reloaded when the rule files change.
+
+    Parameters:
+        path (str): A rule file or a directory of rule files.
+        poll_interval (float): Seconds between checks for changed files; 0 disables the checks.
+
+    Raises:
+        RuleError: If the initial rules are invalid. Invalid rules found by a later reload are
+        logged and the previous engine is kept.
+    """
+
+    def __init__(self, path: str = RULES_PATH, poll_interval: float = RULES_POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.last_error: Optional[str] = None
+        self._reload_lock = threading.Lock()
+        self._signature = _signature(path)
+        self.engine: PatternEngine = compile_rules(path)
+        self.loaded_at: float = time.time()
+        self._next_check = time.monotonic() + poll_interval
+
+    def reload(self) -> bool:
+        """
+        Recompile the rules and swap them in if they changed.
+
+        Returns:
+            bool: Whether a new engine was swapped in.
+
+        Raises:
+            RuleError: If the rules are invalid; the current engine is kept.
+        """
+        with self._reload_lock:
+            signature = _signature(self.path)
+            try:
+                engine = compile_rules(self.path)
+            except RuleError as e:
+                # Remember the broken state so it is not retried until the files change again
+                self._signature = signature
+                self.last_error = str(e)
+                raise
+            self._signature = signature
+            self.last_error = None
+            if engine.version == self.engine.version:
+                return False
+            # Requests that already hold the previous engine finish with it
+            self.engine = engine
+            self.loaded_at = time.time()
+            logging.info(f"Loaded rules {engine.version}: {len(engine.doc_types)} document types, "
+                         f"{len(engine)} patterns")
+            return True
+
+    def _reload_in_background(self) -> None:
+        try:
+            self.reload()
+        except RuleError as e:
+            logging.error(f"Keeping rules {self.engine.version}, reload failed: {e}")
+
+    def current(self) -> PatternEngine:
+        """
+        Return the current engine, starting a background reload if the rule files changed since
+        the last check.
+        """
+        if self.poll_interval > 0 and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.poll_interval
+            if not self._reload_lock.locked() and _signature(self.path) != self._signature:
+                threading.Thread(target=self._reload_in_background, name='rules-reload', daemon=True).start()
+        return self.engine
+
+    def info(self) -> Dict:
+        """Describe the current rules, for the admin endpoint."""
+        engine = self.engine
+        return {
+            "version": engine.version,
+            "document_types": engine.doc_types,
+            "patterns": len(engine),
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+        }
+
+_registry: Optional[RuleRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_rule_registry() -> RuleRegistry:
+    """Return the process-wide rule registry, loading RULES_PATH on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = RuleRegistry()
+    return _registry
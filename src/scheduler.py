@@ -0,0 +1,301 @@
+# src/scheduler.py
+
+"""
+Scheduler Module
+================
+
+Requests do not all cost the same. Under bursty load, OCR requests (seconds each) occupy every
+server thread, and Word documents (milliseconds) queue behind them. And when the same document is
+uploaded several times at once, by client retries or a forwarded email, every copy is extracted
+from scratch, since the result cache only helps once the first one is done. This module schedules
+the classifications that missed the result cache (see ``classify_file``):
+
+- every extractor class has its own bounded pool of slots: ``ocr`` (images), ``pdf``, ``docx`` and
+  ``other`` (the remaining registered formats), sized with ``SCHEDULER_<CLASS>_CONCURRENCY``. A
+  burst of scans then waits for the OCR slots, and cheap documents go straight through theirs;
+- identical concurrent classifications are coalesced (single flight): the first one for a content
+  hash runs, and the others wait for it and share its result;
+- waiting classifications get slots by priority, then arrival order: ``interactive`` for
+  ``/classify_file``, ``batch`` for ``/classify_files`` items, and ``background`` for jobs, the bulk
+  CLI and direct calls. Admission is priority-aware too: when ``SCHEDULER_MAX_WAITING``
+  classifications are waiting for a pool, interactive ones are refused with :class:`SchedulerBusy`,
+  which the API answers with 503, and batch items already at half that. Background work is never
+  refused, as its callers are bounded already, but interactive and batch work gives up after
+  waiting ``SCHEDULER_QUEUE_TIMEOUT`` seconds. A classification that others of a higher priority
+  are waiting on is promoted to their priority.
+
+Time spent waiting for a slot is recorded in ``classifier_queue_seconds`` per pool and priority, as
+the ``queue`` stage in traces, and refusals and coalesced classifications are counted (see
+metrics.py). Slots are per process; with the extraction pool enabled they bound the extractions a
+server process submits to it.
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+from .metrics import COALESCED, QUEUE_SECONDS, SCHEDULER_REJECTIONS, stage
+
+_CPUS = os.cpu_count() or 1
+
+# Classifications running at once per extractor class; 0 leaves a class unbounded
+SCHEDULER_OCR_CONCURRENCY = int(os.environ.get('SCHEDULER_OCR_CONCURRENCY', _CPUS))
+SCHEDULER_PDF_CONCURRENCY = int(os.environ.get('SCHEDULER_PDF_CONCURRENCY', 2 * _CPUS))
+SCHEDULER_DOCX_CONCURRENCY = int(os.environ.get('SCHEDULER_DOCX_CONCURRENCY', 4 * _CPUS))
+SCHEDULER_OTHER_CONCURRENCY = int(os.environ.get('SCHEDULER_OTHER_CONCURRENCY', 4 * _CPUS))
+# Classifications waiting for a pool from which interactive ones are refused; batch items are
+# refused from half of it
+SCHEDULER_MAX_WAITING = int(os.environ.get('SCHEDULER_MAX_WAITING', 64))
+# Seconds interactive and batch classifications wait for a slot before giving up
+SCHEDULER_QUEUE_TIMEOUT = float(os.environ.get('SCHEDULER_QUEUE_TIMEOUT', 30))
+
+# Priorities, the lowest first
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = ('interactive', 'batch', 'background')
+# Share of SCHEDULER_MAX_WAITING a priority may find waiting and still be admitted; None always is
+ADMISSION_SHARES = (1.0, 0.5, None)
+
+# Extractor class of every extractor kind; kinds not listed are 'other'
+EXTRACTOR_CLASSES = {'image': 'ocr', 'pdf': 'pdf', 'docx': 'docx'}
+
+T = TypeVar('T')
+
+class SchedulerBusy(Exception):
+    """Raised when a classification is refused, or waited too long, for lack of free slots."""
+
+_priority: ContextVar[int] = ContextVar('scheduling_priority', default=BACKGROUND)
+
+@contextmanager
+def scheduling_priority(priority: int) -> Iterator[None]:
+    """Schedule the classifications made in the block with ``priority`` (INTERACTIVE, BATCH or BACKGROUND)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def extractor_class(kind: str) -> str:
+    """Return the pool, 'ocr', 'pdf', 'docx' or 'other', for an extractor kind."""
+    return EXTRACTOR_CLASSES.get(kind, 'other')
+
+class _Waiter:
+    __slots__ = ('entry', 'event', 'granted')
+
+    def __init__(self, priority: int, sequence: int):
+        # The heap entry; its priority is raised in place when the waiter is promoted
+        self.entry = [priority, sequence, self]
+        self.event = threading.Event()
+        self.granted = False
+
+class SlotPool:
+    """
+    A bounded number of slots, handed to waiters by priority, then arrival order.
+
+    Parameters:
+        name (str): The extractor class, for metrics.
+        limit (int): Slots; 0 makes the pool unbounded.
+        max_waiting (int): See ``SCHEDULER_MAX_WAITING``.
+    """
+
+    def __init__(self, name: str, limit: int, max_waiting: int = SCHEDULER_MAX_WAITING):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _admitted(self, priority: int) -> bool:
+        share = ADMISSION_SHARES[priority]
+        return share is None or len(self._waiters) < self.max_waiting * share
+
+    def acquire(self, priority: int, timeout: Optional[float] = None,
+                on_wait: Optional[Callable[[_Waiter], None]] = None) -> None:
+        """
+        Take a slot, waiting for one if all are in use.
+
+        Parameters:
+            priority (int): INTERACTIVE, BATCH or BACKGROUND.
+            timeout (float, optional): Seconds to wait at most; None waits as long as it takes.
+            on_wait (Callable, optional): Called with the waiter before waiting, so it can be promoted.
+
+        Raises:
+            SchedulerBusy: If too many classifications are waiting already, or the timeout expires.
+        """
+        with self._lock:
+            if not self.limit or (self.active < self.limit and not self._waiters):
+                self.active += 1
+                return
+            if not self._admitted(priority):
+                SCHEDULER_REJECTIONS.inc(self.name, PRIORITY_NAMES[priority])
+                raise SchedulerBusy(f"{self.waiting} classifications are waiting for {self.name} slots")
+            waiter = _Waiter(priority, next(self._sequence))
+            heapq.heappush(self._waiters, waiter.entry)
+        if on_wait is not None:
+            on_wait(waiter)
+        if waiter.event.wait(timeout):
+            return
+        with self._lock:
+            if waiter.granted:
+                # Handed a slot just as the timeout expired
+                return
+            self._waiters.remove(waiter.entry)
+            heapq.heapify(self._waiters)
+        SCHEDULER_REJECTIONS.inc(self.name, PRIORITY_NAMES[priority])
+        raise SchedulerBusy(f"no {self.name} slot within {timeout}s")
+
+    def promote(self, waiter: _Waiter, priority: int) -> None:
+        """Raise a waiter to ``priority``, if it is still waiting at a lower one."""
+        with self._lock:
+            if not waiter.granted and priority < waiter.entry[0] and waiter.entry in self._waiters:
+                waiter.entry[0] = priority
+                heapq.heapify(self._waiters)
+
+    def release(self) -> None:
+        """Give the slot back, to the first waiter if there is one."""
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            waiter = heapq.heappop(self._waiters)[2]
+            waiter.granted = True
+        waiter.event.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {'active': self.active, 'waiting': self.waiting, 'limit': self.limit}
+
+class _Flight:
+    """A classification in progress, shared by the identical ones that arrive meanwhile."""
+    __slots__ = ('done', 'result', 'error', 'pool', 'waiter', 'priority')
+
+    def __init__(self, pool: SlotPool, priority: int):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.pool = pool
+        self.waiter: Optional[_Waiter] = None
+        self.priority = priority
+
+class Scheduler:
+    """
+    Runs classifications in the pool of their extractor class, one at a time per key.
+
+    Parameters:
+        limits (Dict[str, int]): Slots per extractor class; classes not listed are unbounded.
+        max_waiting (int): See ``SCHEDULER_MAX_WAITING``.
+        queue_timeout (float): See ``SCHEDULER_QUEUE_TIMEOUT``.
+    """
+
+    def __init__(self, limits: Dict[str, int], max_waiting: int = SCHEDULER_MAX_WAITING,
+                 queue_timeout: float = SCHEDULER_QUEUE_TIMEOUT):
+        self.pools = {name: SlotPool(name, limit, max_waiting) for name, limit in limits.items()}
+        self.queue_timeout = queue_timeout
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, kind: str) -> SlotPool:
+        name = extractor_class(kind)
+        pool = self.pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self.pools.setdefault(name, SlotPool(name, 0))
+        return pool
+
+    def run(self, key: str, kind: str, func: Callable[[], T]) -> T:
+        """
+        Return ``func()``, run in a slot of the pool for ``kind``, or the result of the call with
+        the same ``key`` already in progress.
+
+        Parameters:
+            key (str): Identifies the result, such as the result cache key of the upload.
+            kind (str): The extractor kind of the upload.
+            func (Callable): Computes the result.
+
+        Raises:
+            SchedulerBusy: If no slot could be had; followers of the refused call get it as well.
+        """
+        priority = _priority.get()
+        pool = self._pool(kind)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(pool, priority)
+            elif priority < flight.priority:
+                flight.priority = priority
+                if flight.waiter is not None:
+                    pool.promote(flight.waiter, priority)
+        if not leader:
+            COALESCED.inc(pool.name)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            self._acquire(flight, kind, priority)
+            try:
+                flight.result = func()
+            finally:
+                pool.release()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _acquire(self, flight: _Flight, kind: str, priority: int) -> None:
+        def on_wait(waiter: _Waiter) -> None:
+            with self._lock:
+                flight.waiter = waiter
+                # Followers of a higher priority may have joined before the waiter existed
+                if flight.priority < priority:
+                    flight.pool.promote(waiter, flight.priority)
+
+        timeout = None if priority == BACKGROUND else self.queue_timeout
+        start = time.perf_counter()
+        with stage('queue', kind):
+            flight.pool.acquire(priority, timeout, on_wait)
+        QUEUE_SECONDS.observe(time.perf_counter() - start, flight.pool.name, PRIORITY_NAMES[priority])
+
+    @property
+    def inflight(self) -> int:
+        """Distinct classifications running or waiting for a slot."""
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return the active, waiting and maximum classifications of every pool."""
+        with self._lock:
+            pools = list(self.pools.values())
+        return {pool.name: pool.stats() for pool in pools}
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> Scheduler:
+    """Return the shared scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler({
+                    'ocr': SCHEDULER_OCR_CONCURRENCY,
+                    'pdf': SCHEDULER_PDF_CONCURRENCY,
+                    'docx': SCHEDULER_DOCX_CONCURRENCY,
+                    'other': SCHEDULER_OTHER_CONCURRENCY,
+                })
+    return _scheduler
@@ -0,0 +1,132 @@
+# src/server.py
+
+"""
+Production Server
+=================
+
+Serves the app with gunicorn's preforking server:
+
+    python -m src.server [--bind 0.0.0.0:8000] [--workers 4] [--threads 4]
+
+The master process imports the app and runs ``lifecycle.warm_up`` once (parsing libraries, rules,
+ML model, stopwords, Tesseract check), then forks the workers. They share everything loaded so far
+copy-on-write and are ready as soon as they start; ``gc.freeze`` keeps the garbage collector from
+touching, and so copying, those shared objects.
+
+Workers share their metrics through a directory (``METRICS_DIR``, or a temporary one), so that
+``/metrics`` reports the whole server whichever worker serves the scrape (see metrics.py).
+
+Jobs are run by the worker that accepted them, but their states are shared through a SQLite job
+store (see jobs.py), so they can be polled from any worker. With more than one worker and no
+``JOB_STORE_PATH``, the master opens one in a temporary directory before forking.
+
+On SIGTERM a worker reports not ready, finishes its in-flight requests within ``--graceful-timeout``
+seconds, then drains the job queue, shuts the extraction pool down, merges the documents it added to
+the near-duplicate index into ``NEAR_DUPLICATE_INDEX_PATH`` and retires its metrics before exiting.
+"""
+
+import gc
+import os
+import time
+import signal
+import logging
+import argparse
+import tempfile
+from gunicorn.app.base import BaseApplication
+from .lifecycle import start_draining, warm_up
+from .metrics import METRICS_DIR, REGISTRY
+
+SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+# Worker processes; each serves SERVER_THREADS requests at once
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+# Seconds a request may take before its worker is restarted
+SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 120))
+# Seconds a stopping worker is given to finish its requests and jobs
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+
+def post_worker_init(worker) -> None:
+    """Start sharing metrics, and flip readiness as soon as the worker is asked to stop, before it stops accepting."""
+    REGISTRY.start_sharing()
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def drain_then_stop(signum, frame):
+        start_draining()
+        stop(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain_then_stop)
+
+def worker_exit(server, worker) -> None:
+    """Finish queued jobs and running extractions once the worker's requests are done, then persist and retire its metrics."""
+    from .app import job_queue
+    from .extraction_pool import shutdown_extraction_pool
+    from .near_duplicates import save_near_duplicate_index
+    start_draining()
+    if not job_queue.drain(worker.cfg.graceful_timeout):
+        logging.error(f"Worker {worker.pid} exiting with unfinished jobs")
+    shutdown_extraction_pool(wait=True)
+    try:
+        save_near_duplicate_index()
+    except Exception as e:
+        logging.error(f"Error saving the near-duplicate index: {e}")
+    REGISTRY.retire()
+
+class ClassifierServer(BaseApplication):
+    """
+    A gunicorn application serving ``src.app`` from a warmed-up master.
+
+    Parameters:
+        options (dict): gunicorn settings, e.g. ``bind``, ``workers`` and ``threads``.
+    """
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        settings = {
+            'worker_class': 'gthread',
+            'preload_app': True,
+            'post_worker_init': post_worker_init,
+            'worker_exit': worker_exit,
+        }
+        settings.update(self.options)
+        for name, value in settings.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        start = time.perf_counter()
+        from .app import app, job_queue
+        from .jobs import JobStore
+        if self.cfg.workers > 1 and job_queue.store is None:
+            # Every worker must see the jobs the others accepted
+            job_queue.store = JobStore(os.path.join(tempfile.mkdtemp(prefix='classifier-'), 'jobs.sqlite'))
+        report = warm_up()
+        if self.cfg.workers > 1:
+            # After warm-up, whose metrics the workers would otherwise each report again
+            REGISTRY.share(METRICS_DIR or tempfile.mkdtemp(prefix='classifier-metrics-'))
+        gc.freeze()
+        logging.info(f"Warmed up in {time.perf_counter() - start:.2f}s: "
+                     + ', '.join(f"{name} {step['status']}" for name, step in report.items()))
+        return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the classifier with preforked workers.')
+    parser.add_argument('--bind', default=SERVER_BIND)
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS)
+    parser.add_argument('--timeout', type=int, default=SERVER_TIMEOUT)
+    parser.add_argument('--graceful-timeout', type=int, default=SERVER_GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    ClassifierServer({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+    }).run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+# src/synthetic.py
+
+"""
+Generate a synthetic corpus of labelled documents for load tests, benchmarks and training.
+
+    python -m src.synthetic corpus/ --per-type 1000 [--formats pdf,docx,image,card] [--pages 1-4]
+        [--noise 0.02] [--rotation 4] [--misleading-names 0.3] [--seed 0] [--workers 8]
+
+Every document type the classifier knows about (the rule registry's types) gets ``--per-type``
+documents, written to ``corpus/<type>/`` as train.py expects. Documents are text-layer PDFs,
+DOCX files or rendered page images (JPEG/PNG), made of a title, labelled fields and filler
+paragraphs with character-level typos (``--noise``). Images are also rotated by up to
+``--rotation`` degrees, blurred and speckled, like phone photos of a page. The ``card`` format,
+not generated by default, renders driver's licenses and passports as ID cards in one of a few
+designs per type (``CARD_DESIGNS``), for the image template fast path (see image_templates.py);
+other types fall back to page images.
+
+A fraction of the files get misleading names (``--misleading-names``): another type's name, or a
+generic one such as ``scan_0042.pdf``.
+
+Output is deterministic: each document is generated from its own random stream seeded by
+``(seed, type, index)``, so the corpus is byte-for-byte identical across runs and worker counts.
+``manifest.jsonl`` lists every document with its label, in a format benchmarks/load_test.py can
+replay directly.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import logging
+import zipfile
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from .rule_registry import get_rule_registry, load_rules
+
+FORMATS = ('pdf', 'docx', 'image', 'card')
+DEFAULT_FORMATS = ('pdf', 'docx', 'image')
+
+# ID card designs: the issuer and title on a coloured header, the photo on one side, the fields on the other
+CARD_SIZE = (856, 540)
+CARD_DESIGNS = {
+    'drivers_license': [
+        {'name': 'any-state', 'issuer': 'ANY STATE', 'title': 'DRIVER LICENSE', 'background': (200, 225, 245),
+         'header': (25, 45, 130), 'photo': 'right'},
+        {'name': 'golden-state', 'issuer': 'GOLDEN STATE', 'title': 'DRIVER LICENSE', 'background': (245, 232, 190),
+         'header': (150, 95, 25), 'photo': 'left'},
+        {'name': 'uk-licence', 'issuer': 'UK', 'title': 'DRIVING LICENCE', 'background': (242, 205, 225),
+         'header': (242, 205, 225), 'photo': 'left'},
+    ],
+    'passport': [
+        {'name': 'passport-card', 'issuer': 'UNITED STATES OF AMERICA', 'title': 'PASSPORT CARD',
+         'background': (225, 238, 228), 'header': (30, 85, 65), 'photo': 'left'},
+        {'name': 'passport-page', 'issuer': 'REPUBLIC OF IRELAND', 'title': 'PASSPORT',
+         'background': (235, 225, 245), 'header': (70, 40, 110), 'photo': 'right'},
+    ],
+}
+
+_EPOCH = datetime(2000, 1, 1)
+
+FIRST_NAMES = 'james mary john patricia robert jennifer michael linda david elizabeth maria wei aisha carlos'.split()
+LAST_NAMES = 'smith johnson williams brown jones garcia miller davis martinez chen okafor novak'.split()
+STREETS = 'main oak pine maple cedar elm lake hill park washington'.split()
+CITIES = 'springfield riverside franklin greenville bristol clinton fairview salem madison georgetown'.split()
+COMPANIES = 'acme globex initech umbrella stark wayne hooli vandelay soylent cyberdyne'.split()
+FILLER = ('the this that with for from on at by as of to and or in is are was be will has have page '
+          'please note all any each date time number total reference record details information '
+          'section above below following provided required according current period office '
+          'customer client service account address name signature copy original form').split()
+
+def _name(rng: random.Random) -> str:
+    return f'{rng.choice(FIRST_NAMES).title()} {rng.choice(LAST_NAMES).title()}'
+
+def _address(rng: random.Random) -> str:
+    return f'{rng.randint(1, 9999)} {rng.choice(STREETS).title()} St, {rng.choice(CITIES).title()}'
+
+def _date(rng: random.Random) -> str:
+    return (date(2015, 1, 1) + timedelta(days=rng.randint(0, 4000))).strftime('%m/%d/%Y')
+
+def _money(rng: random.Random) -> str:
+    return f'${rng.randint(10, 99999):,}.{rng.randint(0, 99):02d}'
+
+def _digits(rng: random.Random, count: int) -> str:
+    return ''.join(rng.choice('0123456789') for _ in range(count))
+
+def _template(doc_type: str, rng: random.Random) -> Tuple[str, List[str]]:
+    """Return the title and the body lines of a document of a built-in type."""
+    name = _name(rng)
+    if doc_type == 'drivers_license':
+        return rng.choice(["Driver's License", 'Driver License']), [
+            f'DL Number: {rng.choice("ABCDEFGH")}{_digits(rng, 7)}', f'Name: {name}', f'Address: {_address(rng)}',
+            f'DOB: {_date(rng)}', f'Expires: {_date(rng)}', f'Class: {rng.choice("ABCDM")}',
+            f'Driver ID {_digits(rng, 9)}', f'Sex: {rng.choice("MF")}  Height: {rng.randint(150, 200)} cm']
+    if doc_type == 'passport':
+        return 'Passport', [
+            f'Passport Number: {_digits(rng, 9)}', f'Surname: {name.split()[1]}', f'Given names: {name.split()[0]}',
+            f'Nationality: {rng.choice(["United States of America", "Canada", "Ireland"])}',
+            f'Date of birth: {_date(rng)}', f'Date of issue: {_date(rng)}',
+            'Issued by: United States Department of State']
+    if doc_type == 'bank_statement':
+        lines = [f'{rng.choice(COMPANIES).title()} Bank', f'Account holder: {name}',
+                 f'Account Summary for account ****{_digits(rng, 4)}', f'Opening balance: {_money(rng)}',
+                 f'Available Balance: {_money(rng)}', 'Transaction History']
+        lines += [f'{_date(rng)}  {rng.choice(COMPANIES).title()} {rng.choice(["purchase", "transfer", "deposit"])}'
+                  f'  {_money(rng)}' for _ in range(rng.randint(5, 15))]
+        return 'Bank Statement', lines
+    if doc_type == 'invoice':
+        lines = [f'Invoice Number: INV-{_digits(rng, 6)}', f'Date: {_date(rng)}',
+                 f'Bill To: {name}, {_address(rng)}', f'From: {rng.choice(COMPANIES).title()} Ltd']
+        lines += [f'{rng.choice(["Consulting", "Widgets", "Support", "Licence", "Shipping"])} x{rng.randint(1, 20)}'
+                  f'  {_money(rng)}' for _ in range(rng.randint(2, 8))]
+        return 'Invoice', lines + [f'Amount Due: {_money(rng)}', f'Payment due by {_date(rng)}']
+    if doc_type == 'tax_report':
+        return rng.choice(['Tax Return', 'Tax Report']), [
+            'Form 1040 U.S. Individual Income Tax Return', 'Department of the Treasury - Internal Revenue Service',
+            f'Taxpayer: {name}', f'SSN: ***-**-{_digits(rng, 4)}', f'Wages, salaries, tips: {_money(rng)}',
+            f'Taxable income: {_money(rng)}', f'Total tax: {_money(rng)}', f'Refund: {_money(rng)}']
+    if doc_type == 'resume':
+        return rng.choice(['Resume', 'Curriculum Vitae']), [
+            name, _address(rng), 'Experience',
+            f'{rng.choice(COMPANIES).title()} Inc - Software Engineer, {rng.randint(2005, 2020)}-{rng.randint(2021, 2025)}',
+            'Education', f'B.Sc. Computer Science, {rng.choice(CITIES).title()} University',
+            'Skills', ', '.join(rng.sample(['Python', 'SQL', 'Excel', 'Leadership', 'Java', 'Accounting'], 3))]
+    if doc_type == 'contract':
+        party = rng.choice(COMPANIES).title()
+        return rng.choice(['Service Agreement', 'Employment Contract']), [
+            f'This Agreement is made on {_date(rng)} between {party} Ltd and {name}.',
+            f'Each party hereby agrees to the terms and conditions set out below.',
+            f'1. Term. This contract starts on {_date(rng)}.', f'2. Fees. The client pays {_money(rng)} per month.',
+            '3. Termination. Either party may terminate with 30 days notice.', 'Signed: ____________']
+    if doc_type == 'medical_report':
+        return 'Medical Report', [
+            f'Patient: {name}', f'Date of birth: {_date(rng)}', f'Date of visit: {_date(rng)}',
+            f'Diagnosis: {rng.choice(["Hypertension", "Type 2 diabetes", "Fractured wrist", "Migraine"])}',
+            f'Treatment: {rng.choice(["Rest and fluids", "Physiotherapy", "Medication as prescribed"])}',
+            f'Attending physician: Dr. {_name(rng)}']
+    return '', []
+
+def _keywords(patterns: List[str]) -> List[str]:
+    """Turn regular expressions into plain phrases that match them, for types without a template."""
+    phrases = []
+    for pattern in patterns:
+        phrase = re.sub(r'\\s[+*]?|\.\*|\.\+', ' ', pattern)  # whitespace and wildcards
+        phrase = re.sub(r'\\b|\?|[\^$()\[\]|+*]', '', phrase)  # anchors, optional parts, groups
+        phrase = phrase.replace('\\', '')  # escaped literals
+        if phrase.strip():
+            phrases.append(' '.join(phrase.split()))
+    return phrases
+
+def _filler(rng: random.Random, words: int) -> str:
+    sentence = ' '.join(rng.choice(FILLER) for _ in range(words))
+    return sentence[0].upper() + sentence[1:] + '.'
+
+def _add_typos(text: str, rng: random.Random, rate: float) -> str:
+    if rate <= 0:
+        return text
+    chars = list(text)
+    for index in range(len(chars)):
+        if chars[index].isalpha() and rng.random() < rate:
+            chars[index] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return ''.join(chars)
+
+def document_text(doc_type: str, patterns: List[str], rng: random.Random, pages: int,
+                  noise: float) -> List[List[str]]:
+    """
+    Compose the text of a document.
+
+    Returns:
+        List[List[str]]: The lines of each page. The title and fields are on the first page; every
+        page gets filler paragraphs.
+    """
+    title, fields = _template(doc_type, rng)
+    if not title:
+        keywords = _keywords(patterns)
+        title = keywords[0].title() if keywords else doc_type.replace('_', ' ').title()
+        fields = [f'{keyword.title()}: {_digits(rng, rng.randint(4, 10))}' for keyword in keywords[1:]]
+    result = []
+    for page in range(pages):
+        lines = [title.upper(), ''] + fields if page == 0 else [f'{title} - page {page + 1}', '']
+        for _ in range(rng.randint(2, 6)):
+            lines.append(_add_typos(_filler(rng, rng.randint(8, 30)), rng, noise))
+        result.append(lines)
+    return result
+
+def _wrap(lines: List[str], width: int) -> List[str]:
+    wrapped = []
+    for line in lines:
+        while len(line) > width:
+            cut = line.rfind(' ', 0, width)
+            cut = cut if cut > 0 else width
+            wrapped.append(line[:cut])
+            line = line[cut:].lstrip()
+        wrapped.append(line)
+    return wrapped
+
+def text_pdf(pages: List[List[str]], font_size: int = 11, leading: int = 14) -> bytes:
+    """Write a minimal PDF with a Helvetica text layer, one list of lines per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        escaped = (line.encode('latin-1', 'replace').replace(b'\\', b'\\\\').replace(b'(', b'\\(')
+                   .replace(b')', b'\\)') for line in lines)
+        content = (b"BT /F1 %d Tf 36 760 Td %d TL " % (font_size, leading)
+                   + b"".join(b"(" + line + b") '" for line in escaped) + b" ET")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids)
+                  + b"] /Count %d >>" % len(page_ids))
+
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def docx_bytes(pages: List[List[str]]) -> bytes:
+    import docx
+    document = docx.Document()
+    # python-docx stamps the current time into the core properties and the zip entries
+    document.core_properties.created = document.core_properties.modified = _EPOCH
+    for page_index, lines in enumerate(pages):
+        if page_index:
+            document.add_page_break()
+        document.add_heading(lines[0], level=1)
+        for line in lines[1:]:
+            if line:
+                document.add_paragraph(line)
+    buffer = BytesIO()
+    document.save(buffer)
+    return _reproducible_zip(buffer.getvalue())
+
+def _reproducible_zip(data: bytes) -> bytes:
+    """Rewrite a zip container with fixed entry timestamps."""
+    output = BytesIO()
+    with zipfile.ZipFile(BytesIO(data)) as source, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            target.writestr(zipfile.ZipInfo(info.filename, date_time=_EPOCH.timetuple()[:6]),
+                            source.read(info.filename), compress_type=zipfile.ZIP_DEFLATED)
+    return output.getvalue()
+
+@lru_cache(maxsize=8)
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single bitmap size
+        return ImageFont.load_default()
+
+def _photograph(image: Image.Image, rng: random.Random, rotation: float, noise: float) -> Image.Image:
+    """Rotate, blur and speckle an image like a photo."""
+    def grey(value):
+        return value if image.mode == 'L' else (value,) * 3
+
+    if rotation:
+        image = image.rotate(rng.uniform(-rotation, rotation), resample=Image.Resampling.BICUBIC,
+                             expand=True, fillcolor=grey(rng.randint(200, 255)))
+    if noise > 0:
+        image = image.filter(ImageFilter.GaussianBlur(radius=rng.uniform(0, 1.2)))
+        pixels = image.load()
+        for _ in range(int(image.width * image.height * noise * 0.05)):
+            pixels[rng.randrange(image.width), rng.randrange(image.height)] = grey(rng.choice((0, 255)))
+    return image
+
+def page_image(lines: List[str], rng: random.Random, rotation: float, noise: float,
+               size: Tuple[int, int] = (1275, 1650)) -> Image.Image:
+    """Render a page at 150 DPI (US letter), then rotate, blur and speckle it like a photo."""
+    image = Image.new('L', size, 255)
+    draw = ImageDraw.Draw(image)
+    font = _font(26)
+    y = 90
+    for line in _wrap(lines, 80):
+        draw.text((90, y), line, fill=rng.randint(0, 60), font=font)
+        y += 34
+        if y > size[1] - 90:
+            break
+    return _photograph(image, rng, rotation, noise)
+
+def card_image(doc_type: str, design: dict, rng: random.Random, rotation: float, noise: float) -> Image.Image:
+    """Render an ID card of ``design`` (see ``CARD_DESIGNS``) with random fields, then photograph it."""
+    width, height = CARD_SIZE
+    image = Image.new('RGB', CARD_SIZE, design['background'])
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 100), fill=design['header'])
+    on_header = (255, 255, 255) if sum(design['header']) < 450 else (20, 20, 20)
+    draw.text((36, 22), design['issuer'], fill=on_header, font=_font(52))
+    draw.text((36, 112), design['title'], fill=design['header'] if sum(design['header']) < 450 else (20, 20, 20),
+              font=_font(34))
+
+    photo_left = 36 if design['photo'] == 'left' else width - 256
+    draw.rectangle((photo_left, 170, photo_left + 220, 480), fill=(rng.randint(150, 200),) * 3)
+    skin = rng.choice(((241, 194, 167), (198, 134, 99), (141, 85, 54), (255, 224, 196)))
+    draw.ellipse((photo_left + 60, 215, photo_left + 160, 335), fill=skin)
+    draw.rectangle((photo_left + 35, 345, photo_left + 185, 480), fill=(rng.randint(20, 120),) * 3)
+
+    _, fields = _template(doc_type, rng)
+    x = photo_left + 256 if design['photo'] == 'left' else 36
+    font = _font(24)
+    for row, field in enumerate(fields[:9]):
+        draw.text((x, 172 + row * 34), field[:38], fill=(20, 20, 20), font=font)
+    return _photograph(image, rng, rotation, noise)
+
+def image_bytes(pages: List[List[str]], rng: random.Random, rotation: float, noise: float,
+                image: Optional[Image.Image] = None) -> Tuple[bytes, str]:
+    """Render the first page, or save ``image``, as a JPEG (like a photo) or a PNG (like a screenshot)."""
+    if image is None:
+        image = page_image(pages[0], rng, rotation, noise)
+    buffer = BytesIO()
+    if rng.random() < 0.7:
+        image.convert('RGB').save(buffer, 'JPEG', quality=rng.randint(60, 92))
+        return buffer.getvalue(), 'jpg'
+    image.save(buffer, 'PNG')
+    return buffer.getvalue(), 'png'
+
+def _filename(doc_type: str, index: int, extension: str, doc_types: List[str], rng: random.Random,
+              misleading: float) -> str:
+    if rng.random() >= misleading:
+        return f'{doc_type}_{index:06d}.{extension}'
+    others = [other for other in doc_types if other != doc_type]
+    if others and rng.random() < 0.5:
+        return f'{rng.choice(others)}_{index:06d}.{extension}'
+    return f'{rng.choice(["scan", "document", "IMG", "file", "untitled"])}_{index:06d}.{extension}'
+
+def generate_document(task: Tuple) -> Dict:
+    """
+    Generate and write one document. Runs in a worker process.
+
+    Parameters:
+        task (Tuple): ``(output_dir, doc_type, patterns, index, seed, doc_types, options)``.
+
+    Returns:
+        Dict: The manifest entry of the document.
+    """
+    output_dir, doc_type, patterns, index, seed, doc_types, options = task
+    rng = random.Random(f'{seed}:{doc_type}:{index}')
+    file_format = rng.choice(options['formats'])
+    pages = rng.randint(*options['pages'])
+    text = document_text(doc_type, patterns, rng, pages, options['noise'])
+
+    if file_format == 'pdf':
+        data, extension = text_pdf([_wrap(lines, 95) for lines in text]), 'pdf'
+    elif file_format == 'docx':
+        data, extension = docx_bytes(text), 'docx'
+    elif file_format == 'card' and doc_type in CARD_DESIGNS:
+        card = card_image(doc_type, rng.choice(CARD_DESIGNS[doc_type]), rng, options['rotation'], options['noise'])
+        data, extension = image_bytes(text, rng, options['rotation'], options['noise'], card)
+        pages = 1
+    else:
+        data, extension = image_bytes(text, rng, options['rotation'], options['noise'])
+        pages = 1
+
+    filename = _filename(doc_type, index, extension, doc_types, rng, options['misleading_names'])
+    path = os.path.join(output_dir, doc_type, filename)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return {'file': path, 'label': doc_type, 'format': file_format, 'pages': pages, 'bytes': len(data)}
+
+def iter_tasks(output_dir: str, patterns: Dict[str, List[str]], per_type: int, seed: int,
+               options: Dict) -> Iterator[Tuple]:
+    doc_types = list(patterns)
+    for index in range(per_type):
+        for doc_type in doc_types:
+            yield output_dir, doc_type, patterns[doc_type], index, seed, doc_types, options
+
+def generate(output_dir: str, patterns: Dict[str, List[str]], per_type: int, seed: int = 0,
+             workers: Optional[int] = None, formats=DEFAULT_FORMATS, pages=(1, 3), noise: float = 0.02,
+             rotation: float = 4, misleading_names: float = 0.3) -> int:
+    """
+    Generate ``per_type`` documents of every type in ``patterns`` under ``output_dir``.
+
+    Returns:
+        int: The number of documents written.
+    """
+    options = {'formats': tuple(formats), 'pages': tuple(pages), 'noise': noise, 'rotation': rotation,
+               'misleading_names': misleading_names}
+    for doc_type in patterns:
+        os.makedirs(os.path.join(output_dir, doc_type), exist_ok=True)
+
+    tasks = iter_tasks(output_dir, patterns, per_type, seed, options)
+    total = per_type * len(patterns)
+    written = 0
+    start = time.perf_counter()
+    with open(os.path.join(output_dir, 'manifest.jsonl'), 'w') as manifest:
+        def write(entry):
+            nonlocal written
+            manifest.write(json.dumps(entry) + '\n')
+            written += 1
+            if written % 1000 == 0:
+                logging.info(f"{written} of {total} documents, {written / (time.perf_counter() - start):.0f}/s")
+
+        if workers is not None and workers <= 1:
+            for task in tasks:
+                write(generate_document(task))
+        else:
+            with Pool(processes=workers) as pool:
+                # imap keeps the manifest in task order, so it is deterministic too
+                for entry in pool.imap(generate_document, tasks, chunksize=16):
+                    write(entry)
+    return written
+
+def _page_range(value: str) -> Tuple[int, int]:
+    low, _, high = value.partition('-')
+    return int(low), int(high or low)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic corpus of labelled documents.')
+    parser.add_argument('output', help='directory to write <type>/ sub-directories and manifest.jsonl to')
+    parser.add_argument('--per-type', type=int, default=100, help='documents per document type')
+    parser.add_argument('--types', help='comma-separated subset of document types (default: all)')
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS), help='comma-separated: pdf, docx, image, card')
+    parser.add_argument('--pages', type=_page_range, default=(1, 3), help='page count or range, e.g. 1-5')
+    parser.add_argument('--noise', type=float, default=0.02, help='typo rate in text; speckle and blur in images')
+    parser.add_argument('--rotation', type=float, default=4, help='maximum rotation of images, in degrees')
+    parser.add_argument('--misleading-names', type=float, default=0.3, help='fraction of files with misleading names')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='generator processes (default: all CPUs)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    patterns = load_rules(get_rule_registry().path)[0]
+    if args.types:
+        unknown = set(args.types.split(',')) - set(patterns)
+        if unknown:
+            sys.exit(f"Unknown document types: {', '.join(sorted(unknown))}")
+        patterns = {doc_type: patterns[doc_type] for doc_type in args.types.split(',')}
+    formats = args.formats.split(',')
+    if set(formats) - set(FORMATS):
+        sys.exit(f"Formats must be among {', '.join(FORMATS)}")
+
+    start = time.perf_counter()
+    written = generate(args.output, patterns, args.per_type, args.seed, args.workers, formats, args.pages,
+                       args.noise, args.rotation, args.misleading_names)
+    elapsed = time.perf_counter() - start
+    logging.info(f"Wrote {written} documents to {args.output} in {elapsed:.1f}s ({written / elapsed:.0f}/s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# src/text_store.py
+
+"""
+Extracted Text Store Module
+===========================
+
+Extraction (OCR, PDF parsing) is by far the most expensive step, and its output does not change
+when the classification rules or the ML model do. This module persists extracted text in SQLite,
+keyed by the content hash of the upload and the extractor version, so that:
+
+- re-uploads after a rule change skip extraction and only re-run classification;
+- a day's corpus can be reclassified in bulk with ``python -m src.reclassify``.
+
+Texts are stored in full: early exit (``PDF_EARLY_EXIT_MARGIN``, ``DOCX_EARLY_EXIT_MARGIN``) is
+off for documents whose text is stored, since the pages the current rules do not need may be the
+ones that decide under the next rules. ``PDF_MAX_PAGES`` does limit stored texts, so it is part of
+their version along with the extractor version.
+
+The store is enabled by setting ``TEXT_STORE_PATH``.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Iterator, Optional, Tuple
+from .extractors import EXTRACTOR_VERSION, PDF_MAX_PAGES
+
+TEXT_STORE_PATH = os.environ.get('TEXT_STORE_PATH')
+
+# Version of the stored texts: the extractor version, and the page limit they were read with
+TEXT_VERSION = f'{EXTRACTOR_VERSION}-pages{PDF_MAX_PAGES}' if PDF_MAX_PAGES else EXTRACTOR_VERSION
+
+class TextStore:
+    """
+    A persistent store of extracted text.
+
+    Parameters:
+        path (str): SQLite database file.
+        extractor_version (str): Version of the extractors that produced the texts. Texts written by
+            other versions are ignored.
+    """
+
+    def __init__(self, path: str, extractor_version: str):
+        self.path = path
+        self.extractor_version = extractor_version
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS texts ('
+            ' content_hash TEXT, extractor_version TEXT, kind TEXT, filename TEXT, text TEXT,'
+            ' created REAL, PRIMARY KEY (content_hash, extractor_version))'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS texts_created ON texts (created)')
+        self._db.commit()
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """Return the stored text for ``content_hash``, or None if it was never extracted."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT text FROM texts WHERE content_hash = ? AND extractor_version = ?',
+                (content_hash, self.extractor_version),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, content_hash: str, kind: str, filename: str, text: str) -> None:
+        """Store the text extracted from an upload."""
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?, ?, ?)',
+                (content_hash, self.extractor_version, kind, filename, text, time.time()),
+            )
+            self._db.commit()
+
+    def iter_texts(self, since: float = 0.0) -> Iterator[Tuple[str, str, str, str]]:
+        """
+        Iterate over stored texts extracted at or after ``since`` (a Unix timestamp).
+
+        Yields:
+            Tuple[str, str, str, str]: ``(content_hash, kind, filename, text)`` rows.
+        """
+        # A separate connection, so a long bulk read does not block writers on the shared one
+        db = sqlite3.connect(self.path)
+        try:
+            yield from db.execute(
+                'SELECT content_hash, kind, filename, text FROM texts'
+                ' WHERE extractor_version = ? AND created >= ? ORDER BY created',
+                (self.extractor_version, since),
+            )
+        finally:
+            db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM texts WHERE extractor_version = ?', (self.extractor_version,)
+            ).fetchone()[0]
+
+_store: Optional[TextStore] = None
+_store_lock = threading.Lock()
+
+def get_text_store() -> Optional[TextStore]:
+    """Return the shared text store, or None if ``TEXT_STORE_PATH`` is not set."""
+    global _store
+    if _store is None and TEXT_STORE_PATH:
+        with _store_lock:
+            if _store is None:
+                _store = TextStore(TEXT_STORE_PATH, TEXT_VERSION)
+    return _store
@@ -0,0 +1,212 @@
+# src/uploads.py
+
+"""
+Upload Handling Module
+======================
+
+Keeps the memory taken by uploads bounded, whatever their size:
+
+- Uploaded files are buffered in memory up to ``UPLOAD_SPOOL_THRESHOLD`` bytes and written to a
+  named temporary file beyond that (:class:`SpooledUpload`). Small files never touch the disk and
+  large ones never sit in memory; extraction workers open spooled files by name instead of
+  receiving a copy of their content.
+- Extractors that need random access to a file another parser is still reading (pypdfium2
+  rendering the pages pdfminer is walking) get a :class:`MappedFile` over a memory map of it,
+  rather than a copy.
+- :class:`ByteBudget` caps the bytes of all request bodies being handled at once, so the app can
+  answer 503 to a burst of large uploads instead of running out of memory or disk. Bodies larger
+  than ``MAX_UPLOAD_BYTES`` are refused with 413 before they are read.
+"""
+
+import io
+import os
+import mmap
+import threading
+from tempfile import NamedTemporaryFile
+from typing import Optional
+from flask import Request
+from werkzeug.datastructures import FileStorage
+
+# Uploaded files larger than this are spooled to a temporary file instead of kept in memory
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 1024 * 1024))
+# Directory for spooled uploads; unset uses the system temporary directory
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR') or None
+# Largest request body accepted by the single-file endpoints
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 100 * 1024 * 1024))
+# Request bodies of all requests being handled at once; further uploads get a 503
+MAX_INFLIGHT_BYTES = int(os.environ.get('MAX_INFLIGHT_BYTES', 512 * 1024 * 1024))
+
+class SpooledUpload:
+    """
+    A file kept in memory until it grows past ``threshold`` bytes, then moved to a named temporary
+    file that is deleted when it is closed.
+
+    Unlike ``tempfile.SpooledTemporaryFile``, the file on disk has a name (:attr:`name`), so other
+    processes can open it.
+
+    Args:
+        threshold (int, optional): Bytes kept in memory; defaults to ``UPLOAD_SPOOL_THRESHOLD``.
+        directory (str, optional): Directory of the temporary file; defaults to ``UPLOAD_SPOOL_DIR``.
+    """
+
+    def __init__(self, threshold: Optional[int] = None, directory: Optional[str] = None):
+        self.threshold = UPLOAD_SPOOL_THRESHOLD if threshold is None else threshold
+        self.directory = directory or UPLOAD_SPOOL_DIR
+        self.name: Optional[str] = None
+        self._file = io.BytesIO()
+
+    @property
+    def rolled(self) -> bool:
+        """Whether the content has been moved to a temporary file."""
+        return self.name is not None
+
+    def rollover(self) -> None:
+        if self.rolled:
+            return
+        file = NamedTemporaryFile(dir=self.directory, prefix='upload-')
+        file.write(self._file.getbuffer())
+        file.seek(self._file.tell())
+        self._file.close()
+        self._file, self.name = file, file.name
+
+    def write(self, data) -> int:
+        written = self._file.write(data)
+        if not self.rolled and self._file.tell() > self.threshold:
+            self.rollover()
+        return written
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class MappedFile(io.RawIOBase):
+    """
+    A read-only file over a buffer with a position of its own, reading without copying the buffer.
+
+    Args:
+        buffer: Any object supporting the buffer protocol, such as an ``mmap``.
+        owner: Closed (or released) together with this file, e.g. the ``mmap`` behind ``buffer``.
+    """
+
+    def __init__(self, buffer, owner=None):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._owner = owner
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        start = min(self._position, len(self._view))
+        size = min(len(b), len(self._view) - start)
+        memoryview(b).cast('B')[:size] = self._view[start:start + size]
+        self._position = start + size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        if base + offset < 0:
+            raise ValueError(f"negative seek position {base + offset}")
+        self._position = base + offset
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+            if isinstance(self._owner, memoryview):
+                self._owner.release()
+            elif self._owner is not None:
+                self._owner.close()
+        super().close()
+
+def open_mapped(file: FileStorage) -> MappedFile:
+    """
+    Open an independent read-only view of an upload, leaving the position of its stream alone.
+
+    Uploads on disk are memory-mapped, so their pages are read on demand and shared with the OS page
+    cache; uploads in memory are viewed in place. Only streams that support neither are copied.
+
+    Args:
+        file (FileStorage): The uploaded file.
+
+    Returns:
+        MappedFile: The view, to be closed by the caller.
+    """
+    stream = file.stream
+    try:
+        stream.flush()
+        fileno = stream.fileno()
+        if os.fstat(fileno).st_size > 0:
+            mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            return MappedFile(mapping, mapping)
+    except (AttributeError, OSError, ValueError):  # io.UnsupportedOperation is both
+        pass
+    getbuffer = getattr(stream, 'getbuffer', None)
+    if getbuffer is not None:
+        buffer = getbuffer()
+        return MappedFile(buffer, buffer)
+    position = stream.tell()
+    stream.seek(0)
+    data = stream.read()
+    stream.seek(position)
+    return MappedFile(data)
+
+def spool_path(file: FileStorage) -> Optional[str]:
+    """Return the path of the file on disk holding the upload, or None if it is in memory."""
+    name = getattr(file.stream, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        file.stream.flush()
+        return name
+    return None
+
+class ByteBudget:
+    """
+    A number of bytes shared by concurrent requests.
+
+    Reservations never wait: a request that does not fit is expected to be refused and retried
+    later, rather than queued while holding its connection.
+
+    Args:
+        limit (int): Total bytes that may be reserved at once.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int) -> bool:
+        """Reserve ``size`` bytes; returns False, reserving nothing, if they do not fit."""
+        with self._lock:
+            if self.in_use + size > self.limit:
+                return False
+            self.in_use += size
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.in_use -= size
+
+class UploadRequest(Request):
+    """A Flask request that receives uploaded files into :class:`SpooledUpload` files."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload()
@@ -0,0 +1,19 @@
+# tests/conftest.py
+
+import pytest
+from src.cache import get_result_cache
+from src.near_duplicates import get_near_duplicate_index
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    # Tests reuse the same dummy bytes with different mocked extractors
+    get_result_cache().clear()
+    yield
+
+@pytest.fixture(autouse=True)
+def clear_near_duplicate_index():
+    # Labels reused from documents classified by other tests would mask what a test checks
+    index = get_near_duplicate_index()
+    if index is not None:
+        index.clear()
+    yield
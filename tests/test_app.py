@@ -3,6 +3,7 @@
 from io import BytesIO
 
 import pytest
+from werkzeug.datastructures import FileStorage
 from src.app import app, allowed_file
 
 @pytest.fixture
@@ -11,17 +12,27 @@ def client():
     with app.test_client() as client:
         yield client
 
-@pytest.mark.parametrize("filename, expected", [
-    ("file.pdf", True),
-    ("file.png", True),
-    ("file.jpg", True),
-    ("file.jpeg", True),
-    ("file.docx", True),
-    ("file.txt", False),
-    ("file", False),
+@pytest.mark.parametrize("content, filename, expected", [
+    (b"dummy content", "file.pdf", True),
+    (b"dummy content", "file.png", True),
+    (b"dummy content", "file.jpg", True),
+    (b"dummy content", "file.jpeg", True),
+    (b"dummy content", "file.docx", True),
+    (b"dummy content", "file.txt", False),
+    (b"dummy content", "file", False),
+    (b"%PDF-1.4\n", "scan.bin", True),
+    (b"%PDF-1.4\n", "scan", True),
+    (b"\x89PNG\r\n\x1a\n", "photo.txt", True),
 ])
-def test_allowed_file(filename, expected):
-    assert allowed_file(filename) == expected
+def test_allowed_file(content, filename, expected):
+    assert allowed_file(FileStorage(stream=BytesIO(content), filename=filename)) == expected
+
+def test_sniffed_type_without_extension_is_classified(client, mocker):
+    mocker.patch('src.app.classify_file', return_value='invoice')
+    data = {'file': (BytesIO(b"%PDF-1.4\n"), 'scan.bin')}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()["file_class"] == "invoice"
 
 def test_no_file_in_request(client):
     response = client.post('/classify_file')
@@ -90,6 +101,48 @@ def test_large_file_upload(client, mocker):
     assert response.status_code == 200
     assert response.get_json() == {"file_class": "large_file_class"}
 
+def test_batch_results_in_input_order(client, mocker):
+    mocker.patch('src.app.classify_file', side_effect=lambda file: file.filename.split('.')[0])
+
+    data = {'file': [(BytesIO(b"content"), f'class{i}.pdf') for i in range(20)]}
+    response = client.post('/classify_files', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["file_class"] for r in results] == [f'class{i}' for i in range(20)]
+    assert all(r["error"] is None and r["elapsed_ms"] >= 0 for r in results)
+
+def test_batch_reports_errors_per_file(client, mocker):
+    def mock_classify_file(file):
+        raise Exception("Corrupted file")
+
+    mocker.patch('src.app.classify_file', mock_classify_file)
+
+    data = {'file': [(BytesIO(b"x"), 'bad.pdf'), (BytesIO(b"x"), 'file.exe')]}
+    response = client.post('/classify_files', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert results[0]["file_class"] == "error processing file"
+    assert results[1]["error"] == "File type not allowed"
+
+def test_batch_no_files(client):
+    response = client.post('/classify_files')
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "No file part in the request"}
+
+def test_batch_too_many_files(client, mocker):
+    mocker.patch('src.app.MAX_BATCH_FILES', 2)
+
+    data = {'file': [(BytesIO(b"x"), f'file{i}.pdf') for i in range(3)]}
+    response = client.post('/classify_files', data=data, content_type='multipart/form-data')
+    assert response.status_code == 413
+
+def test_batch_payload_too_large(client, mocker):
+    mocker.patch('src.app.MAX_BATCH_BYTES', 1024)
+
+    data = {'file': [(BytesIO(b"A" * 2048), 'file.pdf')]}
+    response = client.post('/classify_files', data=data, content_type='multipart/form-data')
+    assert response.status_code == 413
+
 # This depends on the purpose as it is not needed if only intended for single use
 # def test_multiple_file_upload(client):
 #     data = [
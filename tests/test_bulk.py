@@ -0,0 +1,116 @@
+# tests/test_bulk.py
+
+import csv
+import json
+import os
+import shutil
+import tarfile
+import zipfile
+
+import pytest
+from src import uploads
+from src.bulk import bulk_classify, classify_entry, completed_files, iter_entries
+from src.classifier import DOCUMENT_PATTERNS
+from src.synthetic import generate
+
+@pytest.fixture(scope='module')
+def corpus(tmp_path_factory):
+    root = tmp_path_factory.mktemp('corpus')
+    patterns = {doc_type: DOCUMENT_PATTERNS[doc_type] for doc_type in ('invoice', 'bank_statement')}
+    generate(str(root / 'docs'), patterns, per_type=3, workers=1, formats=('pdf', 'docx'))
+    labels = {}
+    for line in open(root / 'docs' / 'manifest.jsonl'):
+        entry = json.loads(line)
+        labels[os.path.relpath(entry['file'], root / 'docs')] = entry['label']
+    os.remove(root / 'docs' / 'manifest.jsonl')
+    (root / 'docs' / '.DS_Store').write_bytes(b'junk')
+    return root, labels
+
+def read_jsonl(path):
+    return [json.loads(line) for line in open(path)]
+
+def test_directories(corpus, tmp_path):
+    root, labels = corpus
+    output = tmp_path / 'labels.jsonl'
+    counts = bulk_classify([str(root / 'docs')], str(output), workers=2, progress_interval=0)
+
+    records = read_jsonl(output)
+    assert {os.path.relpath(record['file'], root / 'docs'): record['file_class'] for record in records} == labels
+    assert counts == {'invoice': 3, 'bank_statement': 3}
+    assert all(record['bytes'] > 0 for record in records)
+
+@pytest.mark.parametrize('archive_name', ['docs.zip', 'docs.tar.gz'])
+def test_archives_are_read_in_place(corpus, tmp_path, archive_name):
+    root, labels = corpus
+    archive = tmp_path / archive_name
+    if archive_name.endswith('.zip'):
+        with zipfile.ZipFile(archive, 'w') as f:
+            for name in labels:
+                f.write(root / 'docs' / name, name)
+            f.writestr('__MACOSX/._x.pdf', b'resource fork')
+    else:
+        with tarfile.open(archive, 'w:gz') as f:
+            for name in labels:
+                f.add(root / 'docs' / name, name)
+    output = tmp_path / 'labels.jsonl'
+    bulk_classify([str(archive)], str(output), workers=1, progress_interval=0)
+
+    records = read_jsonl(output)
+    assert {record['file'] for record in records} == {f'{archive}!{name}' for name in labels}
+    assert {record['file'].split('!')[1]: record['file_class'] for record in records} == labels
+    assert sorted(os.listdir(tmp_path)) == sorted([archive_name, 'labels.jsonl'])  # nothing unpacked
+
+@pytest.mark.parametrize('compression, max_memory', [(zipfile.ZIP_STORED, 0), (zipfile.ZIP_DEFLATED, 1 << 30)])
+def test_zip_members_are_not_spooled_to_disk(corpus, tmp_path, mocker, compression, max_memory):
+    root, labels = corpus
+    archive = tmp_path / 'docs.zip'
+    with zipfile.ZipFile(archive, 'w', compression) as f:
+        for name in labels:
+            f.write(root / 'docs' / name, name)
+    mocker.patch('src.bulk.BULK_MEMBER_MAX_MEMORY', max_memory)
+    # Anything that would be spooled would be spooled at once
+    mocker.patch('src.uploads.UPLOAD_SPOOL_THRESHOLD', 0)
+    mocker.patch('src.uploads.NamedTemporaryFile', side_effect=AssertionError('spooled to disk'))
+    for entry in iter_entries(str(archive)):
+        record = classify_entry(entry)
+        assert record['file_class'] == labels[entry.member] and record['bytes'] > 0
+
+def test_large_compressed_members_are_decompressed_once_to_disk(corpus, tmp_path, mocker):
+    root, labels = corpus
+    archive = tmp_path / 'docs.zip'
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as f:
+        for name in labels:
+            f.write(root / 'docs' / name, name)
+    mocker.patch('src.bulk.BULK_MEMBER_MAX_MEMORY', 0)
+    mocker.patch('src.uploads.UPLOAD_SPOOL_DIR', str(tmp_path / 'spool'))
+    (tmp_path / 'spool').mkdir()
+    spooled = mocker.spy(uploads, 'NamedTemporaryFile')
+    for entry in iter_entries(str(archive)):
+        record = classify_entry(entry)
+        assert record['file_class'] == labels[entry.member] and record['bytes'] > 0
+    assert spooled.call_count == len(labels)
+    assert os.listdir(tmp_path / 'spool') == []
+
+def test_resumes_after_a_crash(corpus, tmp_path):
+    root, labels = corpus
+    source = str(root / 'docs')
+    first = next(iter_entries(source))
+    output = tmp_path / 'labels.jsonl'
+    # One record written, then a crash in the middle of the second
+    output.write_text(json.dumps({'file': first.name, 'file_class': 'invoice', 'bytes': 1,
+                                  'elapsed_ms': 1}) + '\n{"file": "tru')
+
+    counts = bulk_classify([source], str(output), workers=1, progress_interval=0)
+    records = read_jsonl(output)
+    assert sum(counts.values()) == len(labels) - 1
+    assert len(records) == len({record['file'] for record in records}) == len(labels)
+
+def test_csv_output(corpus, tmp_path):
+    root, labels = corpus
+    output = tmp_path / 'labels.csv'
+    bulk_classify([str(root / 'docs')], str(output), workers=1, progress_interval=0)
+    assert bulk_classify([str(root / 'docs')], str(output), workers=1, progress_interval=0) == {}
+
+    rows = list(csv.DictReader(open(output)))
+    assert len(rows) == len(labels)
+    assert completed_files(str(output), csv_format=True) == {row['file'] for row in rows}
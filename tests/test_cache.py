@@ -0,0 +1,78 @@
+# tests/test_cache.py
+
+import sqlite3
+import time
+from io import BytesIO
+
+from werkzeug.datastructures import FileStorage
+from src.cache import ResultCache, content_hash
+from src.classifier import classifier_version, classify_file
+
+def test_content_hash_rewinds_stream():
+    file = FileStorage(stream=BytesIO(b"hello"), filename='a.pdf')
+    assert content_hash(file) == content_hash(FileStorage(stream=BytesIO(b"hello"), filename='b.pdf'))
+    assert file.read() == b"hello"
+
+def test_lru_eviction_and_counters():
+    cache = ResultCache(max_entries=2, ttl=60, path=None)
+    cache.set('a', 'invoice')
+    cache.set('b', 'passport')
+    assert cache.get('a') == 'invoice'
+    cache.set('c', 'resume')  # evicts 'b', the least recently used
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'disk_hits': 0, 'misses': 1, 'evictions': 1, 'expirations': 0, 'size': 2}
+
+def test_ttl_expiry():
+    cache = ResultCache(max_entries=10, ttl=0, path=None)
+    cache.set('a', 'invoice')
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    ResultCache(max_entries=10, ttl=60, path=path).set('a', 'invoice')
+
+    restarted = ResultCache(max_entries=10, ttl=60, path=path)
+    assert restarted.get('a') == 'invoice'
+    assert restarted.stats()['disk_hits'] == 1
+
+def disk_rows(path):
+    with sqlite3.connect(path) as db:
+        return [key for key, in db.execute('SELECT key FROM results ORDER BY created')]
+
+def test_disk_tier_is_purged(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(max_entries=10, ttl=60, path=path, max_disk_entries=3, purge_every=2)
+    for key in 'abcde':
+        cache.set(key, 'invoice')
+    # Purged at the fourth write, down to the newest three, and not since
+    assert disk_rows(path) == ['b', 'c', 'd', 'e']
+    cache.set('f', 'invoice')
+    assert disk_rows(path) == ['d', 'e', 'f']
+
+    # Expired rows are deleted when the cache is opened
+    time.sleep(0.02)
+    ResultCache(max_entries=10, ttl=0.01, path=path)
+    assert disk_rows(path) == []
+
+def test_clear_drops_the_disk_tier(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(max_entries=10, ttl=60, path=path)
+    cache.set('a', 'invoice')
+    cache.clear()
+    assert cache.get('a') is None and disk_rows(path) == []
+
+def test_version_covers_everything_that_produces_labels(mocker):
+    version = classifier_version()
+    mocker.patch('src.classifier.EXTRACTOR_VERSION', 'next')
+    assert classifier_version() != version
+    mocker.patch('src.classifier.model_version', return_value='retrained')
+    assert 'model-retrained' in classifier_version()
+
+def test_cache_hit_skips_extraction(mocker):
+    extract = mocker.patch('src.classifier.extract_text_from_pdf', return_value='Invoice Number: 1')
+
+    for _ in range(3):
+        file = FileStorage(stream=BytesIO(b'%PDF-1.4 same bytes'), filename='invoice.pdf')
+        assert classify_file(file) == 'invoice'
+    assert extract.call_count == 1
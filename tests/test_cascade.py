@@ -0,0 +1,114 @@
+# tests/test_cascade.py
+
+from io import BytesIO
+
+import pytest
+from src import cascade
+from src import scheduler as scheduler_module
+from src.app import app
+from src.cascade import classify_file_cascade
+from src.metrics import RESULTS
+from src.scheduler import INTERACTIVE, Scheduler, SchedulerBusy
+from src.text_store import TextStore
+from tests.test_extraction_pool import make_docx
+from tests.test_extractors import make_pdf
+
+@pytest.fixture(autouse=True)
+def no_ml_model(mocker):
+    return mocker.patch('src.cascade._ml_result', return_value=None)
+
+def test_first_page_decides():
+    file = make_pdf(['Bank Statement - Account Summary - Available Balance - Transaction History',
+                     'transactions for the period'])
+    result = classify_file_cascade(file)
+    assert (result['file_class'], result['tier'], result['confidence']) == ('bank_statement', 'first_page', 1.0)
+    assert list(result['latency_ms']) == ['first_page']
+
+def test_keyword_agreement_decides_with_small_margin():
+    result = classify_file_cascade(make_docx('Invoice for services rendered'))
+    assert (result['file_class'], result['tier']) == ('invoice', 'first_page')
+
+def test_escalates_to_full_text():
+    file = make_pdf(['Cover page of the document pack',
+                     'Bank Statement - Account Summary - Available Balance - Transaction History'])
+    result = classify_file_cascade(file)
+    assert (result['file_class'], result['tier']) == ('bank_statement', 'full_text')
+    assert list(result['latency_ms']) == ['first_page', 'full_text']
+
+def test_first_page_is_not_ocrd(mocker):
+    ocr = mocker.patch('src.extractors._ocr_image',
+                       return_value='Bank Statement - Account Summary - Available Balance - Transaction History')
+    result = classify_file_cascade(make_pdf(['']))
+    assert (result['file_class'], result['tier']) == ('bank_statement', 'full_text')
+    assert ocr.call_count == 1
+
+def test_escalates_to_ml(no_ml_model):
+    no_ml_model.return_value = ('contract', 0.9)
+    result = classify_file_cascade(make_docx('Patient record and agreement'))
+    assert (result['file_class'], result['tier'], result['confidence']) == ('contract', 'ml', 0.9)
+
+def test_uncertain_result_without_ml():
+    result = classify_file_cascade(make_docx('Nothing recognisable here'))
+    assert (result['file_class'], result['tier'], result['confidence']) == ('unknown', 'first_page', 0.0)
+
+def test_detail_route():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        data = {'file': (BytesIO(make_docx('Invoice number 1, amount due').read()), 'invoice.docx')}
+        response = client.post('/classify_file?detail=true', data=data, content_type='multipart/form-data')
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['file_class'] == 'invoice' and body['tier'] == 'first_page'
+    assert 'first_page' in body['latency_ms']
+
+STATEMENT = 'Bank Statement - Account Summary - Available Balance - Transaction History'
+
+def test_results_are_cached_and_counted(mocker):
+    counted = RESULTS.value('bank_statement')
+    assert classify_file_cascade(make_pdf([STATEMENT]))['tier'] == 'first_page'
+    extractor = mocker.patch('src.cascade.run_extractor')
+    result = classify_file_cascade(make_pdf([STATEMENT]))
+    assert (result['file_class'], result['tier'], result['latency_ms']) == ('bank_statement', 'first_page', {})
+    extractor.assert_not_called()
+    assert RESULTS.value('bank_statement') == counted + 2
+
+def test_ml_results_are_cached_per_model(no_ml_model, mocker):
+    no_ml_model.return_value = ('contract', 0.9)
+    for _ in range(2):
+        assert classify_file_cascade(make_docx('Patient record and agreement'))['tier'] == 'ml'
+    assert no_ml_model.call_count == 1
+    # A retrained model does not reuse the labels of the previous one
+    mocker.patch('src.classifier.model_version', return_value='retrained')
+    classify_file_cascade(make_docx('Patient record and agreement'))
+    assert no_ml_model.call_count == 2
+
+def test_full_texts_come_from_the_text_store(tmp_path, mocker):
+    store = TextStore(str(tmp_path / 'texts.sqlite'), '1')
+    mocker.patch('src.cascade.get_text_store', return_value=store)
+    file = make_pdf(['Cover page of the document pack', STATEMENT])
+    assert classify_file_cascade(file)['tier'] == 'full_text'
+    assert len(store) == 1
+
+    get_result_cache = mocker.patch('src.cascade.get_result_cache')
+    get_result_cache.return_value.get.return_value = None
+    extractor = mocker.spy(cascade, 'run_extractor')
+    assert classify_file_cascade(make_pdf(['Cover page of the document pack', STATEMENT]))['tier'] == 'full_text'
+    # Only the first page is extracted again
+    assert [call.kwargs for call in extractor.call_args_list] == [{'max_pages': 1, 'stop_when': None, 'ocr': False}]
+
+def test_detail_route_is_scheduled(mocker):
+    scheduler = Scheduler({'docx': 1})
+    mocker.patch.object(scheduler_module, '_scheduler', scheduler)
+    priorities = []
+    run = scheduler.run
+    mocker.patch.object(scheduler, 'run', side_effect=lambda *args: priorities.append(scheduler_module._priority.get()) or run(*args))
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        data = {'file': (BytesIO(make_docx('Invoice number 2, amount due').read()), 'invoice.docx')}
+        response = client.post('/classify_file?detail=true', data=data, content_type='multipart/form-data')
+        assert response.get_json()['file_class'] == 'invoice' and priorities == [INTERACTIVE]
+
+        mocker.patch.object(scheduler, 'run', side_effect=SchedulerBusy('no docx slot within 30s'))
+        data = {'file': (BytesIO(make_docx('Invoice number 3, amount due').read()), 'invoice.docx')}
+        response = client.post('/classify_file?detail=true', data=data, content_type='multipart/form-data')
+        assert response.status_code == 503 and 'Retry-After' in response.headers
@@ -0,0 +1,84 @@
+# tests/test_extraction_pool.py
+
+import os
+import threading
+import time
+from io import BytesIO
+
+import docx
+import pytest
+from werkzeug.datastructures import FileStorage
+from src import classifier
+from concurrent.futures import ThreadPoolExecutor
+from src.extraction_pool import ExtractionPool, ExtractionTimeout, ExtractionWorkerDied
+
+@pytest.fixture
+def pool():
+    pool = ExtractionPool(workers=1, timeout=30, max_tasks_per_worker=1)
+    yield pool
+    pool.shutdown()
+
+def make_docx(text):
+    document = docx.Document()
+    document.add_paragraph(text)
+    buffer = BytesIO()
+    document.save(buffer)
+    return FileStorage(stream=BytesIO(buffer.getvalue()), filename='sample.docx')
+
+def test_extract_in_worker(pool):
+    assert pool.extract('docx', make_docx('Invoice Number: 42')) == 'Invoice Number: 42'
+
+def test_workers_are_recycled(pool):
+    assert pool.run(os.getpid) != pool.run(os.getpid)
+
+def test_timeout_restarts_pool(pool):
+    with pytest.raises(ExtractionTimeout):
+        pool.run(time.sleep, 10, timeout=0.5)
+    assert pool.run(os.getpid) != os.getpid()
+
+def test_waiting_for_a_worker_does_not_count_against_the_timeout():
+    pool = ExtractionPool(workers=1, timeout=1)
+    try:
+        with ThreadPoolExecutor(3) as executor:
+            results = list(executor.map(lambda _: pool.run(time.sleep, 0.7), range(3)))
+        assert results == [None] * 3
+    finally:
+        pool.shutdown()
+
+def test_starting_a_worker_does_not_count_against_the_timeout():
+    pool = ExtractionPool(workers=1, timeout=0.05)
+    try:
+        assert pool.run(os.getpid) != os.getpid()
+    finally:
+        pool.shutdown()
+
+def test_timeout_kills_only_the_stuck_worker():
+    pool = ExtractionPool(workers=2, timeout=30)
+    try:
+        with ThreadPoolExecutor(2) as executor:
+            stuck = executor.submit(pool.run, time.sleep, 10, timeout=0.5)
+            running = executor.submit(pool.run, time.sleep, 1)
+            with pytest.raises(ExtractionTimeout):
+                stuck.result()
+            assert running.result() is None
+    finally:
+        pool.shutdown()
+
+def test_worker_death_is_reported_and_replaced(pool):
+    with pytest.raises(ExtractionWorkerDied):
+        pool.run(os._exit, 1)
+    assert pool.run(os.getpid) != os.getpid()
+
+def test_task_errors_are_raised_in_the_caller(pool):
+    with pytest.raises(ValueError):
+        pool.run(int, 'not a number')
+
+def test_unpicklable_task_does_not_leak_the_worker(pool):
+    with pytest.raises(TypeError):
+        pool.run(len, threading.Lock())
+    assert pool.extract('docx', make_docx('Invoice Number: 42')) == 'Invoice Number: 42'
+
+def test_classify_file_dispatches_to_pool(pool, mocker):
+    mocker.patch('src.classifier.get_extraction_pool', return_value=pool)
+
+    assert classifier.classify_file(make_docx('Bank Statement, Account Summary')) == 'bank_statement'
@@ -0,0 +1,123 @@
+# tests/test_extractors.py
+
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from src.classifier import classification_details, classify_file, current_engine
+from src.extraction_pool import ExtractionPool
+from src.extractors import PDF_TIER_COUNTS, extract_pdf, extract_text_from_docx, extract_text_from_pdf, iter_docx_text, iter_pdf_pages
+from src.pattern_engine import StreamingScorer
+
+def make_pdf(pages):
+    """Build a minimal PDF with one line of Helvetica text per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        content = b"BT /F1 12 Tf 72 720 Td (" + text.encode('latin-1') + b") Tj ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return FileStorage(stream=BytesIO(out.getvalue()), filename='document.pdf')
+
+def test_iter_pdf_pages():
+    texts = ['first page of the document', 'second page of the document', 'third page of the document']
+    pages = list(iter_pdf_pages(make_pdf(texts)))
+    assert [page.strip() for page in pages] == texts
+    assert all(page.endswith('\f') for page in pages)
+
+def test_max_pages():
+    file = make_pdf(['statement page number %d' % i for i in range(10)])
+    assert extract_text_from_pdf(file, max_pages=2).split() == 'statement page number 0 statement page number 1'.split()
+
+@pytest.mark.parametrize("margin, expected_pages", [(3, 1), (100, 20)])
+def test_early_exit_once_label_is_settled(margin, expected_pages):
+    file = make_pdf(['Bank Statement, Account Summary, Available Balance'] + ['transactions for the period'] * 19)
+    text = extract_text_from_pdf(file, stop_when=StreamingScorer(current_engine(), margin))
+    assert text.count('\f') == expected_pages
+
+def test_pdf_pages_are_only_scored_when_the_text_is_not_kept():
+    file = make_pdf(['Invoice Number 12 for services rendered', 'Amount Due 40 within thirty days'])
+    scorer = StreamingScorer(current_engine())
+    assert extract_text_from_pdf(file, stop_when=scorer, keep_text=False) == ''
+    assert scorer.label() == 'invoice'
+
+def make_docx(paragraphs):
+    import docx
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    out = BytesIO()
+    document.save(out)
+    return FileStorage(stream=BytesIO(out.getvalue()), filename='document.docx')
+
+def test_docx_paragraphs_join_into_the_text():
+    file = make_docx(['Curriculum Vitae', 'Work Experience', '', 'Education'])
+    assert ''.join(iter_docx_text(file)) == extract_text_from_docx(file) == 'Curriculum Vitae\nWork Experience\n\nEducation'
+
+def test_docx_early_exit_once_label_is_settled():
+    file = make_docx(['Bank Statement', 'Account Summary', 'Available Balance'] + ['transactions for the period'] * 50)
+    text = extract_text_from_docx(file, stop_when=StreamingScorer(current_engine(), 3))
+    assert text.count('\n') < 5
+
+def test_classify_file_scores_streamed_text(mocker):
+    mocker.patch('src.classifier.get_text_store', return_value=None)
+    classify_text = mocker.patch('src.classifier.classify_text')
+    file = make_docx(['Invoice', 'Invoice Number 12', 'Amount Due 40'])
+    assert classify_file(file) == 'invoice'
+    classify_text.assert_not_called()
+
+def make_scanned_pdf(pages=1):
+    images = [Image.new('RGB', (200, 100), 'white') for _ in range(pages)]
+    buffer = BytesIO()
+    images[0].save(buffer, 'PDF', save_all=True, append_images=images[1:])
+    return FileStorage(stream=BytesIO(buffer.getvalue()), filename='scan.pdf')
+
+def test_text_layer_tier(mocker):
+    ocr = mocker.patch('src.extractors._ocr_image')
+    extraction = extract_pdf(make_pdf(['Invoice Number: 1234, amount due']))
+    assert (extraction.tier, extraction.pages, extraction.ocr_pages) == ('text', 1, 0)
+    ocr.assert_not_called()
+
+def test_scanned_pages_fall_back_to_ocr(mocker):
+    pytest.importorskip('pypdfium2')
+    ocr = mocker.patch('src.extractors._ocr_image', return_value="Driver's License")
+    extraction = extract_pdf(make_scanned_pdf(pages=2))
+    assert (extraction.tier, extraction.pages, extraction.ocr_pages) == ('ocr', 2, 2)
+    assert extraction.text == "Driver's License\f" * 2
+    assert ocr.call_args[0][0].width == pytest.approx(200 * 200 / 72, abs=1)
+
+def test_scanned_pages_without_renderer(mocker):
+    mocker.patch('src.extractors.pypdfium2', None)
+    assert extract_pdf(make_scanned_pdf()).tier == 'none'
+
+@pytest.mark.parametrize('pooled', [False, True])
+def test_pdf_tier_is_counted_and_reported_by_the_caller(pooled, mocker):
+    pool = ExtractionPool(workers=1) if pooled else None
+    mocker.patch('src.classifier.get_extraction_pool', return_value=pool)
+    counted = PDF_TIER_COUNTS['text']
+    try:
+        with classification_details() as details:
+            classify_file(make_pdf(['Invoice Number: 1234, amount due, invoice date']))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    assert PDF_TIER_COUNTS['text'] == counted + 1
+    assert details['pdf'] == {'tier': 'text', 'pages': 1, 'ocr_pages': 0}
@@ -0,0 +1,95 @@
+# tests/test_file_types.py
+
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from src import file_types
+from src.classifier import classify_file
+from src.extractors import EXTRACTORS, extract_text_from_email
+from src.file_types import detect_kind, register_format, sniff_mime
+from tests.test_extraction_pool import make_docx
+
+def upload(content, filename):
+    return FileStorage(stream=BytesIO(content), filename=filename)
+
+def image_bytes(format, frames=1):
+    images = [Image.new('RGB', (20, 20), 'white') for _ in range(frames)]
+    buffer = BytesIO()
+    images[0].save(buffer, format, save_all=frames > 1, append_images=images[1:])
+    return buffer.getvalue()
+
+@pytest.mark.parametrize("content, filename, mime", [
+    (b'%PDF-1.7\n...', 'a.pdf', 'application/pdf'),
+    (b'\r\n%PDF-1.4 after some junk', 'a.pdf', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n...', 'a.png', 'image/png'),
+    (b'\xff\xd8\xff\xe0...', 'a.jpg', 'image/jpeg'),
+    (b'II*\x00...', 'scan.tif', 'image/tiff'),
+    (b'\x00\x00\x00\x18ftypheic...', 'photo.heic', 'image/heic'),
+    (b'PK\x03\x04 damaged', 'a.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    (b'PK\x03\x04 damaged', 'a.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    (b'PK\x03\x04 damaged', 'a.pdf', 'application/zip'),
+    (b'just some text', 'a.pdf', None),
+])
+def test_sniff_mime(content, filename, mime):
+    file = upload(content, filename)
+    assert sniff_mime(file) == mime
+    assert file.stream.tell() == 0
+
+def test_zip_container_is_inspected():
+    docx_file = make_docx('Invoice')
+    docx_file.filename = 'misnamed.zip'
+    assert detect_kind(docx_file) == 'docx'
+
+def test_misnamed_image_is_rerouted(mocker):
+    extract_pdf = mocker.patch('src.classifier.extract_text_from_pdf')
+    extract_image = mocker.patch('src.classifier.extract_text_from_image', return_value='Invoice Number: 1')
+
+    assert classify_file(upload(image_bytes('JPEG'), 'invoice.pdf')) == 'invoice'
+    extract_image.assert_called_once()
+    extract_pdf.assert_not_called()
+
+def test_unrecognized_content_is_rejected(mocker):
+    extract_pdf = mocker.patch('src.classifier.extract_text_from_pdf')
+    assert classify_file(upload(b'<html>not a pdf</html>', 'invoice.pdf')) == 'unsupported file type'
+    extract_pdf.assert_not_called()
+
+def test_multi_page_tiff(mocker):
+    ocr = mocker.patch('src.extractors._ocr_image', side_effect=['page one', 'page two'])
+    file = upload(image_bytes('TIFF', frames=2), 'scan.tiff')
+    assert detect_kind(file) == 'image'
+    assert EXTRACTORS['image'](file) == 'page one\fpage two'
+    assert ocr.call_count == 2
+
+def test_email():
+    message = (b'From: billing@example.com\r\nSubject: Your invoice\r\nMIME-Version: 1.0\r\n'
+               b'Content-Type: multipart/alternative; boundary="b"\r\n\r\n'
+               b'--b\r\nContent-Type: text/plain\r\n\r\nAmount due: $10\r\n'
+               b'--b\r\nContent-Type: text/html\r\n\r\n<p>Bill&nbsp;to <b>ACME</b></p><style>p {}</style>\r\n--b--\r\n')
+    file = upload(message, 'message.eml')
+    assert detect_kind(file) == 'email'
+    text = extract_text_from_email(file)
+    assert 'Your invoice' in text and 'Amount due: $10' in text and 'Bill\xa0to  ACME' in text
+    assert classify_file(upload(message, 'message.eml')) == 'invoice'
+
+def test_excel():
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    workbook.active.append(['Invoice Number', 42])
+    workbook.active.append(['Amount Due', 100])
+    buffer = BytesIO()
+    workbook.save(buffer)
+
+    file = upload(buffer.getvalue(), 'export.xlsx')
+    assert detect_kind(file) == 'excel'
+    assert EXTRACTORS['excel'](file) == 'Invoice Number\t42\nAmount Due\t100'
+
+def test_register_format(mocker):
+    mocker.patch.dict(file_types._FORMATS)
+    mocker.patch.dict(file_types._EXTENSIONS)
+    mocker.patch.dict(EXTRACTORS, {'rtf': lambda file: 'Invoice'})
+    register_format('application/rtf', 'rtf', ['rtf'], sniff=lambda head: head.startswith(b'{\\rtf'))
+
+    assert 'rtf' in file_types.supported_extensions()
+    assert classify_file(upload(b'{\\rtf1 ...}', 'letter.rtf')) == 'invoice'
@@ -0,0 +1,50 @@
+# tests/test_image_preprocessing.py
+
+from io import BytesIO
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from src.extractors import extract_text_from_image
+from src.image_preprocessing import normalize_image
+
+def jpeg(size, dpi=(72, 72), orientation=None):
+    image = Image.new('RGB', size, 'white')
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', dpi=dpi, exif=exif)
+    buffer.seek(0)
+    return buffer
+
+def test_large_photo_is_downscaled_to_pixel_budget(mocker):
+    mocker.patch('src.image_preprocessing.OCR_MAX_PIXELS', 1_000_000)
+    image = normalize_image(Image.open(jpeg((4000, 3000))))
+    assert image.mode == 'L'
+    assert 990_000 <= image.width * image.height <= 1_000_000
+    assert abs(image.width / image.height - 4 / 3) < 0.01
+
+def test_high_dpi_scan_is_downscaled_to_target_dpi():
+    image = normalize_image(Image.open(jpeg((1200, 600), dpi=(600, 600))))
+    assert image.size == (600, 300)
+
+def test_small_image_keeps_its_size():
+    assert normalize_image(Image.open(jpeg((900, 600)))).size == (900, 600)
+
+def test_exif_orientation_is_applied():
+    # Orientation 6 means the camera was rotated; the upright image is portrait
+    assert normalize_image(Image.open(jpeg((900, 600), orientation=6))).size == (600, 900)
+
+def test_binarization(mocker):
+    mocker.patch('src.image_preprocessing.OCR_BINARIZE_THRESHOLD', 128)
+    assert normalize_image(Image.open(jpeg((100, 100)))).mode == '1'
+
+def test_tesseract_gets_normalized_image_and_config(mocker):
+    mocker.patch('src.image_preprocessing.OCR_MAX_PIXELS', 10_000)
+    ocr = mocker.patch('src.extractors.pytesseract.image_to_string', return_value="Driver's License")
+
+    file = FileStorage(stream=jpeg((1000, 1000)), filename='license.jpg')
+    assert extract_text_from_image(file) == "Driver's License"
+    image = ocr.call_args[0][0]
+    assert image.mode == 'L' and image.size == (100, 100)
+    assert ocr.call_args[1] == {'lang': 'eng', 'config': '--psm 3'}
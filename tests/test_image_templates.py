@@ -0,0 +1,110 @@
+# tests/test_image_templates.py
+
+import random
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from src import image_templates
+from src.classifier import classification_details, classify_file
+from src.extractors import extract_text_from_image
+from src.image_templates import ImageTemplate, TemplateIndex, crop_region, file_fingerprint, fingerprint
+from src.synthetic import CARD_DESIGNS, card_image, image_bytes
+
+LICENSES = CARD_DESIGNS['drivers_license']
+PASSPORTS = CARD_DESIGNS['passport']
+
+def template(doc_type, design, region=None):
+    card = card_image(doc_type, design, random.Random(f'template:{design["name"]}'), 0, 0)
+    return ImageTemplate(design['name'], doc_type, fingerprint(card), region)
+
+def photo(doc_type, design, seed):
+    rng = random.Random(seed)
+    data, _ = image_bytes([], rng, 3, 0.02, card_image(doc_type, design, rng, 3, 0.02))
+    return FileStorage(stream=BytesIO(data), filename='card.jpg')
+
+@pytest.fixture
+def index():
+    return TemplateIndex([template('drivers_license', LICENSES[0]), template('passport', PASSPORTS[0])])
+
+def test_photographed_cards_match_their_design(index):
+    for seed in range(5):
+        found = index.match(file_fingerprint(photo('drivers_license', LICENSES[0], seed)))
+        assert found.template.name == LICENSES[0]['name'] and found.template.label == 'drivers_license'
+        found = index.match(file_fingerprint(photo('passport', PASSPORTS[0], seed)))
+        assert found.template.name == PASSPORTS[0]['name']
+
+def test_other_designs_and_pages_do_not_match(index):
+    for seed in range(5):
+        assert index.match(file_fingerprint(photo('drivers_license', LICENSES[-1], seed))) is None
+        assert index.match(file_fingerprint(photo('passport', PASSPORTS[-1], seed))) is None
+    page, _ = image_bytes([['Invoice Number: 1234', 'Amount Due: 99.00']], random.Random(1), 0, 0)
+    assert index.match(file_fingerprint(FileStorage(stream=BytesIO(page)))) is None
+
+def test_bit_counts_without_bitwise_count(monkeypatch):
+    values = np.array([0, 1, 0xFF, 0x8000000000000001, 2 ** 64 - 1], dtype=np.uint64)
+    assert image_templates._bit_counts(values).tolist() == [0, 1, 8, 2, 64]
+    monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    assert image_templates._bit_counts(values).tolist() == [0, 1, 8, 2, 64]
+
+def test_file_fingerprint_rewinds_the_upload():
+    file = photo('passport', PASSPORTS[0], 1)
+    file_fingerprint(file)
+    assert file.stream.tell() == 0
+
+def test_save_and_load(tmp_path, index):
+    path = str(tmp_path / 'templates.json')
+    index.add(template('drivers_license', LICENSES[1], (0, 0, 1, 0.3)))
+    index.save(path)
+    loaded = TemplateIndex.load(path)
+    assert [known.name for known in loaded.templates] == [known.name for known in index.templates]
+    assert loaded.templates[-1].region == (0, 0, 1, 0.3)
+    file = photo('drivers_license', LICENSES[1], 2)
+    assert loaded.match(file_fingerprint(file)).template.name == LICENSES[1]['name']
+
+def test_adding_a_template_again_replaces_it(index):
+    index.add(template('passport', PASSPORTS[0])._replace(label='id_card'))
+    assert len(index) == 2 and index.templates[-1].label == 'id_card'
+
+def test_crop_region():
+    image = Image.new('L', (200, 100))
+    assert crop_region(image, (0.25, 0.5, 1, 1)).size == (150, 50)
+
+def test_image_extraction_reads_only_the_region(mocker):
+    ocr = mocker.patch('src.extractors._ocr_image', return_value='DRIVER LICENSE')
+    file = photo('drivers_license', LICENSES[0], 3)
+    width, height = Image.open(file.stream).size
+    assert extract_text_from_image(file, region=(0, 0, 1, 0.25)) == 'DRIVER LICENSE'
+    assert ocr.call_args.args[0].size == (width, round(height / 4))
+
+@pytest.fixture
+def templates(monkeypatch, index):
+    monkeypatch.setattr(image_templates, 'IMAGE_TEMPLATES_PATH', 'templates.json')
+    monkeypatch.setattr(image_templates, '_index', index)
+    return index
+
+def test_matching_images_skip_ocr(templates, mocker):
+    ocr = mocker.patch('src.classifier.extract_text_from_image')
+    with classification_details() as details:
+        assert classify_file(photo('passport', PASSPORTS[0], 4)) == 'passport'
+    ocr.assert_not_called()
+    assert details['image_template']['name'] == PASSPORTS[0]['name']
+
+def test_template_regions_are_ocrd_and_classified(templates, mocker):
+    templates.add(template('drivers_license', LICENSES[0], (0, 0, 1, 0.3)))
+    ocr = mocker.patch('src.classifier.extract_text_from_image', return_value="Driver's License  DL: D1234567")
+    assert classify_file(photo('drivers_license', LICENSES[0], 5)) == 'drivers_license'
+    assert ocr.call_args.kwargs == {'region': (0, 0, 1, 0.3)}
+
+def test_unsettled_regions_fall_back_to_the_full_image(templates, mocker):
+    templates.add(template('drivers_license', LICENSES[0], (0, 0, 1, 0.3)))
+    ocr = mocker.patch('src.classifier.extract_text_from_image', side_effect=['', "Driver's License DL: D1234567"])
+    assert classify_file(photo('drivers_license', LICENSES[0], 6)) == 'drivers_license'
+    assert [call.kwargs for call in ocr.call_args_list] == [{'region': (0, 0, 1, 0.3)}, {}]
+
+def test_unknown_designs_are_ocrd(templates, mocker):
+    ocr = mocker.patch('src.classifier.extract_text_from_image', return_value='Passport No: X1234567')
+    assert classify_file(photo('passport', PASSPORTS[-1], 7)) == 'passport'
+    ocr.assert_called_once()
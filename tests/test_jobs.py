@@ -0,0 +1,209 @@
+# tests/test_jobs.py
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+
+import pytest
+from src import app as app_module
+from src.app import app
+from src.uploads import ByteBudget
+from src.jobs import InvalidCallback, JobQueue, JobStore, QueueFull, check_callback_url
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def wait_for(job_queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_queue.get(job_id)
+        if job is not None and job.status in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_job_runs_in_background():
+    job_queue = JobQueue(lambda payload: payload.upper(), workers=1)
+    job = wait_for(job_queue, job_queue.submit('invoice').id)
+    assert (job.status, job.result) == ('done', 'INVOICE')
+    assert job.to_dict()['processing_ms'] >= 0
+    assert job_queue.stats()['completed'] == 1
+
+def test_failed_job():
+    def handler(payload):
+        raise ValueError("bad file")
+
+    job_queue = JobQueue(handler, workers=1)
+    job = wait_for(job_queue, job_queue.submit('x').id)
+    assert (job.status, job.error) == ('failed', 'bad file')
+
+def test_queue_depth_limit():
+    release = threading.Event()
+    job_queue = JobQueue(lambda payload: release.wait(), workers=1, max_depth=1)
+    job_queue.submit('running')
+    time.sleep(0.05)  # let the worker pick up the first job
+    job_queue.submit('queued')
+    with pytest.raises(QueueFull):
+        job_queue.submit('rejected')
+    release.set()
+    assert job_queue.stats()['rejected'] == 1
+
+def test_finished_jobs_expire():
+    job_queue = JobQueue(lambda payload: payload, workers=1, ttl=0)
+    job = job_queue.submit('x')
+    time.sleep(0.05)
+    assert job_queue.get(job.id) is None
+
+def test_jobs_are_shared_through_the_store(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite')
+    accepting = JobQueue(lambda payload: 'invoice', workers=1, store=JobStore(path))
+    other = JobQueue(lambda payload: 'unknown', workers=1, store=JobStore(path))
+    job = wait_for(accepting, accepting.submit('x').id)
+    shared = other.get(job.id)
+    assert shared.to_dict() == job.to_dict() and shared.to_dict()['file_class'] == 'invoice'
+    assert other.get('does-not-exist') is None
+
+def test_finished_jobs_expire_from_the_store(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite'))
+    job_queue = JobQueue(lambda payload: payload, workers=1, ttl=0, store=store)
+    job = job_queue.submit('x')
+    time.sleep(0.05)
+    assert job_queue.get(job.id) is None and store.load(job.id) is None
+
+def test_callback_receives_result(mocker):
+    mocker.patch('src.jobs.JOB_CALLBACK_ALLOWED_HOSTS', ('127.0.0.1',))
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    job_queue = JobQueue(lambda payload: 'invoice', workers=1)
+    job = job_queue.submit('x', callback_url=f'http://127.0.0.1:{server.server_port}/done')
+    wait_for(job_queue, job.id)
+    deadline = time.time() + 5
+    while not received and time.time() < deadline:
+        time.sleep(0.01)
+    server.server_close()
+    assert received[0]['job_id'] == job.id and received[0]['file_class'] == 'invoice'
+
+def test_submit_and_poll_job(client, mocker):
+    mocker.patch('src.app.classify_file', side_effect=lambda file: 'invoice' if file.read() == b'content' else 'unknown')
+
+    data = {'file': (BytesIO(b"content"), 'invoice.pdf')}
+    response = client.post('/jobs', data=data, content_type='multipart/form-data')
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert response.headers['Location'] == f'/jobs/{job_id}'
+
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        body = client.get(f'/jobs/{job_id}').get_json()
+        if body['status'] == 'done':
+            break
+        time.sleep(0.01)
+    assert body['file_class'] == 'invoice'
+
+def test_job_copies_are_charged_to_the_upload_budget(client, mocker):
+    budget = mocker.patch('src.app.upload_budget', ByteBudget(1 << 20))
+    started, release = threading.Event(), threading.Event()
+    copies = []
+
+    def classify(file):
+        copies.append(file.stream.rolled)
+        started.set()
+        release.wait(5)
+        return 'invoice'
+
+    mocker.patch('src.app.classify_file', side_effect=classify)
+    data = {'file': (BytesIO(b'A' * 1000), 'invoice.pdf')}
+    job_id = client.post('/jobs', data=data, content_type='multipart/form-data').get_json()['job_id']
+    started.wait(5)
+    # The request is over, but the job's copy of its upload is still held
+    assert budget.in_use == 1000
+    release.set()
+    wait_for(app_module.job_queue, job_id)
+    assert budget.in_use == 0 and copies == [False]
+
+    # When the request itself leaves no room for the copy, it goes to disk instead
+    budget.limit = 1500
+    data = {'file': (BytesIO(b'A' * 1000), 'invoice.pdf')}
+    job_id = client.post('/jobs', data=data, content_type='multipart/form-data').get_json()['job_id']
+    wait_for(app_module.job_queue, job_id)
+    assert copies == [False, True] and budget.in_use == 0
+
+def test_submit_job_when_queue_full(client, mocker):
+    mocker.patch('src.app.job_queue.submit', side_effect=QueueFull("job queue is full"))
+
+    data = {'file': (BytesIO(b"content"), 'invoice.pdf')}
+    response = client.post('/jobs', data=data, content_type='multipart/form-data')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '5'
+
+def test_unknown_job(client):
+    assert client.get('/jobs/does-not-exist').status_code == 404
+
+def test_invalid_callback_url(client):
+    data = {'file': (BytesIO(b"content"), 'invoice.pdf'), 'callback_url': 'file:///etc/passwd'}
+    response = client.post('/jobs', data=data, content_type='multipart/form-data')
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("url", [
+    'http://127.0.0.1:8000/done',
+    'http://localhost/done',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://10.0.0.5/hook',
+    'http://[::1]/hook',
+    'http://0.0.0.0/hook',
+    'ftp://example.com/hook',
+])
+def test_internal_callback_urls_are_refused(client, url):
+    with pytest.raises(InvalidCallback):
+        check_callback_url(url)
+    data = {'file': (BytesIO(b"content"), 'invoice.pdf'), 'callback_url': url}
+    assert client.post('/jobs', data=data, content_type='multipart/form-data').status_code == 400
+
+def test_callback_allowlist(mocker):
+    mocker.patch('src.jobs.JOB_CALLBACK_ALLOWED_HOSTS', ('hooks.internal',))
+    mocker.patch('src.jobs.socket.getaddrinfo', side_effect=AssertionError('allowed hosts are not resolved'))
+    check_callback_url('https://hooks.internal/done')
+    with pytest.raises(InvalidCallback):
+        check_callback_url('https://example.com/done')
+
+def test_public_callback_hosts_are_accepted(mocker):
+    mocker.patch('src.jobs.socket.getaddrinfo', return_value=[(2, 1, 6, '', ('93.184.215.14', 443))])
+    check_callback_url('https://example.com/done')
+
+def test_callbacks_are_checked_again_before_sending(mocker):
+    job_queue = JobQueue(lambda payload: 'invoice', workers=1)
+    job = job_queue.submit('x', callback_url='http://169.254.169.254/latest/meta-data/')
+    opener = mocker.patch('src.jobs._callback_opener')
+    job_queue._send_callback(job)
+    opener.open.assert_not_called()
+
+def test_drain_waits_for_jobs_and_refuses_new_ones():
+    job_queue = JobQueue(lambda payload: time.sleep(0.1) or payload, workers=1)
+    jobs = [job_queue.submit(index) for index in range(3)]
+    assert job_queue.drain(timeout=5)
+    assert all(job.status == 'done' for job in jobs)
+    with pytest.raises(QueueFull):
+        job_queue.submit('late')
+
+def test_drain_gives_up_after_its_timeout():
+    release = threading.Event()
+    job_queue = JobQueue(lambda payload: release.wait(), workers=1)
+    job_queue.submit('stuck')
+    assert not job_queue.drain(timeout=0.05)
+    release.set()
@@ -0,0 +1,133 @@
+# tests/test_lifecycle.py
+
+import os
+import json
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+from src import lifecycle
+from src.app import app
+from src.metrics import METRICS_SNAPSHOT_INTERVAL
+from src.synthetic import docx_bytes
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(lifecycle, '_ready', threading.Event())
+    monkeypatch.setattr(lifecycle, '_draining', threading.Event())
+    lifecycle.WARMUP_REPORT.clear()
+    yield
+    lifecycle.WARMUP_REPORT.clear()
+
+def test_ready_only_between_warm_up_and_draining(client):
+    assert client.get('/healthz').status_code == 200
+    response = client.get('/readyz')
+    assert (response.status_code, response.get_json()['status']) == (503, 'warming up')
+
+    lifecycle.warm_up()
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['warm_up']['rules']['status'] == 'ok'
+
+    lifecycle.start_draining()
+    response = client.get('/readyz')
+    assert (response.status_code, response.get_json()['status']) == (503, 'draining')
+    assert client.get('/healthz').status_code == 200
+
+def test_optional_steps_do_not_block_readiness(monkeypatch):
+    def missing():
+        raise FileNotFoundError('no model')
+
+    monkeypatch.setattr(lifecycle, 'WARMUP_STEPS', (('model', missing, False),))
+    report = lifecycle.warm_up()
+    assert report['model']['status'] == 'unavailable'
+    assert lifecycle.is_ready()
+
+def test_required_steps_do(monkeypatch):
+    def broken():
+        raise ValueError('bad rules')
+
+    monkeypatch.setattr(lifecycle, 'WARMUP_STEPS', (('rules', broken, True),))
+    with pytest.raises(ValueError):
+        lifecycle.warm_up()
+    assert not lifecycle.is_ready()
+
+@pytest.fixture
+def preforked_server():
+    pytest.importorskip('gunicorn')
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen([sys.executable, '-m', 'src.server', '--bind', f'127.0.0.1:{port}',
+                               '--workers', '2', '--threads', '2'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/readyz', timeout=1) as response:
+                    assert response.status == 200
+                    break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+
+def test_preforked_server_serves_and_stops_cleanly(preforked_server):
+    with urllib.request.urlopen(f'{preforked_server}/healthz', timeout=5) as response:
+        assert response.status == 200
+
+def test_jobs_can_be_polled_from_any_worker(preforked_server):
+    boundary = 'job-boundary'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="invoice.docx"\r\n\r\n'.encode()
+            + docx_bytes([['Invoice Number: INV-1', 'Amount Due: 10.00']]) + f'\r\n--{boundary}--\r\n'.encode())
+    request = urllib.request.Request(f'{preforked_server}/jobs', data=body, method='POST',
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        job_id = json.loads(response.read())['job_id']
+    # New connections are spread over both workers; each must know the job
+    deadline = time.time() + 30
+    statuses = []
+    while not statuses or statuses[-1] != 'done':
+        assert time.time() < deadline
+        with urllib.request.urlopen(f'{preforked_server}/jobs/{job_id}', timeout=5) as response:
+            statuses.append(json.loads(response.read())['status'])
+    for _ in range(10):
+        with urllib.request.urlopen(f'{preforked_server}/jobs/{job_id}', timeout=5) as response:
+            body = json.loads(response.read())
+        assert (body['status'], body['file_class']) == ('done', 'invoice')
+
+def test_metrics_cover_every_worker(preforked_server):
+    boundary = 'metrics-boundary'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="invoice.docx"\r\n\r\n'.encode()
+            + docx_bytes([['Invoice Number: INV-2', 'Amount Due: 20.00']]) + f'\r\n--{boundary}--\r\n'.encode())
+    request = urllib.request.Request(f'{preforked_server}/classify_file', data=body, method='POST',
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        assert json.loads(response.read())['file_class'] == 'invoice'
+
+    def invoices():
+        with urllib.request.urlopen(f'{preforked_server}/metrics', timeout=5) as response:
+            lines = response.read().decode().splitlines()
+        return [line for line in lines if line.startswith('classifier_results_total{file_class="invoice"}')]
+
+    # Once the classifying worker has written a snapshot, every scrape reports its result
+    time.sleep(2 * METRICS_SNAPSHOT_INTERVAL)
+    for _ in range(10):
+        assert invoices() == ['classifier_results_total{file_class="invoice"} 1']
@@ -0,0 +1,132 @@
+# tests/test_metrics.py
+
+import json
+import os
+from io import BytesIO
+
+import pytest
+from src.app import app
+from src.classifier import classify_file
+from src.metrics import RESULTS, STAGE_SECONDS, Counter, Histogram, Registry, stage
+from tests.test_extraction_pool import make_docx
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_histogram_render():
+    histogram = Histogram('test_seconds', 'Test.', ('stage',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, 'ocr')
+    assert histogram.render() == [
+        'test_seconds_bucket{stage="ocr",le="0.1"} 1',
+        'test_seconds_bucket{stage="ocr",le="1"} 2',
+        'test_seconds_bucket{stage="ocr",le="+Inf"} 3',
+        'test_seconds_sum{stage="ocr"} 5.55',
+        'test_seconds_count{stage="ocr"} 3',
+    ]
+
+def test_counter_render_escapes_labels():
+    counter = Counter('test_total', 'Test.', ('file_class',))
+    counter.inc('say "hi"')
+    counter.inc('say "hi"', amount=2)
+    assert counter.render() == ['test_total{file_class="say \\"hi\\""} 3']
+
+def test_stage_outcome():
+    before = STAGE_SECONDS.count('test_stage', 'pdf', 'error')
+    with pytest.raises(ValueError):
+        with stage('test_stage', 'pdf'):
+            raise ValueError
+    assert STAGE_SECONDS.count('test_stage', 'pdf', 'error') == before + 1
+
+def test_classify_file_records_stages():
+    counts = {name: STAGE_SECONDS.count(name, 'docx', 'ok') for name in ('sniff', 'extract', 'docx_parse', 'score')}
+    invoices = RESULTS.value('invoice')
+
+    assert classify_file(make_docx('Invoice Number: 1')) == 'invoice'
+    assert all(STAGE_SECONDS.count(name, 'docx', 'ok') == count + 1 for name, count in counts.items())
+    assert RESULTS.value('invoice') == invoices + 1
+
+def test_metrics_endpoint(client):
+    client.post('/classify_file', data={'file': (BytesIO(make_docx('Invoice').read()), 'a.docx')},
+                content_type='multipart/form-data')
+    response = client.get('/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE classifier_stage_seconds histogram' in body
+    assert 'classifier_stage_seconds_count{stage="extract",kind="docx",outcome="ok"}' in body
+    assert 'http_request_duration_seconds_count{route="/classify_file",status="200"}' in body
+    assert 'classifier_result_cache_misses_total' in body
+
+def test_tracing_headers(client):
+    data = {'file': (BytesIO(make_docx('Invoice').read()), 'a.docx')}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data',
+                           headers={'X-Trace': '1', 'X-Request-ID': 'abc'})
+    assert response.headers['X-Request-ID'] == 'abc'
+    timings = dict(entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', '))
+    assert {'sniff', 'hash', 'extract', 'score'} <= set(timings)
+
+    untraced = client.post('/classify_file', data={'file': (BytesIO(b'x'), 'a.docx')},
+                           content_type='multipart/form-data')
+    assert 'Server-Timing' not in untraced.headers
+
+def test_batch_items_are_traced(client):
+    data = {'file': [(BytesIO(make_docx('Invoice for the batch').read()), 'a.docx'),
+                     (BytesIO(make_docx('Bank Statement for the batch').read()), 'b.docx')]}
+    response = client.post('/classify_files', data=data, content_type='multipart/form-data',
+                           headers={'X-Trace': '1'})
+    assert response.status_code == 200
+    timings = dict(entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', '))
+    assert {'sniff', 'hash', 'extract', 'score'} <= set(timings)
+
+def shared_registry(directory, share=True):
+    registry = Registry()
+    counter = registry.register(Counter('test_total', 'Test.', ('file_class',)))
+    histogram = registry.register(Histogram('test_seconds', 'Test.', (), buckets=(1,)))
+    registry.register_collector(lambda: [('test_depth', 'gauge', 'Test.', {}, 2)])
+    if share:
+        registry.share(str(directory))
+    else:
+        registry.directory = str(directory)
+    return registry, counter, histogram
+
+def test_workers_report_each_others_metrics(tmp_path):
+    registry, counter, histogram = shared_registry(tmp_path)
+    counter.inc('invoice', amount=3)
+    histogram.observe(0.5)
+    # Another live worker's snapshot, as its snapshot thread writes it
+    other = os.getppid()
+    (tmp_path / f'{other}.json').write_text(json.dumps({
+        'metrics': {'test_total': [[['invoice'], 2]], 'test_seconds': [[[], [0, 1], 5.0]]},
+        'samples': [['test_depth', 'gauge', 'Test.', {}, 7]],
+    }))
+    body = registry.render()
+    assert 'test_total{file_class="invoice"} 5' in body
+    assert 'test_seconds_count 2' in body and 'test_seconds_sum 5.5' in body
+    assert f'test_depth{{worker="{os.getpid()}"}} 2' in body and f'test_depth{{worker="{other}"}} 7' in body
+
+def test_retired_workers_still_count(tmp_path):
+    registry, counter, histogram = shared_registry(tmp_path)
+    counter.inc('invoice')
+    registry.write_snapshot()
+    registry.retire()
+    assert not (tmp_path / f'{os.getpid()}.json').exists()
+
+    # The next scrape is served by another worker, which has recorded nothing yet
+    scraper, _, _ = shared_registry(tmp_path, share=False)
+    body = scraper.render()
+    assert 'test_total{file_class="invoice"} 1' in body and 'test_depth' in body
+
+def test_values_recorded_before_forking_are_reported_once(tmp_path):
+    registry = Registry()
+    counter = registry.register(Counter('test_total', 'Test.', ('file_class',)))
+    counter.inc('invoice')
+    registry.share(str(tmp_path))
+    # Every forked worker starts from zero; the values recorded before are in the shared directory
+    registry.start_sharing(interval=60)
+    assert counter.value('invoice') == 0
+    assert 'test_total{file_class="invoice"} 1' in registry.render()
@@ -0,0 +1,61 @@
+# tests/test_ml_inference.py
+
+import pickle
+
+import pytest
+
+pytest.importorskip('nltk')
+sklearn_text = pytest.importorskip('sklearn.feature_extraction.text')
+sklearn_linear = pytest.importorskip('sklearn.linear_model')
+
+from src import classifierMLExample, preprocessing
+from src.preprocessing import preprocess_text
+
+@pytest.fixture(autouse=True)
+def stop_words(mocker):
+    # The NLTK corpus may not be downloaded where tests run
+    return mocker.patch('src.preprocessing.stop_words', return_value=frozenset({'the', 'is', 'a'}))
+
+@pytest.fixture
+def model_dir(tmp_path):
+    texts = ['the invoice number is due', 'a bank statement balance', 'invoice amount due', 'statement of the bank account']
+    labels = ['invoice', 'bank_statement', 'invoice', 'bank_statement']
+    vectorizer = sklearn_text.TfidfVectorizer()
+    model = sklearn_linear.LogisticRegression().fit(vectorizer.fit_transform(map(preprocess_text, texts)), labels)
+    for name, obj in (('vectorizer.pkl', vectorizer), ('model.pkl', model)):
+        with open(tmp_path / name, 'wb') as f:
+            pickle.dump(obj, f)
+    classifierMLExample.unload_model()
+    yield str(tmp_path)
+    classifierMLExample.unload_model()
+
+def test_preprocess_text():
+    assert preprocess_text("The Invoices, 2024: is DUE!") == 'invoic due'
+
+def test_stems_are_memoized():
+    preprocessing.stem.cache_clear()
+    preprocess_text('running running running')
+    assert preprocessing.stem.cache_info().hits == 2
+
+def test_model_is_loaded_lazily_once(model_dir, mocker):
+    mocker.patch('src.classifierMLExample.MODEL_DIR', model_dir)
+    load = mocker.spy(classifierMLExample.pickle, 'load')
+
+    assert classifierMLExample.classify_text('invoice due') == 'invoice'
+    assert classifierMLExample.classify_text('bank statement') == 'bank_statement'
+    assert load.call_count == 2  # vectorizer and model, once
+
+def test_batch_matches_single(model_dir, mocker):
+    mocker.patch('src.classifierMLExample.MODEL_DIR', model_dir)
+    texts = ['invoice amount due', 'bank account statement', 'the invoice']
+
+    assert classifierMLExample.classify_texts(texts) == [classifierMLExample.classify_text(t) for t in texts]
+    assert classifierMLExample.classify_texts([]) == []
+
+def test_confidence_matches_labels(model_dir, mocker):
+    mocker.patch('src.classifierMLExample.MODEL_DIR', model_dir)
+    texts = ['invoice amount due', 'bank account statement']
+    results = classifierMLExample.classify_texts_with_confidence(texts)
+
+    assert [label for label, _ in results] == classifierMLExample.classify_texts(texts)
+    assert all(0.5 <= probability <= 1 for _, probability in results)
@@ -0,0 +1,138 @@
+# tests/test_near_duplicates.py
+
+import random
+from io import BytesIO
+
+import numpy as np
+import pytest
+from src import near_duplicates
+from src.app import app
+from src.near_duplicates import MinHashSketch, NearDuplicateIndex, text_signature
+from src.synthetic import docx_bytes
+
+TEMPLATE = [
+    'Acme Widgets Ltd, 12 High Street, Springfield',
+    'Invoice Number: INV-{0}',
+    'Bill To: Northwind Traders, 400 Market Road, Shelbyville',
+    'Description of services: quarterly maintenance of the packaging line, spare parts and labour',
+    'Consulting x{1}  {2}.00',
+    'Payment terms: thirty days from the date of this invoice by bank transfer to the account below',
+    'Amount Due: {3}.50',
+    'Thank you for your business, please quote the invoice number with your payment',
+]
+
+def invoice_lines(rng):
+    return [line.format(*(rng.randint(1, 999999) for _ in range(4))) for line in TEMPLATE]
+
+def similarity(a, b):
+    return (a == b).mean()
+
+def test_chunked_sketch_matches_whole_text():
+    text = '\n'.join(invoice_lines(random.Random(1)))
+    rng = random.Random(2)
+    for _ in range(20):
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(1, 10)))
+        sketch = MinHashSketch()
+        for start, stop in zip([0] + cuts, cuts + [len(text)]):
+            sketch.feed(text[start:stop])
+        assert np.array_equal(sketch.signature(), text_signature(text))
+
+def test_numbers_do_not_count():
+    rng = random.Random(3)
+    first, second = ('\n'.join(invoice_lines(rng)) for _ in range(2))
+    assert first != second
+    assert similarity(text_signature(first), text_signature(second)) == 1
+    other = 'Patient: Jane Doe\nDiagnosis: Migraine\nTreatment: rest and fluids, follow up in two weeks'
+    assert similarity(text_signature(first), text_signature(other)) < 0.2
+
+def test_lookup_finds_near_duplicates_only():
+    index = NearDuplicateIndex(capacity=100, threshold=0.8)
+    text = '\n'.join(invoice_lines(random.Random(4)))
+    index.add(text_signature(text), 'invoice', 'ab' * 32)
+
+    edited = text.replace('quarterly maintenance', 'annual maintenance')
+    found = index.lookup(text_signature(edited))
+    assert found.label == 'invoice' and found.content_hash == 'ab' * 32 and 0.8 <= found.similarity < 1
+    assert index.lookup(text_signature('Curriculum Vitae\nWork experience at a bakery in town')) is None
+    assert index.stats() == {'hits': 1, 'misses': 1, 'size': 1, 'evictions': 0}
+
+def test_oldest_documents_are_evicted():
+    index = NearDuplicateIndex(capacity=4)
+    signatures = np.random.default_rng(5).integers(0, 1 << 16, (6, 64), dtype=np.uint16)
+    for number, signature in enumerate(signatures):
+        index.add(signature, f'label{number}', f'{number:064x}')
+    assert len(index) == 4 and index.stats()['evictions'] == 2
+    assert [index.lookup(signature) is not None for signature in signatures] == [False] * 2 + [True] * 4
+    assert index.lookup(signatures[5]).label == 'label5'
+
+def test_changing_the_classifier_version_empties_the_index():
+    index = NearDuplicateIndex(capacity=4)
+    index.use_version('rules-1')
+    index.add(text_signature('invoice number one two three four'), 'invoice', '00' * 32)
+    index.use_version('rules-1')
+    assert len(index) == 1
+    index.use_version('rules-2')
+    assert len(index) == 0
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    index = NearDuplicateIndex(capacity=8)
+    index.use_version('rules-1')
+    signature = text_signature('\n'.join(invoice_lines(random.Random(6))))
+    index.add(signature, 'invoice', 'cd' * 32)
+    index.save(path)
+
+    loaded = NearDuplicateIndex(capacity=8, path=path)
+    assert loaded.version == 'rules-1' and len(loaded) == 1
+    assert loaded.lookup(signature) == index.lookup(signature)
+    # Another layout cannot be used and starts empty
+    assert len(NearDuplicateIndex(capacity=16, path=path)) == 0
+
+def test_processes_merge_their_documents_into_the_saved_index(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    rng = random.Random(8)
+    signatures = [text_signature(f'{kind} ' + '\n'.join(invoice_lines(rng))) for kind in ('a', 'b', 'c')]
+    base = NearDuplicateIndex(capacity=8)
+    base.use_version('rules-1')
+    base.add(signatures[0], 'invoice', '0a' * 32)
+    base.save(path)
+
+    # Two workers start from the saved index and each add a document
+    workers = [NearDuplicateIndex(capacity=8, path=path) for _ in range(2)]
+    workers[0].add(signatures[1], 'invoice', '0b' * 32)
+    workers[1].add(signatures[2], 'receipt', '0c' * 32)
+    for worker in workers:
+        worker.merge_into(path)
+        # Merging again adds nothing twice
+        worker.merge_into(path)
+
+    merged = NearDuplicateIndex(capacity=8, path=path)
+    assert len(merged) == 3
+    assert [merged.lookup(signature).content_hash for signature in signatures] == ['0a' * 32, '0b' * 32, '0c' * 32]
+    assert merged.lookup(signatures[2]).label == 'receipt'
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def post_docx(client, lines):
+    data = {'file': (BytesIO(docx_bytes([lines])), 'document.docx')}
+    return client.post('/classify_file', data=data, content_type='multipart/form-data').get_json()
+
+@pytest.fixture
+def near_duplicate_index(monkeypatch):
+    index = NearDuplicateIndex(capacity=100)
+    monkeypatch.setattr(near_duplicates, 'NEAR_DUPLICATE_INDEX_SIZE', 100)
+    monkeypatch.setattr(near_duplicates, '_index', index)
+    return index
+
+def test_near_duplicate_uploads_reuse_the_label(client, mocker, near_duplicate_index):
+    label = mocker.patch('src.classifier.StreamingScorer.label', return_value='invoice')
+    rng = random.Random(7)
+    assert post_docx(client, invoice_lines(rng)) == {'file_class': 'invoice'}
+    response = post_docx(client, invoice_lines(rng))
+    assert response['file_class'] == 'invoice'
+    assert response['near_duplicate']['similarity'] == 1.0
+    assert label.call_count == 1
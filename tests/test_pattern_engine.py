@@ -0,0 +1,87 @@
+# tests/test_pattern_engine.py
+
+import random
+import re
+
+import pytest
+from src.classifier import DOCUMENT_PATTERNS
+from src.pattern_engine import PatternEngine, StreamingScorer, literal_prefix
+
+
+def findall_scores(patterns, text):
+    text = text.lower()
+    return {
+        doc_type: sum(len(re.findall(pattern, text)) for pattern in doc_patterns)
+        for doc_type, doc_patterns in patterns.items()
+    }
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r'invoice\s+number', 'invoice'),
+    (r'driver\'?s?\s+license', 'driver'),
+    (r'\bcv\b', 'cv'),
+    (r'party.*hereby', 'party'),
+    (r'[0-9]+ days', ''),
+    (r'a|b', ''),
+])
+def test_literal_prefix(pattern, expected):
+    assert literal_prefix(pattern) == expected
+
+def test_scores_match_findall_on_random_text():
+    phrases = [
+        "driver's license", "drivers license", "dl number", "passport number", "invoice number",
+        "invoice", "bank statement", "account summary", "tax return", "cv", "cvs", "curriculum vitae",
+        "the party shall hereby", "party", "hereby", "patient", "issued by the department of state",
+        "lorem", "ipsum", "\n", "  ",
+    ]
+    engine = PatternEngine(DOCUMENT_PATTERNS)
+    rng = random.Random(42)
+    for _ in range(200):
+        text = ' '.join(rng.choice(phrases) for _ in range(rng.randint(0, 40)))
+        assert engine.scores(text) == findall_scores(DOCUMENT_PATTERNS, text)
+
+def test_overlapping_prefixes_and_fallback_patterns():
+    patterns = {
+        'short': [r'ab', r'[0-9]+x'],
+        'long': [r'abab', r'bab'],
+    }
+    engine = PatternEngine(patterns)
+    text = 'ababab 12x 3x'
+    assert engine.scores(text) == findall_scores(patterns, text)
+
+@pytest.mark.parametrize("window", [64, 256])
+def test_streaming_scores_match_whole_text_across_chunk_boundaries(window):
+    patterns = dict(DOCUMENT_PATTERNS, short=[r'ab', r'[0-9]+x'], long=[r'abab', r'bab'])
+    phrases = ["invoice number", "bank statement", "the party shall hereby", "cv", "ababab", "12x", "lorem"]
+    engine = PatternEngine(patterns)
+    rng = random.Random(7)
+    for _ in range(100):
+        # Lines stay shorter than the window, so every match does too
+        text = '\n'.join(' '.join(rng.choice(phrases) for _ in range(2)) for _ in range(rng.randint(0, 15)))
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 8)))
+        scorer = StreamingScorer(engine, window=window)
+        for start, stop in zip([0] + cuts, cuts + [len(text)]):
+            scorer.feed(text[start:stop])
+            assert scorer.scores() == engine.scores(text[:stop])
+        assert scorer.finish() == engine.scores(text)
+        assert len(scorer._buffer) <= window + 1
+
+def test_streaming_scorer_settles_on_a_lead():
+    scorer = StreamingScorer(PatternEngine({'a': ['alpha'], 'b': ['beta']}), margin=1)
+    assert not scorer('alpha beta al')
+    assert scorer('pha alp')
+    assert scorer.label() == 'a'
+    assert scorer.chars == len('alpha beta alpha alp')
+
+def test_weights():
+    engine = PatternEngine({'a': ['alpha'], 'b': ['beta']}, weights={'a': [3], 'b': [1]})
+    assert engine.scores('alpha beta beta') == {'a': 3, 'b': 2}
+    assert engine.classify('alpha beta beta') == 'a'
+
+def test_decide():
+    assert PatternEngine.decide({'a': 0, 'b': 0}) == 'unknown'
+    assert PatternEngine.decide({'a': 2, 'b': 2}) == 'ambiguous'
+    assert PatternEngine.decide({'a': 2, 'b': 1}) == 'a'
+
+def test_version_changes_with_rules():
+    assert PatternEngine({'a': ['x']}).version != PatternEngine({'a': ['y']}).version
+    assert PatternEngine({'a': ['x']}).version == PatternEngine({'a': ['x']}).version
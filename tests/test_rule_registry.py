@@ -0,0 +1,133 @@
+# tests/test_rule_registry.py
+
+import json
+import time
+from io import BytesIO
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from src.app import app
+from src.classifier import DOCUMENT_PATTERNS, classification_details, classify_file, classify_text
+from src.synthetic import docx_bytes
+from src.rule_registry import BUILTIN_RULES_PATH, RuleError, RuleRegistry, load_rules
+
+PAYSLIP = {"document_types": {"payslip": {"patterns": ["payslip", {"pattern": r"net\s+pay", "weight": 2}]}}}
+INVOICE = {"document_types": {"invoice": {"patterns": ["invoice"]}}}
+
+def write_rules(path, rules):
+    path.write_text(json.dumps(rules))
+
+@pytest.fixture
+def rules_dir(tmp_path):
+    write_rules(tmp_path / 'a_invoice.json', INVOICE)
+    return tmp_path
+
+def test_builtin_rules():
+    patterns, weights = load_rules(BUILTIN_RULES_PATH)
+    assert patterns == DOCUMENT_PATTERNS
+    assert len(patterns) == 8 and all(w == 1 for ws in weights.values() for w in ws)
+
+def test_rules_and_weights_from_directory(rules_dir):
+    write_rules(rules_dir / 'b_payslip.json', PAYSLIP)
+    (rules_dir / 'notes.txt').write_text('not a rule file')
+    registry = RuleRegistry(str(rules_dir), poll_interval=0)
+
+    assert registry.engine.doc_types == ['invoice', 'payslip']
+    assert registry.engine.scores('Payslip: net pay 100, invoice') == {'invoice': 1, 'payslip': 3}
+
+@pytest.mark.parametrize("rules", [
+    {"types": {}},
+    {"document_types": {"payslip": {"patterns": []}}},
+    {"document_types": {"payslip": {"patterns": [{"pattern": "pay", "weight": "heavy"}]}}},
+    {"document_types": {"payslip": {"patterns": ["(unclosed"]}}},
+])
+def test_invalid_rules(tmp_path, rules):
+    write_rules(tmp_path / 'rules.json', rules)
+    with pytest.raises(RuleError):
+        RuleRegistry(str(tmp_path / 'rules.json'), poll_interval=0)
+
+def test_reload_swaps_engine(rules_dir):
+    registry = RuleRegistry(str(rules_dir), poll_interval=0)
+    engine = registry.engine
+    assert registry.reload() is False
+
+    write_rules(rules_dir / 'b_payslip.json', PAYSLIP)
+    assert registry.reload() is True
+    assert registry.engine.classify('net pay') == 'payslip'
+    # Callers holding the previous engine are unaffected
+    assert engine.classify('net pay') == 'unknown'
+
+def test_invalid_reload_keeps_engine(rules_dir):
+    registry = RuleRegistry(str(rules_dir), poll_interval=0)
+    version = registry.engine.version
+    (rules_dir / 'b_broken.json').write_text('{not json')
+
+    with pytest.raises(RuleError):
+        registry.reload()
+    assert registry.engine.version == version
+    assert 'b_broken.json' in registry.info()['last_error']
+
+def test_reloads_when_files_change(rules_dir):
+    registry = RuleRegistry(str(rules_dir), poll_interval=0.01)
+    write_rules(rules_dir / 'b_payslip.json', PAYSLIP)
+    time.sleep(0.02)
+
+    deadline = time.monotonic() + 5
+    while 'payslip' not in registry.current().doc_types and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert registry.current().classify('payslip') == 'payslip'
+
+def test_classifier_uses_registry(rules_dir, mocker):
+    registry = RuleRegistry(str(rules_dir), poll_interval=0)
+    mocker.patch('src.classifier.get_rule_registry', return_value=registry)
+    assert classify_text('Payslip') == 'unknown'
+
+    write_rules(rules_dir / 'b_payslip.json', PAYSLIP)
+    registry.reload()
+    assert classify_text('Payslip') == 'payslip'
+
+def test_admin_reload_route(rules_dir, mocker):
+    registry = RuleRegistry(str(rules_dir), poll_interval=0)
+    mocker.patch('src.app.get_rule_registry', return_value=registry)
+    mocker.patch('src.app.ADMIN_TOKEN', 'secret')
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        assert client.post('/admin/rules/reload').status_code == 403
+
+        write_rules(rules_dir / 'b_payslip.json', PAYSLIP)
+        response = client.post('/admin/rules/reload', headers={'X-Admin-Token': 'secret'})
+        assert response.status_code == 200
+        assert response.get_json()['reloaded'] is True
+        assert response.get_json()['document_types'] == ['invoice', 'payslip']
+
+        (rules_dir / 'c_broken.json').write_text('{not json')
+        response = client.post('/admin/rules/reload', headers={'X-Admin-Token': 'secret'})
+        assert response.status_code == 422
+        assert response.get_json()['version'] == registry.engine.version
+
+def test_admin_routes_are_disabled_without_a_token(mocker):
+    mocker.patch('src.app.ADMIN_TOKEN', None)
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        assert client.get('/admin/rules').status_code == 403
+        assert client.post('/admin/rules/reload', headers={'X-Admin-Token': ''}).status_code == 403
+
+def test_reload_during_a_classification_does_not_mix_rules(rules_dir, mocker):
+    registry = RuleRegistry(str(rules_dir), poll_interval=0)
+    mocker.patch('src.classifier.get_rule_registry', return_value=registry)
+    started = registry.engine
+
+    def extract(*args, **kwargs):
+        write_rules(rules_dir / 'b_payslip.json', PAYSLIP)
+        registry.reload()
+        return 'Payslip net pay 100'
+
+    mocker.patch('src.classifier.extract_text_from_docx', side_effect=extract)
+    data = docx_bytes([['Payslip net pay 100']])
+    cache = mocker.patch('src.classifier.get_result_cache').return_value
+    cache.get.return_value = None
+    with classification_details():
+        assert classify_file(FileStorage(stream=BytesIO(data), filename='payslip.docx')) == 'unknown'
+    # Cached under the rules that produced the label
+    assert cache.set.call_args.args[0].startswith(f'rules-{started.version}+')
+    assert registry.engine is not started
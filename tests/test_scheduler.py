@@ -0,0 +1,214 @@
+# tests/test_scheduler.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from src import scheduler as scheduler_module
+from src.app import app
+from src.classifier import classify_file
+from src.metrics import COALESCED, QUEUE_SECONDS
+from src.scheduler import (BACKGROUND, BATCH, INTERACTIVE, Scheduler, SchedulerBusy, SlotPool,
+                           scheduling_priority)
+from src.synthetic import docx_bytes
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+def test_slots_are_handed_out_by_priority_then_arrival():
+    pool = SlotPool('ocr', 1)
+    pool.acquire(BACKGROUND)
+    order = []
+
+    def take(name, priority):
+        pool.acquire(priority)
+        order.append(name)
+        pool.release()
+
+    threads = []
+    for number, (name, priority) in enumerate([('background', BACKGROUND), ('batch', BATCH),
+                                               ('interactive 1', INTERACTIVE), ('interactive 2', INTERACTIVE)]):
+        threads.append(threading.Thread(target=take, args=(name, priority)))
+        threads[-1].start()
+        wait_until(lambda: pool.waiting == number + 1)
+    pool.release()
+    for thread in threads:
+        thread.join()
+    assert order == ['interactive 1', 'interactive 2', 'batch', 'background']
+    assert pool.stats() == {'active': 0, 'waiting': 0, 'limit': 1}
+
+def test_admission_depends_on_priority():
+    pool = SlotPool('pdf', 1, max_waiting=2)
+    pool.acquire(INTERACTIVE)
+    threading.Thread(target=pool.acquire, args=(INTERACTIVE,), daemon=True).start()
+    wait_until(lambda: pool.waiting == 1)
+    # Batch items are refused once half the waiting room is taken, interactive requests once all of it is
+    with pytest.raises(SchedulerBusy):
+        pool.acquire(BATCH)
+    threading.Thread(target=pool.acquire, args=(INTERACTIVE,), daemon=True).start()
+    wait_until(lambda: pool.waiting == 2)
+    with pytest.raises(SchedulerBusy):
+        pool.acquire(INTERACTIVE)
+    threading.Thread(target=pool.acquire, args=(BACKGROUND,), daemon=True).start()
+    wait_until(lambda: pool.waiting == 3)
+    for _ in range(4):
+        pool.release()
+    wait_until(lambda: pool.waiting == 0)
+
+def test_waiting_too_long_gives_up():
+    pool = SlotPool('ocr', 1)
+    pool.acquire(INTERACTIVE)
+    with pytest.raises(SchedulerBusy):
+        pool.acquire(INTERACTIVE, timeout=0.01)
+    assert pool.waiting == 0
+    pool.release()
+    assert pool.active == 0
+
+def test_extractor_classes_have_separate_slots():
+    scheduler = Scheduler({'ocr': 1, 'docx': 1})
+    ocr_started, release_ocr = threading.Event(), threading.Event()
+
+    def slow_ocr():
+        ocr_started.set()
+        release_ocr.wait(5)
+        return 'ocr'
+
+    with ThreadPoolExecutor(2) as executor:
+        ocr = executor.submit(scheduler.run, 'a', 'image', slow_ocr)
+        ocr_started.wait(5)
+        # The OCR slot is taken, yet Word documents and unlisted kinds run straight away
+        assert scheduler.run('b', 'docx', lambda: 'docx') == 'docx'
+        assert scheduler.run('c', 'excel', lambda: 'excel') == 'excel'
+        assert scheduler.stats()['ocr'] == {'active': 1, 'waiting': 0, 'limit': 1}
+        release_ocr.set()
+        assert ocr.result() == 'ocr'
+
+def test_identical_classifications_share_one_run():
+    scheduler = Scheduler({'pdf': 2})
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def classify():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'invoice'
+
+    coalesced = COALESCED.value('pdf')
+    with ThreadPoolExecutor(4) as executor:
+        leader = executor.submit(scheduler.run, 'same', 'pdf', classify)
+        started.wait(5)
+        followers = [executor.submit(scheduler.run, 'same', 'pdf', classify) for _ in range(3)]
+        wait_until(lambda: COALESCED.value('pdf') == coalesced + 3)
+        release.set()
+        assert [future.result() for future in [leader] + followers] == ['invoice'] * 4
+    assert len(calls) == 1 and scheduler.inflight == 0
+
+def test_errors_are_shared_too():
+    scheduler = Scheduler({'pdf': 1})
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError('broken pdf')
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(scheduler.run, 'same', 'pdf', fail)
+        started.wait(5)
+        follower = executor.submit(scheduler.run, 'same', 'pdf', fail)
+        wait_until(lambda: COALESCED.value('pdf') > 0)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+    # A later identical classification runs again
+    assert scheduler.run('same', 'pdf', lambda: 'invoice') == 'invoice'
+
+def test_waiting_classifications_are_promoted_by_their_followers():
+    scheduler = Scheduler({'ocr': 1})
+    pool = scheduler.pools['ocr']
+    pool.acquire(INTERACTIVE)
+    order = []
+
+    def run(key, priority):
+        with scheduling_priority(priority):
+            return scheduler.run(key, 'image', lambda: order.append(key) or key)
+
+    with ThreadPoolExecutor(3) as executor:
+        background = executor.submit(run, 'scan', BACKGROUND)
+        wait_until(lambda: pool.waiting == 1)
+        batch = executor.submit(run, 'other scan', BATCH)
+        wait_until(lambda: pool.waiting == 2)
+        # An interactive request for the same scan waits on the background classification
+        interactive = executor.submit(run, 'scan', INTERACTIVE)
+        wait_until(lambda: pool._waiters[0][0] == INTERACTIVE)
+        pool.release()
+        assert interactive.result() == background.result() == 'scan' and batch.result() == 'other scan'
+    assert order == ['scan', 'other scan']
+
+@pytest.fixture
+def shared_scheduler(monkeypatch):
+    scheduler = Scheduler({'docx': 1})
+    monkeypatch.setattr(scheduler_module, '_scheduler', scheduler)
+    return scheduler
+
+def docx_upload():
+    data = docx_bytes([['Invoice Number: INV-1', 'Amount Due: 10.00']])
+    return FileStorage(stream=BytesIO(data), filename='invoice.docx')
+
+def test_concurrent_identical_uploads_are_extracted_once(shared_scheduler, mocker):
+    started, release = threading.Event(), threading.Event()
+
+    def extract(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return 'Invoice Number: INV-1 Amount Due: 10.00'
+
+    extractor = mocker.patch('src.classifier.extract_text_from_docx', side_effect=extract)
+    queued = QUEUE_SECONDS.count('docx', 'interactive')
+    with ThreadPoolExecutor(3) as executor:
+        def classify():
+            with scheduling_priority(INTERACTIVE):
+                return classify_file(docx_upload())
+
+        first = executor.submit(classify)
+        started.wait(5)
+        others = [executor.submit(classify) for _ in range(2)]
+        wait_until(lambda: COALESCED.value('docx') >= 2)
+        release.set()
+        assert {future.result() for future in [first] + others} == {'invoice'}
+    assert extractor.call_count == 1
+    assert QUEUE_SECONDS.count('docx', 'interactive') == queued + 1
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_busy_service_answers_503(client, mocker):
+    mocker.patch('src.app.classify_file', side_effect=SchedulerBusy('no ocr slot within 30s'))
+    data = {'file': (BytesIO(b'dummy content'), 'scan.png')}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 503 and 'Retry-After' in response.headers
+
+    data = {'file': [(BytesIO(b'dummy content'), 'scan.png')]}
+    response = client.post('/classify_files', data=data, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['error'].startswith('Too many classifications')
+
+def test_routes_classify_at_their_priority(client, mocker):
+    priorities = []
+    mocker.patch('src.app.classify_file', side_effect=lambda file: priorities.append(scheduler_module._priority.get()) or 'x')
+    data = {'file': (BytesIO(b'dummy content'), 'file.pdf')}
+    client.post('/classify_file', data=data, content_type='multipart/form-data')
+    data = {'file': [(BytesIO(b'dummy content'), 'file.pdf')]}
+    client.post('/classify_files', data=data, content_type='multipart/form-data')
+    assert priorities == [INTERACTIVE, BATCH]
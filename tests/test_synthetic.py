@@ -0,0 +1,53 @@
+# tests/test_synthetic.py
+
+import json
+import os
+
+from werkzeug.datastructures import FileStorage
+from src.classifier import DOCUMENT_PATTERNS, classify_file
+from src.synthetic import _keywords, generate
+
+def read_corpus(root):
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            with open(os.path.join(directory, filename), 'rb') as f:
+                files[os.path.relpath(os.path.join(directory, filename), root)] = f.read()
+    return files
+
+def test_output_is_deterministic(tmp_path):
+    patterns = {doc_type: DOCUMENT_PATTERNS[doc_type] for doc_type in ('invoice', 'resume')}
+    assert generate(str(tmp_path / 'a'), patterns, per_type=6, seed=7, workers=1) == 12
+    generate(str(tmp_path / 'b'), patterns, per_type=6, seed=7, workers=2)
+    generate(str(tmp_path / 'c'), patterns, per_type=6, seed=8, workers=1)
+
+    a, b, c = (read_corpus(tmp_path / name) for name in 'abc')
+    a.pop('manifest.jsonl'), b.pop('manifest.jsonl'), c.pop('manifest.jsonl')
+    assert a == b
+    assert a != c
+
+def test_documents_classify_as_their_label(tmp_path):
+    generate(str(tmp_path), DOCUMENT_PATTERNS, per_type=3, workers=1, formats=('pdf', 'docx'),
+             pages=(1, 2), misleading_names=1.0)
+    entries = [json.loads(line) for line in open(tmp_path / 'manifest.jsonl')]
+
+    assert len(entries) == 3 * len(DOCUMENT_PATTERNS)
+    for entry in entries:
+        filename = os.path.basename(entry['file'])
+        assert not filename.startswith(entry['label'])
+        with open(entry['file'], 'rb') as f:
+            assert classify_file(FileStorage(stream=f, filename=filename)) == entry['label']
+
+def test_images(tmp_path):
+    generate(str(tmp_path), {'invoice': DOCUMENT_PATTERNS['invoice']}, per_type=2, workers=1,
+             formats=('image',), rotation=5)
+    entries = [json.loads(line) for line in open(tmp_path / 'manifest.jsonl')]
+    assert all(entry['file'].endswith(('.jpg', '.png')) and entry['pages'] == 1 for entry in entries)
+
+def test_types_without_template_use_their_patterns(tmp_path):
+    patterns = {'payslip': [r'\bpayslip\b', r'net\s+pay', r'employer\'?s?\s+id']}
+    assert _keywords(patterns['payslip']) == ['payslip', 'net pay', "employer's id"]
+
+    generate(str(tmp_path), patterns, per_type=1, workers=1, formats=('docx',))
+    entry = json.loads(open(tmp_path / 'manifest.jsonl').readline())
+    assert entry['label'] == 'payslip'
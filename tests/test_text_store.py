@@ -0,0 +1,57 @@
+# tests/test_text_store.py
+
+import json
+from io import BytesIO, StringIO
+
+from werkzeug.datastructures import FileStorage
+from src.cache import ResultCache, get_result_cache
+from src.cache import content_hash
+from src.classifier import classifier_version, classify_file
+from src.reclassify import reclassify
+from src.synthetic import text_pdf
+from src.text_store import TextStore
+
+def test_texts_are_scoped_to_extractor_version(tmp_path):
+    path = str(tmp_path / 'texts.sqlite')
+    TextStore(path, '1').put('abc', 'pdf', 'a.pdf', 'Invoice Number: 1')
+
+    assert TextStore(path, '1').get('abc') == 'Invoice Number: 1'
+    assert TextStore(path, '2').get('abc') is None
+    assert len(TextStore(path, '1')) == 1
+
+def test_rule_change_reuses_stored_text(tmp_path, mocker):
+    store = TextStore(str(tmp_path / 'texts.sqlite'), '1')
+    mocker.patch('src.classifier.get_text_store', return_value=store)
+    extract = mocker.patch('src.classifier.extract_text_from_pdf', return_value='Invoice Number: 1')
+
+    file = FileStorage(stream=BytesIO(b'%PDF-1.4 invoice'), filename='invoice.pdf')
+    assert classify_file(file) == 'invoice'
+    # Simulates a rule change: the cached label is gone, but the text is still stored
+    get_result_cache().clear()
+    assert classify_file(file) == 'invoice'
+    assert extract.call_count == 1
+
+def test_stored_texts_are_extracted_in_full(tmp_path, mocker):
+    store = TextStore(str(tmp_path / 'texts.sqlite'), '1')
+    mocker.patch('src.classifier.get_text_store', return_value=store)
+    pages = [['Invoice Number: 1', 'Invoice Date: 2026-10-01', 'Amount Due: 10.00', 'Bill To: Acme'] * 3]
+    pages += [[f'Page {number} of the terms and conditions'] for number in range(2, 5)]
+    file = FileStorage(stream=BytesIO(text_pdf(pages)), filename='invoice.pdf')
+    # The first page settles the label, but every page is read for the store
+    assert classify_file(file) == 'invoice'
+    assert 'Page 4 of the terms' in store.get(content_hash(file))
+
+def test_reclassify(tmp_path):
+    store = TextStore(str(tmp_path / 'texts.sqlite'), '1')
+    store.put('h1', 'pdf', 'a.pdf', 'Bank Statement')
+    store.put('h2', 'docx', 'b.docx', 'Invoice Number: 2')
+    store.put('h3', 'image', 'c.png', 'nothing to see')
+    cache = ResultCache(max_entries=10, path=None)
+    output = StringIO()
+
+    labels = reclassify(store, workers=1, output=output, cache=cache)
+
+    assert labels == {'bank_statement': 1, 'invoice': 1, 'unknown': 1}
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [row['file_class'] for row in rows] == ['bank_statement', 'invoice', 'unknown']
+    assert cache.get(f'{classifier_version()}:docx:h2') == 'invoice'
@@ -0,0 +1,65 @@
+# tests/test_train.py
+
+import json
+import os
+
+import docx
+import pytest
+
+pytest.importorskip('nltk')
+pytest.importorskip('sklearn')
+
+from src import classifierMLExample, train
+
+@pytest.fixture(autouse=True)
+def stop_words(mocker):
+    # The NLTK corpus may not be downloaded where tests run
+    return mocker.patch('src.preprocessing.stop_words', return_value=frozenset({'the', 'is', 'a'}))
+
+@pytest.fixture
+def corpus(tmp_path):
+    phrases = {
+        'invoice': 'Invoice number {i}, amount due, bill to customer',
+        'bank_statement': 'Bank statement {i}, account summary, available balance',
+    }
+    for label, phrase in phrases.items():
+        os.makedirs(tmp_path / 'corpus' / label)
+        for i in range(10):
+            document = docx.Document()
+            document.add_paragraph(phrase.format(i=i))
+            document.save(tmp_path / 'corpus' / label / f'{label}_{i}.docx')
+    (tmp_path / 'corpus' / 'invoice' / 'notes.txt').write_text('ignored')
+    return str(tmp_path / 'corpus')
+
+def test_iter_corpus(corpus):
+    documents = list(train.iter_corpus(corpus))
+    assert len(documents) == 20
+    assert {label for _, label, _ in documents} == {'invoice', 'bank_statement'}
+    assert {kind for _, _, kind in documents} == {'docx'}
+
+def test_train_saves_versioned_artifacts(corpus, tmp_path, mocker):
+    output = str(tmp_path / 'models')
+    train.main([corpus, '--output', output, '--workers', '1', '--jobs', '1'])
+
+    with open(os.path.join(output, 'LATEST')) as f:
+        version_dir = os.path.join(output, f.read())
+    with open(os.path.join(version_dir, 'metadata.json')) as f:
+        metadata = json.load(f)
+    assert metadata['documents'] == 20 and metadata['labels'] == ['bank_statement', 'invoice']
+    with open(os.path.join(version_dir, 'vocabulary.json')) as f:
+        assert 'invoic' in json.load(f)
+
+    mocker.patch('src.classifierMLExample.MODEL_DIR', output)
+    classifierMLExample.unload_model()
+    try:
+        assert classifierMLExample.classify_text('invoice amount due') == 'invoice'
+    finally:
+        classifierMLExample.unload_model()
+
+def test_restart_does_not_re_extract(corpus, tmp_path, mocker):
+    output = str(tmp_path / 'models')
+    train.main([corpus, '--output', output, '--workers', '1', '--jobs', '1'])
+    extract = mocker.spy(train, '_extract_path')
+
+    train.main([corpus, '--output', output, '--workers', '1', '--jobs', '1'])
+    assert extract.call_count == 0
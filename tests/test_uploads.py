@@ -0,0 +1,105 @@
+# tests/test_uploads.py
+
+import os
+from io import BytesIO
+
+import pypdfium2
+import pytest
+from flask import request
+from werkzeug.datastructures import FileStorage
+from src import app as app_module
+from src.app import app
+from src.extraction_pool import _extract_in_worker
+from src.synthetic import text_pdf
+from src.uploads import ByteBudget, SpooledUpload, open_mapped, spool_path
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_small_uploads_stay_in_memory():
+    spool = SpooledUpload(threshold=16)
+    spool.write(b'x' * 16)
+    assert not spool.rolled
+    assert spool_path(FileStorage(stream=spool)) is None
+
+def test_large_uploads_are_spooled_to_a_named_file(tmp_path):
+    spool = SpooledUpload(threshold=16, directory=str(tmp_path))
+    spool.write(b'x' * 10)
+    spool.write(b'y' * 10)
+    assert spool.rolled and os.path.dirname(spool.name) == str(tmp_path)
+    assert spool_path(FileStorage(stream=spool)) == spool.name
+
+    spool.seek(0)
+    assert spool.read() == b'x' * 10 + b'y' * 10
+    spool.close()
+    assert not os.path.exists(spool.name)
+
+def test_requests_receive_files_into_spooled_uploads(mocker):
+    mocker.patch('src.uploads.UPLOAD_SPOOL_THRESHOLD', 1024)
+    data = {'small': (BytesIO(b'a' * 100), 'small.pdf'), 'large': (BytesIO(b'b' * 5000), 'large.pdf')}
+    with app.test_request_context('/classify_file', method='POST', data=data,
+                                  content_type='multipart/form-data'):
+        assert not request.files['small'].stream.rolled
+        assert request.files['large'].stream.rolled
+        assert request.files['large'].read() == b'b' * 5000
+
+@pytest.mark.parametrize('threshold', [0, 1 << 20])
+def test_mapped_view_is_independent_of_the_stream(threshold):
+    spool = SpooledUpload(threshold=threshold)
+    spool.write(b'0123456789')
+    spool.seek(3)
+    file = FileStorage(stream=spool)
+
+    with open_mapped(file) as view:
+        assert view.read(4) == b'0123'
+        view.seek(-2, os.SEEK_END)
+        assert view.read() == b'89'
+    assert spool.tell() == 3
+    spool.close()
+
+def test_pdfium_renders_from_a_mapped_view():
+    spool = SpooledUpload(threshold=0)
+    spool.write(text_pdf([['Invoice Number 1'], ['Page two']]))
+    document = pypdfium2.PdfDocument(open_mapped(FileStorage(stream=spool)), autoclose=True)
+    assert len(document) == 2
+    assert document[0].render(scale=0.5).to_pil().size[0] > 0
+    document.close()
+    spool.close()
+
+def test_extraction_workers_open_spooled_files_by_path(tmp_path):
+    path = tmp_path / 'upload'
+    path.write_bytes(text_pdf([['Bank statement for the period']]))
+    assert 'Bank statement' in _extract_in_worker('pdf', str(path), 'statement.pdf', {})
+
+def test_byte_budget():
+    budget = ByteBudget(100)
+    assert budget.acquire(60)
+    assert not budget.acquire(50)
+    assert budget.in_use == 60
+    budget.release(60)
+    assert budget.acquire(100)
+
+def test_oversized_uploads_are_refused(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1024)
+    data = {'file': (BytesIO(b'A' * 2048), 'file.pdf')}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 413
+    assert response.get_json() == {"error": "Upload exceeds 1024 bytes"}
+
+def test_uploads_over_the_inflight_budget_get_503(client, mocker):
+    budget = mocker.patch('src.app.upload_budget', ByteBudget(4096))
+    budget.acquire(3000)  # held by another request
+    data = {'file': (BytesIO(b'A' * 2048), 'file.pdf')}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(app_module.UPLOAD_RETRY_AFTER)
+
+    budget.release(3000)
+    mocker.patch('src.app.classify_file', return_value='invoice')
+    data = {'file': (BytesIO(b'A' * 2048), 'file.pdf')}
+    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    assert response.get_json() == {"file_class": "invoice"}
+    assert budget.in_use == 0
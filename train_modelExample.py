@@ -1,5 +1,6 @@
 # train_modelExample.py
 # This is a simplified example of how model training would look
+# See src/train.py for the training CLI that extracts a corpus directory in parallel
 
 import pickle
 from sklearn.feature_extraction.text import TfidfVectorizer